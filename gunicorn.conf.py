@@ -0,0 +1,80 @@
+"""
+Gunicorn configuration for production serving.
+
+    gunicorn -c gunicorn.conf.py
+
+By default this pre-forks WSGI workers running ``project.wsgi`` with a thread
+pool per worker. Set ``SERVER_MODE=asgi`` to run ``project.asgi`` under
+uvicorn workers instead.
+
+Environment:
+
+    SERVER_MODE        wsgi (default) or asgi
+    BIND               listen address (default 0.0.0.0:8000)
+    WEB_WORKERS        worker processes (default 2 * CPUs + 1)
+    WEB_THREADS        threads per worker (default 4)
+    WEB_PRELOAD        import the app in the master before forking (default 1)
+    WEB_MAX_REQUESTS   recycle a worker after this many requests (default 1000)
+    WEB_TIMEOUT        worker timeout in seconds (default 30)
+    WEB_ACCESS_LOG     access log target, '-' for stdout, empty to disable
+
+Nothing the master opens is shared with the workers: database connections
+(and PostgreSQL connection pools) are closed before each fork, and every
+worker loads its own live order board once it has started.
+
+Graceful reload: ``kill -HUP <master pid>`` starts fresh workers and lets the
+old ones finish in-flight requests. With preloading on, the application code
+lives in the master, so deploy new code with ``kill -USR2`` (re-exec the
+master) followed by ``kill -QUIT`` on the old master.
+"""
+
+import multiprocessing
+import os
+
+os.environ.setdefault('DJANGO_ENV', 'prod')
+
+server_mode = os.environ.get('SERVER_MODE', 'wsgi')
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+
+if server_mode == 'asgi':
+    wsgi_app = 'project.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    # Sync views run in asgiref's thread pool; size it like the WSGI threads
+    os.environ.setdefault('ASGI_THREADS', str(threads))
+else:
+    wsgi_app = 'project.wsgi:application'
+    worker_class = 'gthread' if threads > 1 else 'sync'
+
+preload_app = os.environ.get('WEB_PRELOAD', '1') == '1'
+
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = timeout
+keepalive = 5
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+
+def pre_fork(server, worker):
+    from django.conf import settings
+
+    if not settings.configured:
+        return  # Not preloaded: the master never touched the database
+    from django.db import connections
+
+    # A forked worker would share the master's sockets (and pool threads)
+    for connection in connections.all(initialized_only=True):
+        if connection.alias in getattr(connection, '_connection_pools', {}):
+            connection.close_pool()
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    from wine.liveboard import warm
+
+    warm()
@@ -0,0 +1,15 @@
+"""
+Settings profiles for project project.
+
+``project.settings`` loads the profile named by the ``DJANGO_ENV`` environment
+variable: ``dev`` (default, used by ``manage.py runserver``) or ``prod`` (used
+by ``gunicorn.conf.py``). A profile can also be selected explicitly with
+``DJANGO_SETTINGS_MODULE=project.settings.prod``.
+"""
+
+import os
+
+if os.environ.get('DJANGO_ENV', 'dev') == 'prod':
+    from .prod import *  # noqa: F401,F403
+else:
+    from .dev import *  # noqa: F401,F403
@@ -0,0 +1,17 @@
+"""
+Development profile: debug on, everything served by ``runserver``.
+"""
+
+import os
+
+from .base import *  # noqa: F401,F403
+
+DEBUG = True
+
+# Request instrumentation on unless explicitly disabled
+PERF_INSTRUMENTATION = os.environ.get('PERF_INSTRUMENTATION', '1') == '1'
+
+# Receipts "print" to a file unless a real printer is given
+RECEIPT_PRINTERS = {
+    'counter': os.environ.get('RECEIPT_PRINTER_URL', f"file://{BASE_DIR / 'var' / 'counter-printer.bin'}"),  # noqa: F405
+}
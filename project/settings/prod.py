@@ -0,0 +1,73 @@
+"""
+Production profile, used when serving ``project.wsgi`` / ``project.asgi``
+under gunicorn (see ``gunicorn.conf.py``).
+
+Everything environment specific is read from the environment:
+
+    DJANGO_SECRET_KEY      secret key (falls back to the base key)
+    DJANGO_ALLOWED_HOSTS   comma separated host names
+    DJANGO_SERVE_MEDIA     serve /media/ from Django (default: 1)
+    PERF_INSTRUMENTATION   1 to record per-request timings (default: off)
+    CACHE_URL              cache backend (default: a file cache shared by
+                           all workers on this node)
+"""
+
+import os
+import tempfile
+
+from .base import *  # noqa: F401,F403
+from .base import MIDDLEWARE, SECRET_KEY
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+
+ALLOWED_HOSTS = [
+    host.strip()
+    for host in os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
+    if host.strip()
+]
+
+SERVE_MEDIA = os.environ.get('DJANGO_SERVE_MEDIA', '1') == '1'
+
+# gunicorn runs several worker processes, so the session cache must be shared
+if 'CACHE_URL' not in os.environ:
+    CACHE_URL = f"file://{os.path.join(tempfile.gettempdir(), 'wine-cache')}"
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_URL[len('file://'):],
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    }
+    SESSION_WRITE_BEHIND_SECONDS = int(os.environ.get('SESSION_WRITE_BEHIND_SECONDS', 60))
+
+# Static files are collected into STATIC_ROOT and served by WhiteNoise from
+# every worker, so no separate static server is needed.
+MIDDLEWARE = list(MIDDLEWARE)
+MIDDLEWARE.insert(
+    MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedStaticFilesStorage',
+    },
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': os.environ.get('DJANGO_LOG_LEVEL', 'INFO'),
+    },
+}
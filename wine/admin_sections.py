@@ -0,0 +1,148 @@
+"""
+Admin dashboard data, loaded per section.
+
+The admin page itself only renders the summary counters (two aggregate
+queries, cached briefly) and the top sellers. The product, staff and offer
+tables and the offer form's product/combo pickers are fetched on demand from
+``admin_section`` as rendered row fragments, one page at a time.
+
+Each rendered page is cached under its section's version number. Admin
+writes call ``invalidate()`` to bump it; anything else that touches the
+data (stock moving at checkout, the Django admin) shows up once the short
+timeout expires.
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, Q, Sum
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import ComboOffer, CustomUser, Offer, Order, Product
+
+SUMMARY_KEY = 'wine:admin:summary'
+SUMMARY_TIMEOUT = 30
+SECTION_TIMEOUT = 60
+
+SECTIONS = {
+    'products': {
+        'queryset': lambda: Product.objects.order_by('name', 'id'),
+        'template': 'wine/admin_dashboard/_product_rows.html',
+        'search': ('name', 'category'),
+        'per_page': 25,
+    },
+    'staff': {
+        'queryset': lambda: CustomUser.objects.filter(user_type='staff').order_by('username'),
+        'template': 'wine/admin_dashboard/_staff_rows.html',
+        'search': ('username', 'full_name', 'email'),
+        'per_page': 25,
+    },
+    'offers': {
+        'queryset': lambda: Offer.objects.prefetch_related('products', 'combo_offers').order_by('-created_at'),
+        'template': 'wine/admin_dashboard/_offer_rows.html',
+        'search': ('title', 'offer_type'),
+        'per_page': 25,
+    },
+    # <option>s for the offer form's pickers; not paginated
+    'offer-products': {
+        'queryset': lambda: Product.objects.only('id', 'name', 'price').order_by('name', 'id'),
+        'template': 'wine/admin_dashboard/_options.html',
+        'search': (),
+        'per_page': None,
+    },
+    'offer-combos': {
+        'queryset': lambda: ComboOffer.objects.only('id', 'name').order_by('name', 'id'),
+        'template': 'wine/admin_dashboard/_options.html',
+        'search': (),
+        'per_page': None,
+    },
+}
+
+# Sections rendered from another section's data
+DEPENDENTS = {
+    'products': ('offer-products',),
+    'offers': ('offer-combos',),
+}
+
+
+def _version_key(name):
+    return f'wine:admin:{name}:version'
+
+
+def invalidate(*names):
+    """Drop cached pages of ``names`` (and the summary) after an admin write."""
+    for name in names:
+        for section in (name,) + DEPENDENTS.get(name, ()):
+            try:
+                cache.incr(_version_key(section))
+            except ValueError:
+                cache.set(_version_key(section), 1, None)
+    cache.delete(SUMMARY_KEY)
+
+
+def dashboard_summary():
+    """The counters shown at the top of every admin page."""
+    summary = cache.get(SUMMARY_KEY)
+    if summary is None:
+        products = Product.objects.aggregate(
+            total=Count('id'),
+            low=Count('id', filter=Q(stock__lt=10)),
+            out=Count('id', filter=Q(stock=0)),
+        )
+        orders = Order.objects.aggregate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status='pending')),
+            revenue=Sum('total_amount', filter=Q(
+                created_at__gte=timezone.now() - timedelta(days=7), status__in=['completed', 'ready'],
+            )),
+        )
+        summary = {
+            'total_products': products['total'],
+            'low_stock_products': products['low'],
+            'out_of_stock_products': products['out'],
+            'total_orders': orders['total'],
+            'pending_orders': orders['pending'],
+            'total_revenue': orders['revenue'] or 0,
+        }
+        cache.set(SUMMARY_KEY, summary, SUMMARY_TIMEOUT)
+    return summary
+
+
+def section_page(name, page=1, search=''):
+    """
+    One rendered page of section ``name``: ``{'html', 'page', 'num_pages',
+    'has_next', 'count'}``. Raises KeyError for unknown sections.
+    """
+    section = SECTIONS[name]
+    search = search.strip()[:100] if section['search'] else ''
+    version = cache.get_or_set(_version_key(name), 1, None)
+    digest = hashlib.md5(search.lower().encode()).hexdigest()[:12]
+    key = f'wine:admin:{name}:{version}:{page}:{digest}'
+    data = cache.get(key)
+    if data is None:
+        queryset = section['queryset']()
+        if search:
+            condition = Q()
+            for field in section['search']:
+                condition |= Q(**{f'{field}__icontains': search})
+            queryset = queryset.filter(condition)
+        if section['per_page']:
+            paginator = Paginator(queryset, section['per_page'])
+            current = paginator.get_page(page)
+            rows, count = current.object_list, paginator.count
+            page, num_pages, has_next = current.number, paginator.num_pages, current.has_next()
+        else:
+            rows = list(queryset)
+            count, page, num_pages, has_next = len(rows), 1, 1, False
+        data = {
+            'html': render_to_string(section['template'], {'rows': rows}),
+            'page': page,
+            'num_pages': num_pages,
+            'has_next': has_next,
+            'count': count,
+        }
+        cache.set(key, data, SECTION_TIMEOUT)
+    return data
@@ -1,6 +1,46 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_save
 
 
 class WineConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'wine'
+
+    def ready(self):
+        from . import checks  # noqa: F401 (registers the system checks)
+        from . import leaderboard, liveboard, preptimes, recommendations
+        from .catalog import catalog_changed
+        from .db import configure_connection
+        from .models import ComboItem, ComboOffer, Offer, Order, Product
+        from .signals import (
+            announce_status_change, bulk_status_changed, load_saved_status, log_deletion, order_status_changed,
+            orders_changed, remember_status,
+        )
+
+        connection_created.connect(configure_connection, dispatch_uid='wine.db.configure_connection')
+
+        post_init.connect(remember_status, sender=Order, dispatch_uid='wine.signals.remember_status')
+        pre_save.connect(load_saved_status, sender=Order, dispatch_uid='wine.signals.load_saved_status')
+        post_save.connect(announce_status_change, sender=Order, dispatch_uid='wine.signals.announce_status_change')
+        post_delete.connect(log_deletion, sender=Order, dispatch_uid='wine.signals.log_deletion')
+        order_status_changed.connect(
+            recommendations.on_order_status_changed, dispatch_uid='wine.recommendations.on_order_status_changed'
+        )
+        order_status_changed.connect(
+            leaderboard.on_order_status_changed, dispatch_uid='wine.leaderboard.on_order_status_changed'
+        )
+        order_status_changed.connect(
+            preptimes.on_order_status_changed, dispatch_uid='wine.preptimes.on_order_status_changed'
+        )
+        orders_changed.connect(liveboard.on_orders_changed, dispatch_uid='wine.liveboard.on_orders_changed')
+        for module in (recommendations, leaderboard, preptimes):
+            bulk_status_changed.connect(
+                module.on_bulk_status_changed, dispatch_uid=f'{module.__name__}.on_bulk_status_changed'
+            )
+
+        for model in (Product, ComboOffer, ComboItem, Offer):
+            post_save.connect(catalog_changed, sender=model, dispatch_uid=f'wine.catalog.saved.{model.__name__}')
+            post_delete.connect(catalog_changed, sender=model, dispatch_uid=f'wine.catalog.deleted.{model.__name__}')
+        for through in (Offer.products.through, Offer.combo_offers.through):
+            m2m_changed.connect(catalog_changed, sender=through, dispatch_uid=f'wine.catalog.m2m.{through.__name__}')
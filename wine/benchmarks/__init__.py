@@ -0,0 +1,61 @@
+"""
+Shared helpers for the performance benchmarks.
+
+The benchmarks themselves are management commands (``bench_*``) so they run
+with the project settings and need nothing beyond the app's requirements.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from ..sketches import percentile
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Summarize a list of latencies (seconds) collected over ``elapsed`` seconds."""
+    total = len(latencies) + errors
+    return {
+        'requests': total,
+        'errors': errors,
+        'error_rate': (errors / total) if total else 0.0,
+        'elapsed': elapsed,
+        'rps': (len(latencies) / elapsed) if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+@contextmanager
+def scratch_database():
+    """
+    Run the block against a throwaway migrated copy of the default database,
+    as the test runner does, so benchmarks never touch real data. SQLite's
+    copy is a file in a temporary directory: the in-memory database the test
+    runner would use fails concurrent writers at once instead of having them
+    wait.
+    """
+    setup_test_environment()
+    old_name, old_test = connection.settings_dict['NAME'], connection.settings_dict['TEST']
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST'] = {**old_test, 'NAME': os.path.join(directory, 'scratch.sqlite3')}
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            connection.settings_dict['TEST'] = old_test
+            teardown_test_environment()
+
+
+def count_writes(queries):
+    """Number of INSERT/UPDATE/DELETE statements in captured queries."""
+    return sum(
+        1 for query in queries
+        if query['sql'].lstrip().split(' ', 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE')
+    )
@@ -0,0 +1,107 @@
+"""
+Minimal threaded HTTP load generator (standard library only).
+"""
+
+import http.client
+import itertools
+import threading
+import time
+from urllib.parse import urlsplit
+
+from . import summarize
+
+
+class Client:
+    """Keep-alive HTTP client for one load-generating thread."""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Send a request and return ``(status, response, body)``: the
+        ``http.client.HTTPResponse``, already read (for its headers), and
+        its body. Reconnects once.
+        """
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, ConnectionError, OSError):
+                self.close()
+                if attempt:
+                    raise
+                continue
+            for header, value in response.getheaders():
+                if header.lower() == 'set-cookie':
+                    name, _, rest = value.partition('=')
+                    self.cookies[name.strip()] = rest.split(';', 1)[0]
+            if response.getheader('Connection', '').lower() == 'close':
+                self.close()
+            return response.status, response, data
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def wait_for_server(base_url, path='/', timeout=30):
+    """Block until ``base_url`` answers HTTP requests."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        client = Client(base_url, timeout=2)
+        try:
+            client.request('GET', path)
+            return True
+        except OSError:
+            time.sleep(0.2)
+        finally:
+            client.close()
+    return False
+
+
+def run_load(base_url, path, total, concurrency, cookies=None, ok_statuses=(200,)):
+    """Issue ``total`` GETs for ``path`` from ``concurrency`` threads and summarize."""
+    counter = itertools.count()
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker():
+        client = Client(base_url)
+        client.cookies.update(cookies or {})
+        local, failed = [], 0
+        while next(counter) < total:
+            start = time.perf_counter()
+            try:
+                status, _, _ = client.request('GET', path)
+            except OSError:
+                status = None
+            if status in ok_statuses:
+                local.append(time.perf_counter() - start)
+            else:
+                failed += 1
+        client.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, time.perf_counter() - start, errors[0])
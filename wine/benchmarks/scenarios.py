@@ -0,0 +1,213 @@
+"""
+Scripted user journeys for ``manage.py loadtest``.
+
+A scenario is a function ``(user, context)`` running one iteration of a
+journey through ``user.get`` / ``user.post``. Every request is timed and
+recorded under the scenario and a step name, so a report can say both "the
+kiosk journey has a p95 of 80 ms" and "most of it is kiosk_process_order".
+
+``context`` is built once by the command from the database the server uses:
+``products`` (dicts with ``id``, ``price``, ``category``, ``name``),
+``categories`` and ``staff_session``.
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.urls import reverse
+
+from . import summarize
+from .http import Client
+
+# Any well-formed token works: Django only checks that cookie and header agree
+CSRF_TOKEN = 'loadtestloadtestloadtestloadtest'
+
+
+class Recorder:
+    """Thread-safe latency and error collection per scenario and step."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.recording = False
+        self.latencies = defaultdict(lambda: defaultdict(list))
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.iterations = defaultdict(int)
+
+    def record(self, scenario, step, elapsed, ok):
+        if not self.recording:
+            return
+        with self.lock:
+            if ok:
+                self.latencies[scenario][step].append(elapsed)
+            else:
+                self.errors[scenario][step] += 1
+
+    def iteration(self, scenario):
+        if self.recording:
+            with self.lock:
+                self.iterations[scenario] += 1
+
+    def results(self, elapsed):
+        scenarios = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            steps = sorted(set(self.latencies[name]) | set(self.errors[name]))
+            latencies = [t for step in steps for t in self.latencies[name][step]]
+            errors = sum(self.errors[name].values())
+            scenarios[name] = dict(
+                summarize(latencies, elapsed, errors),
+                iterations=self.iterations[name],
+                steps={
+                    step: summarize(self.latencies[name][step], elapsed, self.errors[name][step])
+                    for step in steps
+                },
+            )
+        return scenarios
+
+
+class VirtualUser:
+    """One simulated browser: its own keep-alive connection and cookie jar."""
+
+    def __init__(self, base_url, scenario, recorder, rng):
+        self.client = Client(base_url)
+        self.client.cookies['csrftoken'] = CSRF_TOKEN
+        self.scenario = scenario
+        self.recorder = recorder
+        self.rng = rng
+
+    def login_as_staff(self, context):
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = context['staff_session']
+
+    def reset(self):
+        """Drop session cookies so the next iteration is a new visitor."""
+        self.client.cookies = {'csrftoken': self.client.cookies.get('csrftoken', CSRF_TOKEN)}
+
+    def get(self, step, path, **kwargs):
+        return self.request(step, 'GET', path, **kwargs)
+
+    def post(self, step, path, data=None, **kwargs):
+        return self.request(step, 'POST', path, data=data, **kwargs)
+
+    def request(self, step, method, path, data=None, ajax=False, expect_success=False):
+        """Time one request; returns the decoded JSON body (or None)."""
+        headers = {}
+        body = None
+        if method == 'POST':
+            headers['X-CSRFToken'] = self.client.cookies.setdefault('csrftoken', CSRF_TOKEN)
+            if data is not None:
+                body = json.dumps(data)
+                headers['Content-Type'] = 'application/json'
+        if ajax:
+            headers['X-Requested-With'] = 'XMLHttpRequest'
+
+        start = time.perf_counter()
+        try:
+            status, response, content = self.client.request(method, path, body=body, headers=headers)
+        except OSError:
+            status, response, content = None, None, b''
+        elapsed = time.perf_counter() - start
+
+        ok = status is not None and 200 <= status < 300
+        payload = None
+        if ok and response.getheader('Content-Type', '').startswith('application/json'):
+            try:
+                payload = json.loads(content)
+            except ValueError:
+                ok = False
+        if ok and expect_success:
+            # The JSON views report failures as 200 {'success': False}
+            ok = bool(payload and payload.get('success'))
+        self.recorder.record(self.scenario, step, elapsed, ok)
+        return payload
+
+    def close(self):
+        self.client.close()
+
+
+def _pick_products(user, context, low=1, high=3):
+    return user.rng.sample(context['products'], min(user.rng.randint(low, high), len(context['products'])))
+
+
+def shop_browse(user, context):
+    """Anonymous visitor: home page, a search and a category filter."""
+    home = reverse('shop_home')
+    user.get('home', home)
+    word = user.rng.choice(user.rng.choice(context['products'])['name'].split())
+    user.get('search', f'{home}?search={word}')
+    user.get('category', f"{home}?category={user.rng.choice(context['categories'])}")
+    user.reset()
+
+
+def shop_checkout(user, context):
+    """Anonymous visitor: add a few products to the cart and check out."""
+    user.get('home', reverse('shop_home'))
+    for product in _pick_products(user, context):
+        user.post('add_to_cart', reverse('add_to_cart', args=[product['id']]), ajax=True, expect_success=True)
+    user.get('view_cart', reverse('view_cart'))
+    user.post('process_order', reverse('process_order'), {
+        'phone_number': '9876543210',
+        'payment_method': user.rng.choice(['upi', 'card', 'cash']),
+        'order_type': 'pickup',
+    }, expect_success=True)
+    user.reset()
+
+
+def kiosk(user, context):
+    """Kiosk customer: browse the kiosk screen, add items, pay."""
+    user.get('kiosk_view', reverse('kiosk_view'))
+    for product in _pick_products(user, context):
+        user.post('kiosk_add_to_cart', reverse('kiosk_add_to_cart'),
+                  {'type': 'product', 'id': product['id']}, expect_success=True)
+    user.post('kiosk_process_order', reverse('kiosk_process_order'),
+              {'payment_id': 'loadtest'}, expect_success=True)
+    user.reset()
+
+
+def staff_billing(user, context):
+    """Counter staff ringing up a walk-in customer on the dashboard."""
+    user.login_as_staff(context)
+    user.get('all_products', reverse('api_all_products'))
+    items = [
+        {'product_id': p['id'], 'product_name': p['name'], 'quantity': 1, 'price': p['price']}
+        for p in _pick_products(user, context)
+    ]
+    total = sum(float(item['price']) for item in items)
+    user.post('create_manual_order', reverse('api_create_manual_order'), {
+        'order_type': 'pickup',
+        'payment_method': 'cash',
+        'status': 'preparing',
+        'items': items,
+        'subtotal': total,
+        'total_amount': total,
+        'amount_received': total,
+    }, expect_success=True)
+
+
+def dashboard(user, context):
+    """Staff dashboard polling stats and order lists."""
+    user.login_as_staff(context)
+    user.get('dashboard_stats', reverse('api_dashboard_stats'))
+    user.get('orders', reverse('api_orders'))
+    user.get('recent_orders', reverse('api_recent_orders'))
+
+
+def tv(user, context):
+    """Pickup screen refreshing the active order board."""
+    user.login_as_staff(context)
+    user.get('tv_display', f"{reverse('tv_display')}?t={int(time.time() * 1000)}")
+
+
+# name -> (journey, polls); pollers wait --poll-interval between iterations,
+# interactive journeys wait --think
+SCENARIOS = {
+    'shop_browse': (shop_browse, False),
+    'shop_checkout': (shop_checkout, False),
+    'kiosk': (kiosk, False),
+    'staff_billing': (staff_billing, False),
+    'dashboard': (dashboard, True),
+    'tv': (tv, True),
+}
+
+DEFAULT_MIX = 'shop_browse=8,shop_checkout=4,kiosk=4,staff_billing=2,dashboard=4,tv=20'
@@ -0,0 +1,131 @@
+"""
+Launching a local server and logging in load-generating clients.
+"""
+
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from importlib import import_module
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import CommandError
+from django.db import connection
+
+SERVERS = ('runserver', 'wsgi', 'asgi')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def database_copy():
+    """
+    Point this process at a throwaway copy of the default database and yield
+    a ``DATABASE_URL`` for it, so a server started with that URL takes the
+    load (orders, sessions, stock) without touching the real data.
+
+    SQLite is copied with the online backup API into a temporary directory;
+    PostgreSQL is cloned with ``CREATE DATABASE ... TEMPLATE``, which needs
+    no other sessions on the source database. Other backends raise
+    ``CommandError``.
+    """
+    settings_dict = connection.settings_dict
+    name = settings_dict['NAME']
+    if connection.vendor == 'sqlite':
+        directory = tempfile.mkdtemp(prefix='wine-loadtest-')
+        copy = os.path.join(directory, 'db.sqlite3')
+        connection.ensure_connection()
+        target = sqlite3.connect(copy)
+        try:
+            connection.connection.backup(target)
+        finally:
+            target.close()
+        url = f'sqlite:///{copy}'
+    elif connection.vendor == 'postgresql':
+        directory, copy = None, f'{name}_loadtest'
+        connection.close()
+        with connection._nodb_cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{copy}"')
+            cursor.execute(f'CREATE DATABASE "{copy}" TEMPLATE "{name}"')
+        credentials = quote(settings_dict['USER'] or '', safe='')
+        if settings_dict['PASSWORD']:
+            credentials += ':' + quote(settings_dict['PASSWORD'], safe='')
+        url = (
+            f"postgres://{credentials}@{settings_dict['HOST'] or 'localhost'}:"
+            f"{settings_dict['PORT'] or 5432}/{copy}"
+        )
+    else:
+        raise CommandError(
+            f'Cannot copy a {connection.vendor} database for the server; run against SQLite or PostgreSQL '
+            '(loadtest --url can also target a server you started yourself)'
+        )
+
+    connection.close()
+    settings_dict['NAME'] = copy
+    try:
+        yield url
+    finally:
+        connection.close()
+        settings_dict['NAME'] = name
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+        else:
+            with connection._nodb_cursor() as cursor:
+                cursor.execute(f'DROP DATABASE IF EXISTS "{copy}"')
+
+
+def start_server(server, port, workers=4, threads=4, database_url=None):
+    """
+    Launch ``server`` on ``port`` with the same (prod) settings profile,
+    against ``database_url`` if given (see ``database_copy``).
+    """
+    env = dict(os.environ, DJANGO_ENV='prod', WEB_ACCESS_LOG='')
+    if database_url:
+        env['DATABASE_URL'] = database_url
+    if server == 'runserver':
+        command = [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}']
+    else:
+        env.update(
+            SERVER_MODE=server,
+            BIND=f'127.0.0.1:{port}',
+            WEB_WORKERS=str(workers),
+            WEB_THREADS=str(threads),
+        )
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py']
+    return subprocess.Popen(
+        command, cwd=settings.BASE_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def stop_server(process):
+    process.terminate()
+    process.wait(timeout=30)
+
+
+def staff_session_key(username='bench_staff'):
+    """Create a logged-in staff session so the staff views can be exercised."""
+    from wine.models import CustomUser
+
+    user, created = CustomUser.objects.get_or_create(username=username, defaults={'user_type': 'staff'})
+    if created:
+        user.set_unusable_password()
+        user.save()
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    # New sessions are written through to the database, so a server in
+    # another process (with its own cache) finds it
+    session.save()
+    return session.session_key
@@ -0,0 +1,304 @@
+"""
+Micro-benchmarks for model hot paths and the staff/kiosk JSON views.
+
+Each benchmark is registered with ``@benchmark(name)`` as a setup function
+taking the fixture and returning a zero-argument callable; the runner times
+that callable and counts the queries it issues. ``manage.py run_benchmarks``
+runs them against a seeded scratch database and compares with a baseline.
+"""
+
+import json
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from wine import admin_sections, catalog, changefeed, leaderboard, liveboard, preptimes, transitions
+from wine.models import CartItem, ComboOffer, CustomUser, Offer, Order, OrderItem, PrepTimeSketch, Product
+
+from ..sketches import percentile
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def build_fixture(orders=5000, seed=1):
+    """Seed the (scratch) database and log in the clients the views need."""
+    call_command(
+        'seed_wine_data', seed=seed, products=200, combos=30, offers=20,
+        customers=500, carts=200, orders=orders, stdout=StringIO(),
+    )
+    staff_user = CustomUser.objects.create_user(username='bench_staff', password=None, user_type='staff')
+    staff = Client()
+    staff.force_login(staff_user)
+    admin = Client()
+    admin.force_login(CustomUser.objects.create_user(username='bench_admin', password=None, user_type='admin'))
+
+    kiosk = Client()
+    for product in Product.objects.filter(is_active=True, stock__gt=10)[:5]:
+        kiosk.post(reverse('kiosk_add_to_cart'), {'type': 'product', 'id': str(product.id)},
+                   content_type='application/json')
+
+    # Seeded carts only hold products; give a few combo lines too
+    for cart_item, combo in zip(CartItem.objects.all()[:20], ComboOffer.objects.all()):
+        CartItem.objects.create(cart=cart_item.cart, combo=combo, quantity=1)
+
+    # Seeded orders are bulk inserted, past the signal that feeds the rollup
+    leaderboard.rebuild_daily_sales()
+    # ... the prep-time sketches and the live order board
+    preptimes.rebuild_prep_times()
+    liveboard.invalidate()
+
+    return {'staff': staff, 'kiosk': kiosk, 'admin': admin}
+
+
+def fetch_page(client, url):
+    response = client.get(url)
+    if response.status_code != 200:
+        raise AssertionError(f'{url} returned {response.status_code}')
+    return response.content
+
+
+def fetch_json(client, url):
+    response = client.get(url)
+    if response.status_code != 200:
+        raise AssertionError(f'{url} returned {response.status_code}')
+    data = json.loads(response.content)
+    if isinstance(data, dict) and data.get('success') is False:
+        raise AssertionError(f"{url} failed: {data.get('error') or data.get('message')}")
+    return data
+
+
+# -- model hot paths ------------------------------------------------------
+
+@benchmark('ComboOffer.get_discounted_price')
+def combo_discounted_price(fixture):
+    def run():
+        for combo in ComboOffer.objects.filter(is_active=True):
+            combo.get_discounted_price()
+    return run
+
+
+@benchmark('Offer.total_discounted_price')
+def offer_total_discounted_price(fixture):
+    def run():
+        for offer in Offer.objects.filter(is_active=True):
+            offer.total_discounted_price
+    return run
+
+
+@benchmark('Offer.has_sufficient_stock')
+def offer_has_sufficient_stock(fixture):
+    def run():
+        for offer in Offer.objects.filter(is_active=True):
+            offer.has_sufficient_stock()
+    return run
+
+
+@benchmark('CartItem.can_increase_quantity')
+def cart_item_can_increase_quantity(fixture):
+    def run():
+        for item in CartItem.objects.all():
+            item.can_increase_quantity()
+    return run
+
+
+@benchmark('Order.get_status_timeline')
+def order_status_timeline(fixture):
+    def run():
+        for order in Order.objects.prefetch_related('status_events').order_by('-created_at')[:500]:
+            order.get_status_timeline()
+    return run
+
+
+@benchmark('prep_time_report (one day)')
+def prep_time_report(fixture):
+    day = timezone.localdate(PrepTimeSketch.objects.order_by('-count').values_list('hour', flat=True)[0])
+    return lambda: preptimes.prep_time_report(day)
+
+
+@benchmark('prep times from every event')
+def prep_times_rebuild(fixture):
+    return lambda: preptimes.rebuild_prep_times()
+
+
+@benchmark('top_sellers all time (uncached)')
+def top_sellers_uncached(fixture):
+    def run():
+        leaderboard._bump_version()
+        leaderboard.top_sellers('all', 'product')
+    return run
+
+
+# -- views ----------------------------------------------------------------
+
+def view_benchmark(name, url_name, client='staff'):
+    @benchmark(name)
+    def setup(fixture):
+        url = reverse(url_name)
+        return lambda: fetch_json(fixture[client], url)
+    return setup
+
+
+view_benchmark('view api_orders', 'api_orders')
+view_benchmark('view api_products', 'api_products')
+view_benchmark('view api_offers', 'api_offers')
+view_benchmark('view api_combos', 'api_combos')
+view_benchmark('view kiosk_get_cart', 'kiosk_get_cart', client='kiosk')
+view_benchmark('view cart_summary', 'cart_summary', client='kiosk')
+view_benchmark('view api_recent_orders', 'api_recent_orders')
+view_benchmark('view api_dashboard_stats', 'api_dashboard_stats')
+
+
+def page_benchmark(name, url, client='admin', invalidate=None):
+    """A full page load, optionally after ``invalidate()``; also reports the response size."""
+    @benchmark(name)
+    def setup(fixture):
+        def run():
+            if invalidate:
+                invalidate()
+            return fetch_page(fixture[client], url)
+        return run
+    return setup
+
+
+def uncached_admin():
+    # Sessions live in the cache too, so drop only the page's data
+    admin_sections.invalidate(*admin_sections.SECTIONS)
+    leaderboard._bump_version()
+
+
+page_benchmark('page admin_dashboard', '/admin-dashboard/', invalidate=uncached_admin)
+page_benchmark('page admin section products', '/admin-dashboard/sections/products/', invalidate=uncached_admin)
+page_benchmark('page admin section offers', '/admin-dashboard/sections/offers/', invalidate=uncached_admin)
+page_benchmark('page shop_home (cold)', '/shop/', client='kiosk', invalidate=catalog.bump_catalog_version)
+page_benchmark('page shop_home (cached)', '/shop/', client='kiosk')
+page_benchmark('page shop_home search (cached)', '/shop/?search=wine&category=wine', client='kiosk')
+page_benchmark('page kiosk (cold)', '/kiosk/', client='kiosk', invalidate=catalog.bump_catalog_version)
+page_benchmark('page kiosk (cached)', '/kiosk/', client='kiosk')
+page_benchmark('page staff_dashboard', '/staff-dashboard/', client='staff')
+page_benchmark('page staff_dashboard (board reload)', '/staff-dashboard/', client='staff',
+               invalidate=liveboard.invalidate)
+
+
+@benchmark('view api_order_changes (idle poll)')
+def order_changes_idle(fixture):
+    url = reverse('api_order_changes')
+
+    def run():
+        # Cursor from a page rendered just now: the steady state of a screen
+        return fetch_page(fixture['staff'], f'{url}?status=active&since={changefeed.current_cursor()}')
+    return run
+
+
+page_benchmark('view api_order_changes (active snapshot)', '/api/orders/changes/?status=active', client='staff')
+page_benchmark('view api_orders (full list poll)', '/api/orders/?limit=50', client='staff')
+
+
+STUCK_PENDING = 3000
+
+
+@benchmark(f'page tv_display ({STUCK_PENDING} stuck pending)')
+def tv_display_stuck_pending(fixture):
+    # Kept last: the extra orders would skew the order benchmarks above
+    if not fixture.get('stuck_pending'):
+        Order.objects.bulk_create(
+            (Order(phone_number='0000000000', total_amount=Decimal('100'), status='pending', token_number=str(n))
+             for n in range(STUCK_PENDING)),
+            batch_size=500,
+        )
+        Order.objects.filter(phone_number='0000000000').update(created_at=timezone.now() - timedelta(days=2))
+        liveboard.invalidate()
+        fixture['stuck_pending'] = True
+    return lambda: fetch_page(fixture['staff'], reverse('tv_display'))
+
+
+CLOSE_OUT = 500
+
+
+def close_out_orders(fixture):
+    """``CLOSE_OUT`` ready orders with two lines each, created once."""
+    if 'close_out' not in fixture:
+        products = list(Product.objects.order_by('id')[:2])
+        orders = Order.objects.bulk_create(
+            Order(phone_number='1111111111', total_amount=Decimal('700'), status='ready') for _ in range(CLOSE_OUT)
+        )
+        OrderItem.objects.bulk_create(
+            (OrderItem(order=order, product=product, quantity=1, price=product.price)
+             for order in orders for product in products),
+            batch_size=500,
+        )
+        fixture['close_out'] = [order.id for order in orders]
+    # The whole callable is timed, so putting them back is part of every
+    # run: one plain UPDATE, about a millisecond (the rollups keep growing)
+    Order.objects.filter(id__in=fixture['close_out']).update(status='ready')
+    return fixture['close_out']
+
+
+@benchmark(f'close out {CLOSE_OUT} ready orders (bulk)')
+def close_out_bulk(fixture):
+    def run():
+        ids = close_out_orders(fixture)
+        transitions.bulk_change_status('completed', ['ready'], order_ids=ids)
+    return run
+
+
+@benchmark(f'close out {CLOSE_OUT} ready orders (one by one)')
+def close_out_one_by_one(fixture):
+    def run():
+        for order in Order.objects.filter(id__in=close_out_orders(fixture)):
+            transitions.change_status(order, 'completed')
+    return run
+
+
+def run_benchmark(setup, fixture, repeat=5):
+    """Median/min wall time over ``repeat`` runs, plus queries of one run."""
+    run = setup(fixture)
+    # Warm up, and count queries outside the timed runs. The test client
+    # resets the query log at request start, so start from an empty one.
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        output = run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    result = {
+        'median_ms': percentile(times, 50) * 1000,
+        'min_ms': min(times) * 1000,
+        'queries': len(queries.captured_queries),
+    }
+    if isinstance(output, bytes):
+        result['bytes'] = len(output)
+    return result
+
+
+def compare(baseline, results, threshold):
+    """
+    Return ``(name, reason)`` pairs for benchmarks slower than the baseline by
+    more than ``threshold`` (a fraction) or issuing more queries.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['queries'] > before['queries']:
+            regressions.append((name, f"queries {before['queries']} -> {result['queries']}"))
+        if result['median_ms'] > before['median_ms'] * (1 + threshold):
+            regressions.append((name, f"median {before['median_ms']:.1f} ms -> {result['median_ms']:.1f} ms"))
+    return regressions
@@ -0,0 +1,73 @@
+"""
+Rows for the TV order board.
+
+The board shows the first ``BOARD_SIZE`` active orders (ready first, then
+preparing, then pending, oldest first within each) and the number of orders
+in each status. Everything is done in SQL: a ``Case/When`` priority with
+``LIMIT`` for the grid, one grouped count for the totals, and one query for
+the shown orders' items, fetched as ``values()`` rows with only the fields
+the grid prints.
+
+``liveboard`` keeps the same rows in memory; these queries are what it
+loads and reconciles from.
+"""
+
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from .models import Order, OrderItem
+
+BOARD_SIZE = 20
+INACTIVE = ('completed', 'cancelled')
+PRIORITY = {'ready': 1, 'preparing': 2, 'pending': 3}
+STATUS_LABELS = dict(Order.ORDER_STATUS)
+
+STATUS_PRIORITY = Case(
+    *(When(status=status, then=Value(rank)) for status, rank in PRIORITY.items()),
+    default=Value(99),
+    output_field=IntegerField(),
+)
+
+
+def active_orders():
+    return Order.objects.exclude(status__in=INACTIVE)
+
+
+def status_counts():
+    """``{status: count}`` over every active order."""
+    return dict(active_orders().values_list('status').annotate(n=Count('id')).order_by())
+
+
+ROW_FIELDS = (
+    'id', 'token_number', 'status', 'created_at', 'updated_at', 'phone_number', 'order_type', 'total_amount',
+    'claimed_by', 'claim_expires_at', 'user_id', 'user__full_name', 'user__username',
+)
+
+
+def order_rows(orders):
+    """
+    ``orders`` (a queryset) as dicts: the ROW_FIELDS plus ``status_display``,
+    ``customer`` (None for walk-ins), ``items`` (``{'name', 'quantity'}``, in
+    order) and ``item_count``. Two queries.
+    """
+    rows = list(orders.values(*ROW_FIELDS))
+    items = {row['id']: [] for row in rows}
+    lines = (
+        OrderItem.objects.filter(order_id__in=items)
+        .values_list('order_id', 'product__name', 'combo__name', 'quantity')
+        .order_by('order_id', 'id')
+    )
+    for order_id, product, combo, quantity in lines:
+        items[order_id].append({'name': product or combo or 'Item', 'quantity': quantity})
+
+    for row in rows:
+        row['status_display'] = STATUS_LABELS.get(row['status'], row['status'])
+        full_name, username = row.pop('user__full_name'), row.pop('user__username')
+        row['customer'] = (full_name or username) if row['user_id'] else None
+        row['items'] = items[row['id']]
+        row['item_count'] = len(row['items'])
+    return rows
+
+
+def board_orders(limit=BOARD_SIZE):
+    """The first ``limit`` orders on the board, as ``order_rows``."""
+    return order_rows(active_orders().annotate(priority=STATUS_PRIORITY).order_by('priority', 'created_at')[:limit])
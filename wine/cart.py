@@ -0,0 +1,117 @@
+"""
+Cart lookup helpers.
+
+Read-only pages use ``get_cart`` / ``get_kiosk_cart``, which never write: a
+visitor without a cart gets ``None`` and the page renders an empty cart. The
+session and ``Cart`` row are only created by the ``get_or_create_*`` variants,
+which are called from cart mutations (add to cart, add offer, kiosk add).
+
+Mutations also "touch" the cart so ``updated_at`` reflects the last activity
+the abandoned-cart purge (``manage.py purge_carts``) looks at; the touch is
+skipped while the timestamp is fresher than ``TOUCH_INTERVAL``.
+
+The navigation badge count (total quantity in the cart) is kept in the cache
+by ``refresh_cart_count``, which every cart mutation calls, so rendering the
+badge is a cache read instead of an aggregate query.
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Cart, CartItem
+
+KIOSK_SUFFIX = '_kiosk'
+TOUCH_INTERVAL = timedelta(hours=1)
+CART_COUNT_TIMEOUT = 24 * 60 * 60
+
+
+def touch_cart(cart):
+    now = timezone.now()
+    if cart.updated_at and now - cart.updated_at < TOUCH_INTERVAL:
+        return
+    Cart.objects.filter(pk=cart.pk).update(updated_at=now)
+    cart.updated_at = now
+
+
+def get_cart(request):
+    """Return the visitor's cart, or None if they have not added anything yet."""
+    if request.user.is_authenticated:
+        return Cart.objects.filter(user=request.user).first()
+    session_key = request.session.session_key
+    if not session_key:
+        return None
+    return Cart.objects.filter(session_key=session_key, user=None).first()
+
+
+def get_or_create_cart(request):
+    if request.user.is_authenticated:
+        cart, created = Cart.objects.get_or_create(user=request.user)
+    else:
+        if not request.session.session_key:
+            request.session.create()
+        session_key = request.session.session_key
+        cart, created = Cart.objects.get_or_create(session_key=session_key, user=None)
+    touch_cart(cart)
+    return cart
+
+
+def get_kiosk_cart(request):
+    """Return the kiosk cart for this session, or None."""
+    session_key = request.session.session_key
+    if not session_key:
+        return None
+    return Cart.objects.filter(session_key=session_key + KIOSK_SUFFIX, user=None).first()
+
+
+def get_or_create_kiosk_cart(request):
+    if not request.session.session_key:
+        request.session.create()
+    cart, created = Cart.objects.get_or_create(
+        session_key=request.session.session_key + KIOSK_SUFFIX,
+        user=None
+    )
+    touch_cart(cart)
+    return cart
+
+
+def _cart_count_key(request):
+    if request.user.is_authenticated:
+        return f'wine:cart-count:user:{request.user.pk}'
+    session_key = request.session.session_key
+    if not session_key:
+        return None
+    return f'wine:cart-count:session:{session_key}'
+
+
+def _count_cart_items(request):
+    if request.user.is_authenticated:
+        items = CartItem.objects.filter(cart__user=request.user)
+    else:
+        items = CartItem.objects.filter(cart__session_key=request.session.session_key, cart__user=None)
+    return items.aggregate(total=Sum('quantity'))['total'] or 0
+
+
+def get_cart_count(request):
+    """Total quantity in the visitor's cart, from the cache when possible."""
+    key = _cart_count_key(request)
+    if key is None:
+        return 0
+    count = cache.get(key)
+    if count is None:
+        count = _count_cart_items(request)
+        cache.set(key, count, CART_COUNT_TIMEOUT)
+    return count
+
+
+def refresh_cart_count(request, count=None):
+    """Recount (or set, e.g. 0 after checkout) the cached badge count after a cart mutation."""
+    key = _cart_count_key(request)
+    if key is None:
+        return 0
+    if count is None:
+        count = _count_cart_items(request)
+    cache.set(key, count, CART_COUNT_TIMEOUT)
+    return count
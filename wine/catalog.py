@@ -0,0 +1,56 @@
+"""
+Catalog version for cached product and offer markup.
+
+The shop and kiosk grids are cached as template fragments keyed by
+``catalog_version()``. Saving or deleting a product, combo or offer bumps it
+(signals wired in ``WineConfig.ready``), and so does checkout when it moves a
+product's stock across a badge boundary (out of stock, low stock) or within
+the low band; ordinary sales of well stocked products keep the cached grids.
+
+Offers also depend on the clock (start/end dates), so fragments expire after
+``FRAGMENT_TIMEOUT`` regardless.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'wine:catalog:version'
+FRAGMENT_TIMEOUT = 60 * 5
+
+# Product cards show "Low Stock" below this and "Out of Stock" at zero
+LOW_STOCK = 10
+
+
+def catalog_version():
+    # Seeded from the clock so a version lost from the cache never
+    # reappears with fragments from an older catalog still cached
+    return cache.get_or_set(VERSION_KEY, lambda: time.time_ns() // 1000, None)
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns() // 1000, None)
+
+
+def catalog_changed(sender, **kwargs):
+    """Signal receiver for saves/deletes of catalog models and offer m2m changes."""
+    if kwargs.get('action', 'post_').startswith('post_'):
+        transaction.on_commit(bump_catalog_version)
+
+
+def _badge(stock):
+    return 'out' if stock <= 0 else 'low' if stock < LOW_STOCK else 'in'
+
+
+def stock_moved(before, after):
+    """
+    Bump the version (on commit) if going from ``before`` to ``after``
+    (``{product_id: stock}``) changes a product's stock badge, or moves stock
+    within the low band, where offers needing several units can run out.
+    """
+    if any(_badge(before[pk]) != _badge(after[pk]) or after[pk] < LOW_STOCK for pk in after):
+        transaction.on_commit(bump_catalog_version)
@@ -0,0 +1,180 @@
+"""
+Order change feed for screens that poll.
+
+Instead of downloading their whole order list every few seconds, the staff
+dashboard, manage orders page and TV board ask for what changed since a
+cursor:
+
+    GET /api/orders/changes/?since=<cursor>&status=active
+
+and get back the orders created or modified since then that match the
+filter, the ids of orders to drop (they left the filter or were deleted,
+``removed``) and a new cursor. Nothing changed costs one indexed query and
+a response of about a hundred bytes.
+
+Every write to an order appends an ``OrderChange`` row in the writer's own
+transaction (``signals.record_changes``), and the cursor is the id of the
+last row seen. The ids are handed out in commit order (see
+``db.serialize_commits``), so a transaction that commits late cannot slip
+in behind a cursor that already passed it, however long it ran; there is
+no settling delay. A deleted order's row outlives it, so clients learn to
+drop it. Rows are kept for ``ORDER_CHANGE_LOG_DAYS``; a cursor whose row was
+purged gets ``reset`` and the client starts over.
+
+Without a cursor the feed is a snapshot of the matching orders, by id, in
+pages; its cursor (``<change id>-<last order id>``) carries on with the
+changes made since the snapshot began.
+
+Work queue claims (``workqueue``) are logged too, so each order carries the
+terminal preparing it (``claimed_by``) and until when. A claim that simply
+runs out changes nothing in the row; clients compare ``claim_expires_at``
+with their clock.
+"""
+
+import uuid
+
+from .board import INACTIVE, order_rows
+from .models import Order, OrderChange
+from .workqueue import claim_holder
+
+PAGE_SIZE = 200
+STATUSES = dict(Order.ORDER_STATUS)
+ORDER_TYPES = dict(Order.ORDER_TYPES)
+# Largest id a 64-bit auto field can hold
+MAX_ID = (1 << 63) - 1
+
+
+def encode_cursor(change_id, after_order_id=None):
+    """``change_id``, plus the last order of an unfinished snapshot."""
+    return str(change_id) if after_order_id is None else f'{change_id}-{after_order_id.hex}'
+
+
+def decode_cursor(cursor):
+    """``(change id, snapshot order id or None)`` from ``encode_cursor``; ValueError if malformed."""
+    change_id, _, order_id = cursor.partition('-')
+    change_id = int(change_id)
+    if not 0 <= change_id <= MAX_ID:
+        raise ValueError(f'Invalid cursor {cursor}')
+    return change_id, uuid.UUID(hex=order_id) if order_id else None
+
+
+def head():
+    """Id of the newest change, 0 if there is none."""
+    return OrderChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def current_cursor():
+    """Cursor for a page rendered now: the next poll returns later changes."""
+    return encode_cursor(head())
+
+
+def check_filter(status='all', order_type='all'):
+    if status not in STATUSES and status not in ('all', 'active'):
+        raise ValueError(f'Unknown status {status}')
+    if order_type not in ORDER_TYPES and order_type != 'all':
+        raise ValueError(f'Unknown order type {order_type}')
+
+
+def matches(row, status='all', order_type='all'):
+    if status == 'active' and row['status'] in INACTIVE:
+        return False
+    if status not in ('all', 'active') and row['status'] != status:
+        return False
+    return order_type == 'all' or row['order_type'] == order_type
+
+
+def order_json(row):
+    """An ``order_rows`` row in the shape the dashboards' order cards use."""
+    customer_name = "Guest Customer"
+    if row['customer']:
+        customer_name = row['customer']
+    elif row['phone_number']:
+        customer_name = f"Customer {row['phone_number'][-4:]}"
+    return {
+        'id': str(row['id']),
+        'order_number': f"ORD-{str(row['id'])[:8].upper()}",
+        'customer_name': customer_name,
+        'customer': row['customer'],
+        'phone_number': row['phone_number'] or "N/A",
+        'token_number': row['token_number'] or "",
+        'order_type': row['order_type'],
+        'status': row['status'],
+        'status_display': row['status_display'],
+        'total_amount': float(row['total_amount']),
+        'created_at': row['created_at'].isoformat(),
+        'items_count': row['item_count'],
+        'items': row['items'],
+    }
+
+
+def _entry(row):
+    claimed_by = claim_holder(row)
+    return {
+        **order_json(row),
+        'claimed_by': claimed_by,
+        'claim_expires_at': row['claim_expires_at'].isoformat() if claimed_by else None,
+    }
+
+
+def _snapshot(cursor, status, order_type, limit):
+    change_id, after = decode_cursor(cursor) if cursor else (head(), None)
+    orders = Order.objects.all()
+    if status == 'active':
+        orders = orders.exclude(status__in=INACTIVE)
+    elif status != 'all':
+        orders = orders.filter(status=status)
+    if order_type != 'all':
+        orders = orders.filter(order_type=order_type)
+    if after is not None:
+        orders = orders.filter(id__gt=after)
+    rows = order_rows(orders.order_by('id')[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'reset': False,
+        'orders': [_entry(row) for row in rows],
+        'removed': [],
+        'cursor': encode_cursor(change_id, rows[-1]['id'] if more else None),
+        'more': more,
+    }
+
+
+def changes(since=None, status='all', order_type='all', limit=PAGE_SIZE):
+    """
+    Orders changed after the ``since`` cursor (a snapshot of all matching
+    orders if None), in the order of their first change, from at most
+    ``limit`` changes. Returns a dict with ``orders``, ``removed`` ids, the
+    next ``cursor`` and ``more`` when there are more changes to read.
+    """
+    check_filter(status, order_type)
+    if since is None or decode_cursor(since)[1] is not None:
+        return _snapshot(since, status, order_type, limit)
+
+    since_id = decode_cursor(since)[0]
+    # The cursor's own row comes first, proving it was not purged
+    log = list(OrderChange.objects.filter(id__gte=since_id).order_by('id').values_list('id', 'order_id')[:limit + 2])
+    if since_id:
+        if not log or log[0][0] != since_id:
+            return {'reset': True, 'orders': [], 'removed': [], 'cursor': current_cursor(), 'more': False}
+        log = log[1:]
+    more = len(log) > limit
+    log = log[:limit]
+    if not log:
+        return {'reset': False, 'orders': [], 'removed': [], 'cursor': since, 'more': False}
+
+    changed = list(dict.fromkeys(order_id for _, order_id in log))
+    rows = {row['id']: row for row in order_rows(Order.objects.filter(id__in=changed))}
+    found, removed = [], []
+    for order_id in changed:
+        row = rows.get(order_id)
+        if row is not None and matches(row, status, order_type):
+            found.append(_entry(row))
+        else:
+            removed.append(str(order_id))
+    return {
+        'reset': False,
+        'orders': found,
+        'removed': removed,
+        'cursor': encode_cursor(log[-1][0]),
+        'more': more,
+    }
@@ -0,0 +1,38 @@
+"""
+System checks for settings that only work with a shared cache.
+
+Cache-backed sessions with write-behind (``wine.sessions``) keep the newest
+copy of a session in the cache alone until the next flush. With a cache
+private to each process (locmem, dummy) another worker finds nothing there
+and falls back to a stale or empty database row, logging staff out.
+"""
+
+from django.conf import settings
+from django.core.checks import Error, register
+
+PRIVATE_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared(alias='default'):
+    """False for caches that live inside one process."""
+    return settings.CACHES[alias]['BACKEND'] not in PRIVATE_CACHES
+
+
+@register()
+def check_session_write_behind(app_configs, **kwargs):
+    if settings.SESSION_ENGINE != 'wine.sessions' or not getattr(settings, 'SESSION_WRITE_BEHIND_SECONDS', 0):
+        return []
+    alias = getattr(settings, 'SESSION_CACHE_ALIAS', 'default')
+    if cache_is_shared(alias):
+        return []
+    return [Error(
+        'Session write-behind needs a cache shared by every worker.',
+        hint=(
+            f"Cache '{alias}' is {settings.CACHES[alias]['BACKEND']}; set CACHE_URL to a redis:// or "
+            "file:// cache, or SESSION_WRITE_BEHIND_SECONDS=0."
+        ),
+        id='wine.E001',
+    )]
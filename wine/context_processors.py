@@ -1,25 +1,26 @@
-from .models import CartItem
-from django.db.models import Sum
+import logging
 
-def cart_count(request):
-    cart_count = 0
+from .cart import get_cart_count
+
+logger = logging.getLogger(__name__)
 
-    try:
-        if request.user.is_authenticated:
-            cart_count = CartItem.objects.filter(
-                cart__user=request.user
-            ).aggregate(total=Sum('quantity'))['total'] or 0
-        else:
-            session_key = request.session.session_key
-            if session_key:
-                cart_count = CartItem.objects.filter(
-                    cart__session_key=session_key
-                ).aggregate(total=Sum('quantity'))['total'] or 0
 
-    except Exception as e:
-        cart_count = 0
-        print("Cart Count Error:", e)   # ✅ For debugging
+def cart_count(request):
+    """
+    Expose ``cart_count`` as a lazy value: templates call it on first use, so
+    pages that never show the cart badge (staff/admin screens) pay nothing.
+    """
+    result = []
+
+    def count():
+        if not result:
+            try:
+                result.append(get_cart_count(request))
+            except Exception:
+                logger.exception('Could not load cart count')
+                result.append(0)
+        return result[0]
 
     return {
-        'cart_count': cart_count
+        'cart_count': count
     }
@@ -0,0 +1,119 @@
+"""
+Customer directory: lifetime stats, prefix search and cursor pagination.
+
+Order count, lifetime spend, last order date and last delivery address are
+correlated subqueries, so the whole page comes back in one query and they
+are only evaluated for the rows on the page (a GROUP BY over the join would
+aggregate every customer before the LIMIT).
+
+Search matches the start of username, full name, the full name's last word
+(``CustomUser.full_name_last``, kept by ``save``, so "smith" finds "John
+Smith"), email or phone number. It is written as a range on
+``LOWER(field)`` rather than ``icontains`` so the expression indexes on
+CustomUser can serve it on SQLite and Postgres.
+"""
+
+import base64
+import json
+import re
+from datetime import datetime
+
+from django.db.models import Count, DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Lower
+
+from .models import CustomUser, Order
+
+SEARCH_FIELDS = ('username', 'full_name', 'full_name_last', 'email')
+
+
+def _order_stat(aggregate, output_field=None):
+    stats = (
+        Order.objects.filter(user=OuterRef('pk'))
+        .order_by()
+        .values('user')
+        .annotate(value=aggregate)
+        .values('value')
+    )
+    return Subquery(stats, output_field=output_field)
+
+
+def customer_directory():
+    """Customers, newest first, annotated with their order stats."""
+    money = DecimalField(max_digits=12, decimal_places=2)
+    return (
+        CustomUser.objects.filter(user_type='customer')
+        .annotate(
+            total_orders=Coalesce(_order_stat(Count('id')), 0),
+            total_spent=Coalesce(_order_stat(Sum('total_amount'), money), Value(0), output_field=money),
+            last_order_at=Subquery(
+                Order.objects.filter(user=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+            ),
+            last_address=Subquery(
+                Order.objects.filter(user=OuterRef('pk'), delivery_address__isnull=False)
+                .order_by('-created_at').values('delivery_address')[:1]
+            ),
+        )
+        .order_by('-date_joined', '-id')
+    )
+
+
+def _prefix_range(field, prefix):
+    # 'abc' <= value < 'abd' is a prefix match any btree index can serve
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': upper})
+
+
+def search_customers(queryset, query):
+    query = query.strip().lower()
+    if not query:
+        return queryset
+    queryset = queryset.annotate(**{f'search_{field}': Lower(field) for field in SEARCH_FIELDS})
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= _prefix_range(f'search_{field}', query)
+    if re.fullmatch(r'[\d\s+-]+', query):
+        condition |= _prefix_range('phone_number', re.sub(r'[\s-]', '', query))
+    return queryset.filter(condition)
+
+
+def encode_cursor(customer):
+    value = json.dumps([customer.date_joined.isoformat(), customer.pk])
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return ``(date_joined, pk)`` or raise ValueError."""
+    try:
+        joined, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(joined), int(pk)
+    except (TypeError, ValueError, json.JSONDecodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def cursor_page(queryset, cursor=None, limit=50):
+    """
+    One page of a ``-date_joined, -id`` ordered queryset after ``cursor``.
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    if cursor:
+        joined, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(date_joined__lt=joined) | Q(date_joined=joined, pk__lt=pk))
+    rows = list(queryset[:limit + 1])
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+def customer_summary(customer):
+    return {
+        'id': str(customer.id),
+        'username': customer.username,
+        'name': customer.full_name or customer.get_full_name() or customer.username,
+        'email': customer.email,
+        'phone': customer.phone_number or '',
+        'address': customer.last_address or '',
+        'total_orders': customer.total_orders,
+        'total_spent': float(customer.total_spent),
+        'last_order_at': customer.last_order_at.isoformat() if customer.last_order_at else None,
+        'date_joined': customer.date_joined.strftime('%Y-%m-%d'),
+    }
@@ -0,0 +1,118 @@
+"""
+Database connection setup.
+
+``configure_connection`` is connected to ``connection_created`` in
+``WineConfig.ready`` and applies the SQLite performance profile from
+``settings.SQLITE_PERFORMANCE`` to every new SQLite connection.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_PERFORMANCE = {
+    # Readers no longer block on the writer (and vice versa)
+    'journal_mode': 'WAL',
+    # Durable at checkpoints; safe with WAL and far fewer fsyncs
+    'synchronous': 'NORMAL',
+    # Milliseconds to wait on a locked database instead of failing
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative values are KiB (here ~64 MB of page cache per connection)
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+    # Seconds between ``PRAGMA optimize`` runs per process (0 disables)
+    'optimize_interval': 3600,
+}
+
+PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store')
+
+_optimize_lock = threading.Lock()
+_last_optimize = 0.0
+
+
+def sqlite_performance_profile():
+    """Return the configured profile, or None when tuning is switched off."""
+    profile = getattr(settings, 'SQLITE_PERFORMANCE', DEFAULT_SQLITE_PERFORMANCE)
+    if profile is None:
+        return None
+    return {**DEFAULT_SQLITE_PERFORMANCE, **profile}
+
+
+def apply_sqlite_profile(cursor, profile):
+    """Run the profile's PRAGMAs on a DB-API cursor."""
+    for pragma in PRAGMAS:
+        value = profile.get(pragma)
+        if value is not None:
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+def maybe_optimize(cursor, profile):
+    """Run ``PRAGMA optimize`` at most once per ``optimize_interval`` seconds."""
+    global _last_optimize
+    interval = profile.get('optimize_interval')
+    if not interval:
+        return
+    now = time.monotonic()
+    with _optimize_lock:
+        if _last_optimize and now - _last_optimize < interval:
+            return
+        _last_optimize = now
+    # 0x10002: also analyze tables that were never analyzed, with a cap on
+    # the work done, as recommended for long-lived connections.
+    cursor.execute('PRAGMA optimize = 0x10002')
+
+
+def configure_connection(sender, connection, **kwargs):
+    """``connection_created`` receiver applying the SQLite profile."""
+    if connection.vendor != 'sqlite':
+        return
+    profile = sqlite_performance_profile()
+    if profile is None:
+        return
+    cursor = connection.connection.cursor()
+    try:
+        apply_sqlite_profile(cursor, profile)
+        maybe_optimize(cursor, profile)
+    except Exception:
+        logger.exception('Could not apply SQLite performance profile')
+    finally:
+        cursor.close()
+
+
+def lock_rows(queryset, skip_locked=False):
+    """
+    ``select_for_update()`` on backends with row locks (PostgreSQL).
+
+    SQLite has no row locks (writers are serialized by the database lock), so
+    the queryset is returned unchanged there. ``skip_locked`` is only applied
+    when the backend supports ``SKIP LOCKED``.
+    """
+    features = connections[queryset.db].features
+    if not features.has_select_for_update:
+        return queryset
+    if skip_locked and features.has_select_for_update_skip_locked:
+        return queryset.select_for_update(skip_locked=True)
+    return queryset.select_for_update()
+
+
+def serialize_commits(using, key):
+    """
+    Call inside a transaction before appending to an id-ordered log: every
+    other transaction that calls it with the same ``key`` then commits
+    after this one, so the log's ids become visible in order and a reader
+    that has seen id N has seen every id below it.
+
+    PostgreSQL takes a transaction-level advisory lock on ``key``. SQLite
+    needs nothing: an IMMEDIATE transaction holds the database write lock
+    from BEGIN to COMMIT, so writers already commit one after another.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
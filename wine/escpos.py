@@ -0,0 +1,88 @@
+"""
+ESC/POS receipts for thermal printers.
+
+``render_receipt`` turns the dict from ``receipts.receipt_data`` into the raw
+byte stream a counter printer understands: a couple of kilobytes with the
+token number in double size, the items, totals and optionally a QR code
+linking to the order's tracking page. Send it with ``printspool.submit``.
+"""
+
+import textwrap
+
+ESC = b'\x1b'
+GS = b'\x1d'
+
+INIT = ESC + b'@' + ESC + b't\x00'  # reset, code page 437
+LEFT, CENTER = ESC + b'a\x00', ESC + b'a\x01'
+BOLD, REGULAR = ESC + b'E\x01', ESC + b'E\x00'
+NORMAL_SIZE, DOUBLE_SIZE, TALL = GS + b'!\x00', GS + b'!\x11', GS + b'!\x01'
+CUT = GS + b'V\x42\x03'  # feed three lines, partial cut
+
+# Characters per line in font A on 80 mm paper
+WIDTH = 42
+ENCODING = 'cp437'
+
+
+def _text(value):
+    return str(value).replace('₹', 'Rs.').encode(ENCODING, 'replace')
+
+
+def _line(value=''):
+    return _text(value) + b'\n'
+
+
+def _columns(left, right, width):
+    right = str(right)
+    return _line(f'{str(left)[:width - len(right) - 1]:<{width - len(right)}}{right}')
+
+
+def qr_code(data, module_size=6):
+    """GS ( k sequence printing ``data`` as a model 2 QR code."""
+    payload = data.encode('ascii')
+    store = len(payload) + 3
+
+    def function(*args):
+        return GS + b'(k' + bytes(args)
+
+    return (
+        function(4, 0, 49, 65, 50, 0)  # model 2
+        + function(3, 0, 49, 67, module_size)
+        + function(3, 0, 49, 69, 49)  # error correction M
+        + function(store % 256, store // 256, 49, 80, 48) + payload
+        + function(3, 0, 49, 81, 48)  # print
+    )
+
+
+def render_receipt(data, tracking_url=None, width=WIDTH):
+    """The receipt as ESC/POS bytes, cut at the end."""
+    shop = data['shop']
+    out = [INIT, CENTER, BOLD, DOUBLE_SIZE, _line(shop['name']), NORMAL_SIZE, REGULAR]
+    out += [_line(shop['tagline']), _line(shop['address']), _line(shop['phone'])]
+    if shop['gstin']:
+        out.append(_line(f"GSTIN: {shop['gstin']}"))
+
+    details = dict(data['details'])
+    token = details.pop('Token #', None)
+    if token:
+        out += [_line(), _line('TOKEN'), BOLD, DOUBLE_SIZE, _line(token), NORMAL_SIZE, REGULAR]
+
+    out += [LEFT, _line('-' * width)]
+    out += [_line(f'{label}: {value}') for label, value in details.items() if value]
+    out.append(_line('-' * width))
+    for item in data['lines']:
+        for part in textwrap.wrap(item['name'], width) or ['']:
+            out.append(_line(part))
+        out.append(_columns(f"  {item['quantity']} x {item['price']}", item['total'], width))
+    out += [
+        _line('-' * width),
+        _columns("Taxable value", data['taxable'], width),
+        _columns(f"CGST {data['gst_rate'] / 2}%", data['cgst'], width),
+        _columns(f"SGST {data['gst_rate'] / 2}%", data['sgst'], width),
+        BOLD, TALL, _columns('TOTAL', f"Rs. {data['total']}", width), NORMAL_SIZE, REGULAR,
+        _line('-' * width),
+        CENTER,
+    ]
+    if tracking_url:
+        out += [_line('Scan to track your order'), qr_code(tracking_url), _line()]
+    out += [_line('Thank you for your order!'), _line(f"Receipt ID: {data['receipt_id']}"), CUT]
+    return b''.join(out)
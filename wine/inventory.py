@@ -0,0 +1,55 @@
+"""
+Stock reservation shared by every checkout path.
+"""
+
+from collections import defaultdict
+
+from django.db.models import F
+
+from .catalog import stock_moved
+from .db import lock_rows
+from .models import Product
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product):
+        self.product = product
+        super().__init__(f'Insufficient stock for {product.name}' if product else 'Product not found')
+
+
+def stock_requirements(cart_items):
+    """Map product id -> units needed for a set of cart items (products and combos)."""
+    needed = defaultdict(int)
+    for item in cart_items:
+        if item.product_id:
+            needed[item.product_id] += item.quantity
+        elif item.combo_id:
+            for combo_item in item.combo.combo_items.all():
+                needed[combo_item.product_id] += item.quantity * combo_item.quantity
+    return dict(needed)
+
+
+def reserve_stock(quantities):
+    """
+    Decrement stock for ``{product_id: quantity}`` or raise InsufficientStock.
+
+    Must run inside ``transaction.atomic()``. Rows are locked in primary key
+    order (on backends with row locks) so concurrent checkouts for overlapping
+    products cannot deadlock, and each decrement is a conditional
+    ``UPDATE ... WHERE stock >= quantity`` so stock never goes negative.
+    """
+    product_ids = sorted(quantities, key=str)
+    products = {
+        product.id: product
+        for product in lock_rows(Product.objects.filter(id__in=product_ids).order_by('id'))
+    }
+    for product_id in product_ids:
+        updated = Product.objects.filter(
+            id=product_id, stock__gte=quantities[product_id]
+        ).update(stock=F('stock') - quantities[product_id])
+        if not updated:
+            raise InsufficientStock(products.get(product_id))
+    stock_moved(
+        {pk: product.stock for pk, product in products.items()},
+        {pk: product.stock - quantities[pk] for pk, product in products.items()},
+    )
@@ -0,0 +1,209 @@
+"""
+Top sellers by product, combo or category over a window of days.
+
+Sales are rolled up per day into ``DailySales`` (completed orders only), so
+a leaderboard is a SUM over at most a few thousand small rows instead of a
+join across every order line ever written. Orders add their lines when they
+reach ``completed`` and take them back if they leave it, through the
+``order_status_changed`` signal (``bulk_status_changed`` for bulk moves).
+``manage.py build_sales_rollup`` recomputes the rollup from orders, for
+first deploy and to catch up after bulk updates that bypass the signals.
+
+Rankings are cached for a few minutes under a version number that every
+rollup change bumps, so a dashboard load is normally one cache lookup plus
+fetching the ranked products themselves (their stock must be live).
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ComboOffer, DailySales, OrderItem, Product
+
+logger = logging.getLogger(__name__)
+
+# Days before today included in each window; None is all time
+WINDOWS = {'today': 0, '7d': 6, '30d': 29, 'all': None}
+DIMENSIONS = ('product', 'combo', 'category')
+RANKING_TIMEOUT = 60 * 5
+VERSION_KEY = 'wine:top-sellers:version'
+
+LINE_TOTAL = Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def _version():
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+
+def _bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def _lookup(line):
+    return {'day': line['day'], 'product_id': line['product_id'], 'combo_id': line['combo_id']}
+
+
+def _apply(lines, sign):
+    """
+    Add ``sign`` times each line's units and revenue to its rollup row.
+    Missing rows are inserted at 0 with ON CONFLICT DO NOTHING first, so two
+    orders completing together for a new product and day both add to the
+    one row instead of the second failing on the unique constraint.
+    """
+    lines = list(lines)
+    with transaction.atomic():
+        if sign > 0:
+            DailySales.objects.bulk_create(
+                (DailySales(category=line['product__category'] or '', **_lookup(line)) for line in lines),
+                ignore_conflicts=True,
+            )
+        for line in lines:
+            DailySales.objects.filter(**_lookup(line)).update(
+                quantity=F('quantity') + sign * line['units'],
+                revenue=F('revenue') + sign * line['total'],
+            )
+    _bump_version()
+
+
+def record_sale(order, sign=1):
+    """Add (``sign=1``) or remove (``sign=-1``) ``order``'s lines from the rollup."""
+    day = timezone.localdate(order.created_at)
+    lines = (
+        OrderItem.objects.filter(order=order)
+        .exclude(product__isnull=True, combo__isnull=True)
+        .values('product_id', 'combo_id', 'product__category')
+        .annotate(units=Sum('quantity'), total=LINE_TOTAL)
+    )
+    _apply(({**line, 'day': day} for line in lines), sign)
+
+
+def record_sales(order_ids, sign=1):
+    """``record_sale`` for many orders, with one query for all their lines."""
+    lines = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .exclude(product__isnull=True, combo__isnull=True)
+        .annotate(day=TruncDate('order__created_at'))
+        .values('day', 'product_id', 'combo_id', 'product__category')
+        .annotate(units=Sum('quantity'), total=LINE_TOTAL)
+        .order_by()
+    )
+    _apply(lines, sign)
+
+
+def on_order_status_changed(sender, order, old_status, new_status, **kwargs):
+    if new_status == old_status or 'completed' not in (old_status, new_status):
+        return
+    try:
+        record_sale(order, sign=1 if new_status == 'completed' else -1)
+    except Exception:
+        # The leaderboard must never break checkout; the next rebuild catches up
+        logger.exception('Could not record sales for order %s', order.pk)
+
+
+def on_bulk_status_changed(sender, order_ids, old_status, new_status, **kwargs):
+    if 'completed' not in (old_status, new_status):
+        return
+    try:
+        record_sales(order_ids, sign=1 if new_status == 'completed' else -1)
+    except Exception:
+        logger.exception('Could not record sales for %d orders', len(order_ids))
+
+
+def rebuild_daily_sales(days=None, batch_size=2000):
+    """
+    Recompute the rollup from completed orders, for the last ``days`` days
+    (today included) or all time. Returns the number of rollup rows written.
+    """
+    lines = OrderItem.objects.filter(order__status='completed').exclude(product__isnull=True, combo__isnull=True)
+    existing = DailySales.objects.all()
+    if days is not None:
+        since = timezone.localdate() - timedelta(days=days - 1)
+        lines = lines.filter(order__created_at__date__gte=since)
+        existing = existing.filter(day__gte=since)
+    rows = (
+        lines.annotate(day=TruncDate('order__created_at'))
+        .values('day', 'product_id', 'combo_id', 'product__category')
+        .annotate(units=Sum('quantity'), total=LINE_TOTAL)
+        .order_by()
+    )
+    with transaction.atomic():
+        existing.delete()
+        created = DailySales.objects.bulk_create(
+            (
+                DailySales(
+                    day=row['day'], product_id=row['product_id'], combo_id=row['combo_id'],
+                    category=row['product__category'] or '', quantity=row['units'], revenue=row['total'],
+                )
+                for row in rows.iterator(chunk_size=batch_size)
+            ),
+            batch_size=batch_size,
+        )
+    _bump_version()
+    return len(created)
+
+
+def _ranking(window, by, limit):
+    """``[(key, quantity, revenue), ...]`` best first, cached."""
+    key = f'wine:top-sellers:{_version()}:{timezone.localdate()}:{window}:{by}:{limit}'
+    ranking = cache.get(key)
+    if ranking is None:
+        rows = DailySales.objects.all()
+        if WINDOWS[window] is not None:
+            rows = rows.filter(day__gte=timezone.localdate() - timedelta(days=WINDOWS[window]))
+        field = {'product': 'product_id', 'combo': 'combo_id', 'category': 'category'}[by]
+        rows = rows.filter(product__isnull=(by == 'combo'))
+        ranking = [
+            (row[field], row['units'], row['total'] or Decimal('0'))
+            for row in rows.values(field).annotate(units=Sum('quantity'), total=Sum('revenue'))
+            .filter(units__gt=0).order_by('-units', field)[:limit]
+        ]
+        cache.set(key, ranking, RANKING_TIMEOUT)
+    return ranking
+
+
+def top_sellers(window='7d', by='product', limit=5):
+    """
+    Best sellers in ``window`` (a key of WINDOWS). Products and combos come
+    back as model instances with ``total_sold`` and ``revenue`` set;
+    categories as ``{'category', 'name', 'total_sold', 'revenue'}`` dicts.
+    """
+    if window not in WINDOWS or by not in DIMENSIONS:
+        raise ValueError(f'Unknown leaderboard {window}/{by}')
+    ranking = _ranking(window, by, limit)
+    if by == 'category':
+        names = dict(Product.CATEGORY_CHOICES)
+        return [
+            {'category': key, 'name': names.get(key, key), 'total_sold': units, 'revenue': revenue}
+            for key, units, revenue in ranking
+        ]
+    model = Product if by == 'product' else ComboOffer
+    found = model.objects.in_bulk([key for key, _, _ in ranking])
+    result = []
+    for key, units, revenue in ranking:
+        if key in found:
+            item = found[key]
+            item.total_sold, item.revenue = units, revenue
+            result.append(item)
+    return result
+
+
+def leaderboard_row(item):
+    """JSON-ready form of a ``top_sellers()`` entry."""
+    if isinstance(item, dict):
+        return {**item, 'revenue': float(item['revenue'])}
+    return {
+        'id': str(item.pk),
+        'name': item.name,
+        'category': getattr(item, 'category', 'combo'),
+        'total_sold': item.total_sold,
+        'revenue': float(item.revenue),
+    }
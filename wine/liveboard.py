@@ -0,0 +1,248 @@
+"""
+Process-local live order board.
+
+The TV board, the staff dashboard and ``api_recent_orders`` all show the
+same few things: active orders by status priority, the newest orders, and
+how many orders are in each status. ``LiveBoard`` keeps those in memory:
+
+* active orders as ``board.order_rows`` dicts, in a list sorted by
+  ``(status priority, created_at, id)``, so the first k are a slice;
+* the ``RECENT_SIZE`` newest orders of any status;
+* a count per status over the whole table.
+
+It is loaded from the database on first use (gunicorn calls ``warm()`` in
+each worker once it has forked, never in the master) together with the id
+of the last ``OrderChange`` it reflects, and then follows that log, which
+every order write appends to in commit order (see
+``signals.record_changes``). Once changes commit, ``orders_changed``
+bumps a version number in the shared cache; a process that finds the
+version moved reads the log rows after its cursor and applies them: the
+counts from each row's status move, the rows of the k changed orders from
+one lookup by primary key. That is O(k) and exact, whichever process wrote
+(deleting an order, which is rare, reloads instead). Writers that bypass
+the log (raw ``update()`` calls) call ``invalidate()``, which makes every
+process reload; as a last resort, every board reloads after
+``RECONCILE_SECONDS``.
+
+All of that needs a cache every worker shares. With a cache private to the
+process (locmem, dummy) a worker would never hear of the others' writes, so
+``live_board()`` reads from the database instead (``DatabaseBoard``).
+"""
+
+import bisect
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.db.models import Count
+
+from .board import INACTIVE, PRIORITY, active_orders, board_orders, order_rows
+from .checks import cache_is_shared
+from .db import serialize_commits
+from .models import Order, OrderChange
+from .signals import CHANGE_LOG_LOCK
+
+logger = logging.getLogger(__name__)
+
+RECENT_SIZE = 50
+RECONCILE_SECONDS = 60
+# Catching up on more log rows than this costs more than a reload
+CATCH_UP_LIMIT = 1000
+VERSION_KEY = 'wine:liveboard:version'
+EPOCH_KEY = 'wine:liveboard:epoch'
+
+
+def _sort_key(row):
+    return (PRIORITY.get(row['status'], 99), row['created_at'], row['id'])
+
+
+def _all_counts():
+    return dict(Order.objects.values_list('status').annotate(n=Count('id')).order_by())
+
+
+class LiveBoard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []
+        self._active = {}
+        self._recent = []
+        self._counts = {}
+
+    def load(self, active, recent, counts):
+        """Replace the contents (``order_rows`` lists and ``{status: count}``)."""
+        active = sorted(active, key=_sort_key)
+        with self._lock:
+            self._keys = [_sort_key(row) for row in active]
+            self._active = {row['id']: row for row in active}
+            self._recent = list(recent)
+            self._counts = dict(counts)
+
+    def _remove(self, order_id):
+        row = self._active.pop(order_id, None)
+        if row is not None:
+            del self._keys[bisect.bisect_left(self._keys, _sort_key(row))]
+        return row
+
+    def apply(self, moves, rows):
+        """
+        Apply a batch of the change log: ``moves`` is ``(old_status, status)``
+        per log row, ``rows`` the changed orders' current ``order_rows``.
+        """
+        with self._lock:
+            for old_status, status in moves:
+                if old_status:
+                    self._counts[old_status] = self._counts.get(old_status, 0) - 1
+                if status:
+                    self._counts[status] = self._counts.get(status, 0) + 1
+            self._counts = {status: n for status, n in self._counts.items() if n}
+
+            for row in rows:
+                self._remove(row['id'])
+                if row['status'] not in INACTIVE:
+                    key = _sort_key(row)
+                    self._keys.insert(bisect.bisect_left(self._keys, key), key)
+                    self._active[row['id']] = row
+
+            changed = {row['id']: row for row in rows}
+            recent = [changed.pop(row['id'], row) for row in self._recent]
+            # A short list holds every order, so anything else is new
+            oldest = recent[-1]['created_at'] if len(recent) >= RECENT_SIZE else None
+            added = [row for row in changed.values() if oldest is None or row['created_at'] >= oldest]
+            if added:
+                recent += added
+                recent.sort(key=lambda r: r['created_at'], reverse=True)
+            self._recent = recent[:RECENT_SIZE]
+
+    def top(self, k):
+        """The first ``k`` active orders by status priority and age."""
+        with self._lock:
+            return [self._active[key[2]] for key in self._keys[:k]]
+
+    def recent(self, k):
+        with self._lock:
+            return self._recent[:k]
+
+    def counts(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+class DatabaseBoard:
+    """``LiveBoard``'s reads straight from the database."""
+
+    def top(self, k):
+        return board_orders(k)
+
+    def recent(self, k):
+        return order_rows(Order.objects.order_by('-created_at')[:k])
+
+    def counts(self):
+        return _all_counts()
+
+
+_board = LiveBoard()
+_state_lock = threading.Lock()
+# Last OrderChange id applied, shared version and reload epoch seen
+_cursor = None
+_seen_version = None
+_seen_epoch = None
+_loaded_at = 0.0
+
+
+def _shared(key):
+    return cache.get_or_set(key, lambda: time.time_ns() // 1000, None)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns() // 1000, None)
+
+
+def invalidate():
+    """Make every process reload its board (after writes that bypass the change log)."""
+    global _cursor
+    _bump(EPOCH_KEY)
+    with _state_lock:
+        _cursor = None
+
+
+def reload():
+    """Load this process's board from the database."""
+    global _cursor, _seen_version, _seen_epoch, _loaded_at
+    version, epoch = _shared(VERSION_KEY), _shared(EPOCH_KEY)
+    with transaction.atomic():
+        # No logged write commits in between: the counts, rows and cursor agree
+        serialize_commits(Order.objects.db, CHANGE_LOG_LOCK)
+        cursor = OrderChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        counts = _all_counts()
+        active = order_rows(active_orders())
+        recent = order_rows(Order.objects.order_by('-created_at')[:RECENT_SIZE])
+    _board.load(active, recent, counts)
+    with _state_lock:
+        _cursor, _seen_version, _seen_epoch, _loaded_at = cursor, version, epoch, time.monotonic()
+
+
+def catch_up(version):
+    """Apply the change log after this process's cursor; False if a reload is due instead."""
+    global _cursor, _seen_version
+    with _state_lock:
+        cursor = _cursor
+    if cursor is None:
+        return False
+    log = list(
+        OrderChange.objects.filter(id__gt=cursor).order_by('id')
+        .values_list('id', 'order_id', 'old_status', 'status')[:CATCH_UP_LIMIT + 1]
+    )
+    if len(log) > CATCH_UP_LIMIT:
+        return False
+    if log:
+        changed = {order_id for _, order_id, _, _ in log}
+        rows = order_rows(Order.objects.filter(id__in=changed))
+        if len(rows) < len(changed):
+            return False  # Deleted orders: the newest-orders list needs refilling
+        with _state_lock:
+            if _cursor != cursor:
+                return True  # Another thread applied it first
+            _board.apply([(old_status, status) for _, _, old_status, status in log], rows)
+            _cursor = log[-1][0]
+    with _state_lock:
+        _seen_version = version
+    return True
+
+
+def warm():
+    if not cache_is_shared():
+        return
+    try:
+        reload()
+    except DatabaseError:
+        # Not migrated yet, database down: the first request loads it
+        logger.warning('Could not warm the live order board', exc_info=True)
+
+
+def live_board():
+    """This process's board, brought up to date first; ``DatabaseBoard`` without a shared cache."""
+    if not cache_is_shared():
+        return DatabaseBoard()
+    version, epoch = _shared(VERSION_KEY), _shared(EPOCH_KEY)
+    with _state_lock:
+        stale = (
+            _cursor is None or epoch != _seen_epoch
+            or time.monotonic() - _loaded_at > RECONCILE_SECONDS
+        )
+        behind = version != _seen_version
+    if stale or (behind and not catch_up(version)):
+        reload()
+    return _board
+
+
+def on_orders_changed(sender, order_ids, **kwargs):
+    try:
+        _bump(VERSION_KEY)
+    except Exception:
+        # The board must never break checkout; it reconciles on its own
+        logger.exception('Could not announce %d changed orders to the live boards', len(order_ids))
@@ -0,0 +1,76 @@
+"""
+Housekeeping jobs: purging abandoned carts, expired sessions and the old
+end of the order change log.
+
+Deletes run in small batches, each in its own short transaction, so SQLite's
+single write lock is never held for long while checkouts are waiting.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cart, CartItem, OrderChange
+
+
+def _batched_delete(queryset, delete_batch, batch_size, pause):
+    """Delete ``queryset``'s primary keys ``batch_size`` at a time."""
+    totals = {}
+    while True:
+        keys = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not keys:
+            return totals
+        with transaction.atomic():
+            for label, count in delete_batch(keys).items():
+                totals[label] = totals.get(label, 0) + count
+        if pause:
+            time.sleep(pause)
+
+
+def purge_abandoned_carts(idle_days=None, batch_size=500, include_user_carts=False, pause=0):
+    """
+    Delete carts untouched for ``idle_days`` (default ``CART_IDLE_DAYS``) and
+    their items. Only anonymous (session and kiosk) carts unless
+    ``include_user_carts`` is set. Returns ``{'carts': n, 'cart_items': n}``.
+    """
+    if idle_days is None:
+        idle_days = settings.CART_IDLE_DAYS
+    cutoff = timezone.now() - timedelta(days=idle_days)
+    carts = Cart.objects.filter(updated_at__lt=cutoff).order_by()
+    if not include_user_carts:
+        carts = carts.filter(user__isnull=True)
+
+    def delete_batch(cart_ids):
+        items, _ = CartItem.objects.filter(cart_id__in=cart_ids).delete()
+        deleted, _ = Cart.objects.filter(id__in=cart_ids).delete()
+        return {'carts': deleted, 'cart_items': items}
+
+    totals = _batched_delete(carts, delete_batch, batch_size, pause)
+    return {'carts': totals.get('carts', 0), 'cart_items': totals.get('cart_items', 0)}
+
+
+def purge_expired_sessions(batch_size=500, pause=0):
+    """Batched equivalent of ``clearsessions`` for the database session table."""
+    expired = Session.objects.filter(expire_date__lt=timezone.now()).order_by()
+
+    def delete_batch(keys):
+        deleted, _ = Session.objects.filter(session_key__in=keys).delete()
+        return {'sessions': deleted}
+
+    return _batched_delete(expired, delete_batch, batch_size, pause).get('sessions', 0)
+
+
+def purge_order_changes(batch_size=500, pause=0):
+    """Delete change feed log rows older than ``ORDER_CHANGE_LOG_DAYS``."""
+    cutoff = timezone.now() - timedelta(days=settings.ORDER_CHANGE_LOG_DAYS)
+    old = OrderChange.objects.filter(changed_at__lt=cutoff).order_by()
+
+    def delete_batch(ids):
+        deleted, _ = OrderChange.objects.filter(id__in=ids).delete()
+        return {'changes': deleted}
+
+    return _batched_delete(old, delete_batch, batch_size, pause).get('changes', 0)
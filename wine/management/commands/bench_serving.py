@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from wine.benchmarks.http import run_load, wait_for_server
+from wine.benchmarks.server import (
+    SERVERS, database_copy, free_port, staff_session_key, start_server, stop_server,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests per second for shop_home and api_orders under "
+        "manage.py runserver and the gunicorn WSGI/ASGI entry points."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', default=','.join(SERVERS),
+                            help='Comma separated subset of: %s' % ', '.join(SERVERS))
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+
+    def handle(self, *args, **options):
+        with database_copy() as database_url:
+            rows = self.measure(database_url, options)
+
+        self.stdout.write(f"{'server':<10} {'endpoint':<11} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        for server, name, result in rows:
+            self.stdout.write(
+                f"{server:<10} {name:<11} {result['rps']:>9.1f} {result['p50_ms']:>8.1f} "
+                f"{result['p95_ms']:>8.1f} {result['errors']:>7}"
+            )
+
+    def measure(self, database_url, options):
+        cookies = {settings.SESSION_COOKIE_NAME: staff_session_key()}
+        targets = [
+            ('shop_home', reverse('shop_home'), {}),
+            ('api_orders', reverse('api_orders'), cookies),
+        ]
+
+        rows = []
+        for server in options['servers'].split(','):
+            server = server.strip()
+            if server not in SERVERS:
+                self.stderr.write(f"Unknown server '{server}', skipping")
+                continue
+            port = free_port()
+            process = start_server(server, port, options['workers'], options['threads'], database_url)
+            base_url = f'http://127.0.0.1:{port}'
+            try:
+                if not wait_for_server(base_url, reverse('shop_home')):
+                    self.stderr.write(f'{server} did not start')
+                    continue
+                for name, path, target_cookies in targets:
+                    # Warm up imports, template caches and connections first
+                    run_load(base_url, path, options['concurrency'], options['concurrency'], target_cookies)
+                    result = run_load(base_url, path, options['requests'], options['concurrency'], target_cookies)
+                    rows.append((server, name, result))
+            finally:
+                stop_server(process)
+        return rows
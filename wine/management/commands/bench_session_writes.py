@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from wine.benchmarks import count_writes, scratch_database
+from wine.models import CustomUser, Product
+
+ENGINES = (
+    ('db', 'django.contrib.sessions.backends.db'),
+    ('cache', 'wine.sessions'),
+)
+
+
+class Command(BaseCommand):
+    help = "Count database writes per shop page view with DB-backed versus cache-backed sessions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', type=int, default=50, help='Page views per visitor type')
+
+    def handle(self, *args, **options):
+        views = options['views']
+        with scratch_database():
+            product = Product.objects.create(
+                name='Bench Merlot', description='', price=Decimal('500'), category='wine', stock=10 ** 6
+            )
+            customer = CustomUser.objects.create_user(username='bench_customer', password='x', user_type='customer')
+
+            self.stdout.write(f"{'sessions':<9} {'visitor':<10} {'writes/view':>12} {'writes/add':>11}")
+            for label, engine in ENGINES:
+                with override_settings(SESSION_ENGINE=engine):
+                    for visitor in ('anonymous', 'customer'):
+                        client = Client()
+                        if visitor == 'customer':
+                            client.force_login(customer)
+                        # First view creates the session (and cart); measure steady state
+                        client.get(reverse('shop_home'))
+
+                        with CaptureQueriesContext(connection) as browse:
+                            for _ in range(views):
+                                client.get(reverse('shop_home'))
+                        with CaptureQueriesContext(connection) as adds:
+                            for _ in range(views):
+                                client.post(
+                                    reverse('add_to_cart', args=[product.id]),
+                                    HTTP_REFERER=reverse('shop_home'),
+                                )
+                        self.stdout.write(
+                            f"{label:<9} {visitor:<10} {count_writes(browse.captured_queries) / views:>12.2f} "
+                            f"{count_writes(adds.captured_queries) / views:>11.2f}"
+                        )
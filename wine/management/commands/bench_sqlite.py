@@ -0,0 +1,161 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from wine.db import DEFAULT_SQLITE_PERFORMANCE, apply_sqlite_profile, sqlite_performance_profile
+from wine.models import Order, OrderItem, Product
+from wine.sketches import percentile
+
+PRODUCTS = 50
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark SQLite under concurrent kiosk checkouts and TV/dashboard "
+        "polls, with stock settings versus the SQLITE_PERFORMANCE profile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Concurrent checkout threads')
+        parser.add_argument('--readers', type=int, default=16, help='Concurrent board polling threads')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per profile')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('bench_sqlite needs the default database to be SQLite')
+
+        schema = self.collect_schema()
+        profiles = [
+            ('stock', None, 'DEFERRED'),
+            ('tuned', sqlite_performance_profile() or DEFAULT_SQLITE_PERFORMANCE, 'IMMEDIATE'),
+        ]
+
+        self.stdout.write(
+            f"{'profile':<8} {'checkouts/s':>12} {'locked':>7} "
+            f"{'read p50 ms':>12} {'read p95 ms':>12} {'read p99 ms':>12}"
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, profile, begin in profiles:
+                path = os.path.join(tmp, f'{name}.sqlite3')
+                self.create_database(path, schema, profile)
+                result = self.run_profile(path, profile, begin, options)
+                self.stdout.write(
+                    f"{name:<8} {result['writes'] / options['duration']:>12.1f} {result['locked']:>7} "
+                    f"{percentile(result['reads'], 50) * 1000:>12.2f} "
+                    f"{percentile(result['reads'], 95) * 1000:>12.2f} "
+                    f"{percentile(result['reads'], 99) * 1000:>12.2f}"
+                )
+
+    def collect_schema(self):
+        """CREATE statements for the tables a checkout touches."""
+        with connection.schema_editor(collect_sql=True) as editor:
+            for model in (Product, Order, OrderItem):
+                editor.create_model(model)
+        return editor.collected_sql
+
+    def connect(self, path, profile):
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        if profile:
+            apply_sqlite_profile(conn.cursor(), profile)
+        return conn
+
+    def create_database(self, path, schema, profile):
+        conn = self.connect(path, profile)
+        for statement in schema:
+            conn.execute(statement)
+        conn.executemany(
+            f'INSERT INTO {Product._meta.db_table} (id, name, description, price, category, stock, is_active) '
+            'VALUES (?, ?, ?, ?, ?, ?, 1)',
+            [(uuid.uuid4().hex, f'Product {i}', '', '499.00', 'wine', 10 ** 9) for i in range(PRODUCTS)],
+        )
+        conn.close()
+
+    def run_profile(self, path, profile, begin, options):
+        conn = self.connect(path, profile)
+        product_ids = [row[0] for row in conn.execute(f'SELECT id FROM {Product._meta.db_table}')]
+        conn.close()
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        result = {'writes': 0, 'locked': 0, 'reads': []}
+
+        def checkout(worker):
+            conn = self.connect(path, profile)
+            writes = locked = 0
+            n = 0
+            while not stop.is_set():
+                n += 1
+                items = [product_ids[(worker * 7 + n + k) % PRODUCTS] for k in range(3)]
+                try:
+                    self.write_order(conn, begin, items)
+                    writes += 1
+                except sqlite3.OperationalError as exc:
+                    if 'locked' not in str(exc):
+                        raise
+                    locked += 1
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+            conn.close()
+            with lock:
+                result['writes'] += writes
+                result['locked'] += locked
+
+        def poll():
+            conn = self.connect(path, profile)
+            latencies = []
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    conn.execute(
+                        f'SELECT id, token_number, status, created_at FROM {Order._meta.db_table} '
+                        "WHERE status NOT IN ('completed', 'cancelled') ORDER BY created_at LIMIT 20"
+                    ).fetchall()
+                    conn.execute(
+                        f'SELECT status, COUNT(*) FROM {Order._meta.db_table} GROUP BY status'
+                    ).fetchall()
+                except sqlite3.OperationalError:
+                    continue
+                latencies.append(time.perf_counter() - start)
+                time.sleep(0.005)
+            conn.close()
+            with lock:
+                result['reads'].extend(latencies)
+
+        threads = [threading.Thread(target=checkout, args=(i,)) for i in range(options['writers'])]
+        threads += [threading.Thread(target=poll) for _ in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def write_order(self, conn, begin, product_ids):
+        """One kiosk checkout: order, items and stock decrements in a transaction."""
+        now = timezone.now().isoformat()
+        order_id = uuid.uuid4().hex
+        conn.execute(f'BEGIN {begin}')
+        conn.execute(
+            f'INSERT INTO {Order._meta.db_table} (id, phone_number, order_type, token_number, '
+            'total_amount, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (order_id, '0000000000', 'pickup', '1234', str(Decimal('1497.00')), 'preparing', now, now),
+        )
+        for product_id in product_ids:
+            conn.execute(
+                f'INSERT INTO {OrderItem._meta.db_table} (id, order_id, product_id, quantity, price) '
+                'VALUES (?, ?, ?, 1, ?)',
+                (uuid.uuid4().hex, order_id, product_id, '499.00'),
+            )
+            conn.execute(
+                f'UPDATE {Product._meta.db_table} SET stock = stock - 1 WHERE id = ?', (product_id,)
+            )
+        conn.execute('COMMIT')
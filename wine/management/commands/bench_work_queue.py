@@ -0,0 +1,75 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from wine import workqueue
+from wine.benchmarks import scratch_database
+from wine.models import Order
+from wine.sketches import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate staff terminals working through the preparation queue "
+        "concurrently: orders per second and claim latency per number of "
+        "terminals, and a check that no order was claimed twice."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200, help='Orders in the queue per run')
+        parser.add_argument('--terminals', default='1,2,4,8', help='Comma separated terminal counts')
+        parser.add_argument('--prep-ms', type=float, default=20.0, help='Simulated preparation time per order')
+
+    def handle(self, *args, **options):
+        counts = [int(n) for n in options['terminals'].split(',')]
+        with scratch_database():
+            self.stdout.write(
+                f"{'terminals':>9} {'orders/s':>9} {'speedup':>8} {'claim p50 ms':>13} "
+                f"{'claim p99 ms':>13} {'double claims':>14}"
+            )
+            base = None
+            for terminals in counts:
+                Order.objects.all().delete()
+                Order.objects.bulk_create(
+                    Order(phone_number='1', total_amount=Decimal('100'), status='preparing', order_type='pickup')
+                    for _ in range(options['orders'])
+                )
+                claimed, latencies, elapsed = self.run(terminals, options['prep_ms'] / 1000)
+                rate = len(claimed) / elapsed
+                base = base or rate
+                self.stdout.write(
+                    f"{terminals:>9} {rate:>9.1f} {rate / base:>7.2f}x "
+                    f"{percentile(latencies, 50) * 1000:>13.2f} {percentile(latencies, 99) * 1000:>13.2f} "
+                    f"{len(claimed) - len(set(claimed)):>14}"
+                )
+
+    def run(self, terminals, prep_seconds):
+        claimed, latencies = [], []
+        lock = threading.Lock()
+
+        def work(terminal):
+            try:
+                while True:
+                    start = time.perf_counter()
+                    order = workqueue.claim_next(terminal)
+                    took = time.perf_counter() - start
+                    if order is None:
+                        return
+                    with lock:
+                        claimed.append(order.pk)
+                        latencies.append(took)
+                    time.sleep(prep_seconds)
+                    workqueue.finish(order.pk, terminal)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(f'till-{n}',)) for n in range(terminals)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return claimed, latencies, time.perf_counter() - start
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from wine.preptimes import rebuild_prep_times
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the hourly prep-time sketches behind the prep times report "
+        "from the order status log. Status changes update them as they happen; "
+        "run this after imports or if a sketch update failed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Only rebuild the last N days, today included (default: all time)')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Orders read per batch (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rows = rebuild_prep_times(days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {rows} prep-time sketches in {time.perf_counter() - start:.1f}s'
+        ))
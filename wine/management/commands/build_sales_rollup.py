@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from wine.leaderboard import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily sales rollup behind the top-sellers leaderboard "
+        "from completed orders. Completed orders update it as they happen; run "
+        "this on first deploy, after imports, or periodically (e.g. nightly "
+        "with --days 2) to pick up bulk status changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Only rebuild the last N days, today included (default: all time)')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows inserted per batch (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rows = rebuild_daily_sales(days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {rows} daily sales rows in {time.perf_counter() - start:.1f}s'
+        ))
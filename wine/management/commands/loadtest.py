@@ -0,0 +1,165 @@
+import json
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from wine.benchmarks.http import wait_for_server
+from wine.benchmarks.scenarios import DEFAULT_MIX, SCENARIOS, Recorder, VirtualUser
+from wine.benchmarks.server import (
+    SERVERS, database_copy, free_port, staff_session_key, start_server, stop_server,
+)
+from wine.models import Product
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, users = part.strip().partition('=')
+        if name not in SCENARIOS:
+            raise CommandError(f"Unknown scenario '{name}'; choose from {', '.join(SCENARIOS)}")
+        mix[name] = int(users or 1)
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Run scripted shop, kiosk, staff and TV scenarios against a local "
+        "server and report latency percentiles, throughput and errors per "
+        "scenario. Results are written as JSON and can be compared to an "
+        "earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of an already running server')
+        parser.add_argument('--server', choices=SERVERS, default='wsgi',
+                            help='Server to start when --url is not given')
+        parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help='Concurrent users per scenario, e.g. "%s"' % DEFAULT_MIX)
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds of measured load')
+        parser.add_argument('--warmup', type=float, default=3.0, help='Seconds of unmeasured load first')
+        parser.add_argument('--think', type=float, default=0.0,
+                            help='Seconds interactive users wait between journeys')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds dashboard and TV pollers wait between polls')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Results file (default loadtest-<timestamp>.json)')
+        parser.add_argument('--compare', help='Earlier results file to compare against')
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+
+        with ExitStack() as stack:
+            base_url = options['url']
+            database_url = None
+            if not base_url:
+                # The orders, carts and sessions of the run go to a copy
+                database_url = stack.enter_context(database_copy())
+            context = self.build_context()
+            if not base_url:
+                port = free_port()
+                process = start_server(
+                    options['server'], port, options['workers'], options['threads'], database_url,
+                )
+                stack.callback(stop_server, process)
+                base_url = f'http://127.0.0.1:{port}'
+            if not wait_for_server(base_url, reverse('shop_home')):
+                raise CommandError(f'No server answering at {base_url}')
+            recorder = self.run(base_url, mix, context, options)
+
+        results = {
+            'started_at': timezone.now().isoformat(),
+            'url': options['url'],
+            'server': None if options['url'] else options['server'],
+            'mix': mix,
+            'duration': options['duration'],
+            'think': options['think'],
+            'poll_interval': options['poll_interval'],
+            'scenarios': recorder.results(options['duration']),
+        }
+        output = options['output'] or timezone.now().strftime('loadtest-%Y%m%d-%H%M%S.json')
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+        self.report(results['scenarios'])
+        self.stdout.write(f'Results written to {output}')
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f)['scenarios'], results['scenarios'])
+
+    def build_context(self):
+        products = [
+            {'id': str(p['id']), 'price': str(p['price']), 'category': p['category'], 'name': p['name']}
+            for p in Product.objects.filter(is_active=True, stock__gt=100)
+            .values('id', 'price', 'category', 'name')[:500]
+        ]
+        if not products:
+            raise CommandError('No active products with stock to order; seed the database first')
+        return {
+            'products': products,
+            'categories': sorted({p['category'] for p in products}),
+            'staff_session': staff_session_key(),
+        }
+
+    def run(self, base_url, mix, context, options):
+        recorder = Recorder()
+        stop = threading.Event()
+
+        def worker(name, index):
+            journey, polls = SCENARIOS[name]
+            pause = options['poll_interval'] if polls else options['think']
+            user = VirtualUser(base_url, name, recorder, random.Random(f"{options['seed']}:{name}:{index}"))
+            while not stop.is_set():
+                journey(user, context)
+                recorder.iteration(name)
+                if pause:
+                    stop.wait(pause)
+            user.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(name, i), daemon=True)
+            for name, users in mix.items() for i in range(users)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['warmup'])
+        recorder.recording = True
+        time.sleep(options['duration'])
+        recorder.recording = False
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=60)
+        return recorder
+
+    def report(self, scenarios):
+        self.stdout.write(
+            f"{'scenario':<28} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'err %':>6}"
+        )
+        for name, result in scenarios.items():
+            self.stdout.write(self.row(name, result))
+            for step, step_result in result['steps'].items():
+                self.stdout.write(self.row(f'  {step}', step_result))
+
+    def row(self, label, result):
+        return (
+            f"{label:<28} {result['rps']:>8.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+            f"{result['p99_ms']:>8.1f} {result['errors']:>7} {result['error_rate'] * 100:>6.1f}"
+        )
+
+    def compare(self, before, after):
+        self.stdout.write('')
+        self.stdout.write(f"{'scenario':<16} {'p95 before':>11} {'p95 after':>10} {'change':>8} "
+                          f"{'req/s before':>13} {'req/s after':>12}")
+        for name in sorted(set(before) & set(after)):
+            old, new = before[name], after[name]
+            change = (new['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0.0
+            self.stdout.write(
+                f"{name:<16} {old['p95_ms']:>11.1f} {new['p95_ms']:>10.1f} {change:>+7.1f}% "
+                f"{old['rps']:>13.1f} {new['rps']:>12.1f}"
+            )
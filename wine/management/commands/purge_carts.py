@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from wine.maintenance import purge_abandoned_carts, purge_expired_sessions, purge_order_changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete abandoned carts (and their items) idle for longer than "
+        "CART_IDLE_DAYS, plus expired sessions and order change feed "
+        "log rows older than ORDER_CHANGE_LOG_DAYS, in bounded batches. "
+        "Safe to run from cron or a scheduler loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--idle-days', type=int, default=settings.CART_IDLE_DAYS,
+                            help='Purge carts not updated for this many days (default: %(default)s)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows deleted per transaction (default: %(default)s)')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between batches to let other writers in')
+        parser.add_argument('--include-user-carts', action='store_true',
+                            help='Also purge idle carts of logged-in customers')
+        parser.add_argument('--skip-sessions', action='store_true',
+                            help='Do not purge expired sessions')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        carts = purge_abandoned_carts(
+            idle_days=options['idle_days'],
+            batch_size=options['batch_size'],
+            include_user_carts=options['include_user_carts'],
+            pause=options['pause'],
+        )
+        sessions = 0
+        if not options['skip_sessions']:
+            sessions = purge_expired_sessions(batch_size=options['batch_size'], pause=options['pause'])
+        changes = purge_order_changes(batch_size=options['batch_size'], pause=options['pause'])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {carts['carts']} carts, {carts['cart_items']} cart items and "
+            f"{sessions} expired sessions and {changes} order change log rows in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,86 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+
+from wine.benchmarks import scratch_database
+from wine.benchmarks.suite import BENCHMARKS, build_fixture, compare, run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Time model hot paths and JSON views against a seeded scratch database, "
+        "count their queries and compare with a saved baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=5000, help='Seeded orders')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark')
+        parser.add_argument('--only', help='Comma separated substrings of benchmark names to run')
+        parser.add_argument('--baseline', default=os.path.join(settings.BASE_DIR, 'benchmark-baseline.json'))
+        parser.add_argument('--save-baseline', action='store_true', help='Write these results as the baseline')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed slowdown over the baseline median, as a fraction')
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        names = list(BENCHMARKS)
+        if options['only']:
+            patterns = [p.strip() for p in options['only'].split(',')]
+            names = [name for name in names if any(p in name for p in patterns)]
+
+        results = {}
+        # Time the code itself, not the request instrumentation around it
+        with scratch_database(), override_settings(PERF_INSTRUMENTATION=False):
+            fixture = build_fixture(orders=options['orders'])
+            for name in names:
+                results[name] = run_benchmark(BENCHMARKS[name], fixture, options['repeat'])
+
+        baseline = None
+        if os.path.exists(options['baseline']) and not options['save_baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            if baseline['orders'] != options['orders']:
+                self.stderr.write(
+                    f"Baseline was recorded with --orders {baseline['orders']}; timings are not comparable"
+                )
+
+        self.report(results, baseline['benchmarks'] if baseline else {})
+
+        document = {
+            'recorded_at': timezone.now().isoformat(),
+            'orders': options['orders'],
+            'repeat': options['repeat'],
+            'benchmarks': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(document, f, indent=2)
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as f:
+                json.dump(document, f, indent=2)
+            self.stdout.write(f"Baseline saved to {options['baseline']}")
+            return
+
+        if baseline:
+            regressions = compare(baseline['benchmarks'], results, options['threshold'])
+            for name, reason in regressions:
+                self.stdout.write(self.style.ERROR(f'REGRESSION {name}: {reason}'))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def report(self, results, baseline):
+        self.stdout.write(
+            f"{'benchmark':<34} {'median ms':>10} {'min ms':>8} {'queries':>8} {'base ms':>8} {'base q':>7} {'bytes':>9}"
+        )
+        for name, result in results.items():
+            before = baseline.get(name)
+            base = f"{before['median_ms']:>8.1f} {before['queries']:>7}" if before else f"{'-':>8} {'-':>7}"
+            self.stdout.write(
+                f"{name:<34} {result['median_ms']:>10.1f} {result['min_ms']:>8.1f} {result['queries']:>8} {base}"
+                f" {result.get('bytes', '-'):>9}"
+            )
@@ -0,0 +1,387 @@
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from wine.models import (
+    Cart, CartItem, ComboItem, ComboOffer, CustomUser, Offer, Order, OrderItem, OrderStatusEvent, Payment, Product,
+)
+
+BRANDS = {
+    'whisky': ['Glen Arden', 'Highland Oak', 'Old Forge', 'Peat Hollow', 'Amrut Ridge', 'Blackwater'],
+    'vodka': ['Polar Birch', 'Crystal Steppe', 'Volga Mist', 'North Frost', 'Silver Tundra'],
+    'beer': ['Hop Yard', 'Copper Kettle', 'Monsoon Brew', 'Harbour Lager', 'Bira Hills'],
+    'wine': ['Sula Vale', 'Chateau Belle', 'Nashik Ridge', 'Vina Sol', 'Rosso Antico', 'Fratelli'],
+    'rum': ['Cane Island', 'Old Monk Bay', 'Captain Reef', 'Spice Harbour'],
+    'gin': ['Juniper Lane', 'Botanist Row', 'Greater Garden', 'Hapusa Hill'],
+    'tequila': ['Agave Azul', 'Sierra Sol', 'Casa Jalisco'],
+}
+STYLES = {
+    'whisky': ['Single Malt', 'Blended', 'Bourbon', 'Rye', 'Peated'],
+    'vodka': ['Classic', 'Citrus', 'Premium', 'Triple Distilled'],
+    'beer': ['Lager', 'Wheat', 'IPA', 'Stout', 'Strong'],
+    'wine': ['Shiraz', 'Cabernet Sauvignon', 'Merlot', 'Chenin Blanc', 'Sauvignon Blanc', 'Rose', 'Brut'],
+    'rum': ['Dark', 'White', 'Spiced', 'Aged'],
+    'gin': ['London Dry', 'Pink', 'Navy Strength', 'Citrus'],
+    'tequila': ['Blanco', 'Reposado', 'Anejo'],
+}
+SIZES = ['180ml', '375ml', '650ml', '750ml', '1L']
+# Price band per category, in rupees
+PRICES = {
+    'whisky': (900, 9000), 'vodka': (500, 3500), 'beer': (120, 450), 'wine': (600, 4500),
+    'rum': (400, 2500), 'gin': (800, 4000), 'tequila': (1500, 6000),
+}
+CATEGORY_WEIGHTS = {'whisky': 25, 'beer': 25, 'wine': 20, 'vodka': 12, 'rum': 10, 'gin': 5, 'tequila': 3}
+
+FIRST_NAMES = ['Aarav', 'Priya', 'Rohan', 'Ananya', 'Vikram', 'Meera', 'Arjun', 'Kavya', 'Rahul',
+               'Sneha', 'Karan', 'Divya', 'Nikhil', 'Pooja', 'Aditya', 'Isha', 'Sameer', 'Neha']
+LAST_NAMES = ['Sharma', 'Patel', 'Iyer', 'Reddy', 'Nair', 'Gupta', 'Singh', 'Menon', 'Das', 'Kapoor']
+STREETS = ['MG Road', 'Brigade Road', 'Linking Road', 'Park Street', 'Anna Salai', 'FC Road', 'Residency Road']
+CITIES = ['Bengaluru', 'Mumbai', 'Pune', 'Chennai', 'Kolkata', 'Hyderabad']
+
+# Orders per hour of day (shop opens at 10) and per weekday (Mon..Sun)
+HOUR_WEIGHTS = [0] * 10 + [2, 3, 4, 4, 3, 3, 4, 6, 9, 12, 12, 10, 6, 2]
+WEEKDAY_WEIGHTS = [8, 8, 9, 10, 14, 16, 12]
+
+# Status of orders older than a day, and of orders still in the last few hours
+SETTLED_STATUS = (['completed', 'cancelled'], [93, 7])
+RECENT_STATUS = (['pending', 'confirmed', 'preparing', 'ready', 'completed', 'cancelled'], [15, 10, 25, 15, 30, 5])
+PAYMENT_METHOD = (['upi', 'card', 'cash', 'online'], [45, 20, 20, 15])
+# Statuses an order went through to reach its current one
+STATUS_PATHS = {
+    'pending': ['pending'],
+    'confirmed': ['pending', 'confirmed'],
+    'preparing': ['pending', 'preparing'],
+    'ready': ['pending', 'preparing', 'ready'],
+    'completed': ['pending', 'preparing', 'ready', 'completed'],
+    'cancelled': ['pending', 'cancelled'],
+}
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at/updated_at values we generate."""
+    fields = [
+        field for model in models for field in model._meta.local_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with deterministic synthetic products, combos, offers, "
+        "customers, carts, orders, order items, payments and status history for benchmarking."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--products', type=int, default=300)
+        parser.add_argument('--combos', type=int, default=40)
+        parser.add_argument('--offers', type=int, default=20)
+        parser.add_argument('--customers', type=int, default=5000)
+        parser.add_argument('--carts', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--days', type=int, default=180, help='Spread orders over this many past days')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete all catalog, cart and order data and seeded customers first')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not ask before --clear deletes data (asked outside DEBUG)')
+        parser.add_argument('--now', type=self.parse_now,
+                            help='Anchor timestamps to this ISO datetime (or the end of this date) instead of '
+                                 'the current time, so a seed gives the same rows on any day')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = f"seed{options['seed']}_"
+        self.now = options['now'] or timezone.now()
+
+        if options['clear']:
+            if options['interactive'] and not settings.DEBUG:
+                answer = input(
+                    'This deletes all products, combos, offers, carts, orders and seeded customers '
+                    'in the database. Type "yes" to continue: '
+                )
+                if answer != 'yes':
+                    raise CommandError('Seeding cancelled')
+            self.clear()
+        elif CustomUser.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(f"Seed {options['seed']} is already loaded; use --clear or another --seed")
+
+        with explicit_timestamps(Cart, Offer, Order, Payment):
+            self.step('products', self.create_products, options['products'])
+            self.step('combos', self.create_combos, options['combos'])
+            self.step('offers', self.create_offers, options['offers'])
+            self.step('customers', self.create_customers, options['customers'])
+            self.step('carts', self.create_carts, options['carts'])
+            self.step('orders', self.create_orders, options['orders'], options['days'])
+
+    @staticmethod
+    def parse_now(value):
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(value)
+            moment = datetime.combine(day, dt_time.max)
+        return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+    def step(self, label, create, *args):
+        start = time.perf_counter()
+        count = create(*args)
+        self.stdout.write(f'{label:<10} {count:>10} rows in {time.perf_counter() - start:6.1f}s')
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def clear(self):
+        # Children first so every delete is a plain DELETE without cascading collection
+        for model in (Payment, OrderItem, OrderStatusEvent, Order, CartItem, Cart, Offer.products.through,
+                      Offer.combo_offers.through, Offer, ComboItem, ComboOffer, Product):
+            model.objects.all().delete()
+        CustomUser.objects.filter(username__startswith='seed', user_type='customer').delete()
+
+    def bulk(self, model, objs):
+        model.objects.bulk_create(objs, batch_size=self.batch_size)
+        return len(objs)
+
+    # -- catalog ----------------------------------------------------------
+
+    def create_products(self, count):
+        categories = list(CATEGORY_WEIGHTS)
+        weights = list(CATEGORY_WEIGHTS.values())
+        products = []
+        for _ in range(count):
+            category = self.rng.choices(categories, weights)[0]
+            brand = self.rng.choice(BRANDS[category])
+            style = self.rng.choice(STYLES[category])
+            size = self.rng.choice(SIZES)
+            low, high = PRICES[category]
+            products.append(Product(
+                id=self.uuid(),
+                name=f'{brand} {style} {size}',
+                description=f'{style} {category} from {brand}, {size} bottle.',
+                price=Decimal(self.rng.randint(low, high)).quantize(Decimal('1.00')),
+                category=category,
+                stock=0 if self.rng.random() < 0.05 else self.rng.randint(5, 500),
+                is_active=self.rng.random() < 0.95,
+            ))
+        self.products = products
+        # A few products sell far more than the rest
+        self.popularity = [1 / (rank + 1) ** 0.8 for rank in range(len(products))]
+        return self.bulk(Product, products)
+
+    def create_combos(self, count):
+        combos, items = [], []
+        for n in range(count):
+            combo = ComboOffer(
+                id=self.uuid(),
+                name=f'Combo {n + 1}',
+                description='Bundle deal',
+                discount_percentage=Decimal(self.rng.choice([5, 10, 15, 20])),
+                is_active=self.rng.random() < 0.9,
+            )
+            combos.append(combo)
+            for product in self.rng.sample(self.products, min(self.rng.randint(2, 4), len(self.products))):
+                items.append(ComboItem(id=self.uuid(), combo=combo, product=product,
+                                       quantity=self.rng.randint(1, 2)))
+        self.combos = combos
+        self.combo_prices = {}
+        prices = {p.id: p.price for p in self.products}
+        for item in items:
+            self.combo_prices[item.combo.id] = self.combo_prices.get(item.combo.id, 0) + prices[item.product.id] * item.quantity
+        for combo in combos:
+            discount = Decimal('1') - combo.discount_percentage / Decimal('100')
+            self.combo_prices[combo.id] = (self.combo_prices.get(combo.id, Decimal('0')) * discount).quantize(Decimal('1.00'))
+        self.bulk(ComboOffer, combos)
+        return self.bulk(ComboItem, items) + len(combos)
+
+    def create_offers(self, count):
+        offers, offer_products, offer_combos = [], [], []
+        offer_types = [choice for choice, _ in Offer.OFFER_TYPES]
+        for n in range(count):
+            start = self.now - timedelta(days=self.rng.randint(0, 60))
+            offer = Offer(
+                id=self.uuid(),
+                title=f'Offer {n + 1}',
+                description='Limited period offer',
+                offer_type=self.rng.choice(offer_types),
+                discount_percentage=Decimal(self.rng.choice([5, 10, 15, 25])),
+                start_date=start,
+                # Roughly half are still running
+                end_date=start + timedelta(days=self.rng.randint(1, 90)),
+                is_active=self.rng.random() < 0.85,
+                created_at=start,
+            )
+            offers.append(offer)
+            for product in self.rng.sample(self.products, min(self.rng.randint(1, 3), len(self.products))):
+                offer_products.append(Offer.products.through(offer_id=offer.id, product_id=product.id))
+            if self.combos and self.rng.random() < 0.3:
+                offer_combos.append(Offer.combo_offers.through(
+                    offer_id=offer.id, combooffer_id=self.rng.choice(self.combos).id
+                ))
+        self.bulk(Offer, offers)
+        self.bulk(Offer.products.through, offer_products)
+        self.bulk(Offer.combo_offers.through, offer_combos)
+        return len(offers) + len(offer_products) + len(offer_combos)
+
+    # -- people -----------------------------------------------------------
+
+    def create_customers(self, count):
+        password = make_password(None)
+        customers = []
+        for n in range(count):
+            first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+            customers.append(CustomUser(
+                username=f'{self.prefix}{n}',
+                email=f'{first.lower()}.{last.lower()}{n}@example.com',
+                first_name=first,
+                last_name=last,
+                full_name=f'{first} {last}',
+                phone_number=self.phone(),
+                user_type='customer',
+                password=password,
+                date_joined=self.now - timedelta(days=self.rng.randint(0, 720)),
+            ))
+        self.bulk(CustomUser, customers)
+        # Integer pks are only known after the insert on some backends
+        self.customers = list(CustomUser.objects.filter(username__startswith=self.prefix).values_list('id', flat=True))
+        return count
+
+    def phone(self):
+        return f'{self.rng.choice("6789")}{self.rng.randint(0, 10 ** 9 - 1):09d}'
+
+    def address(self):
+        return f'{self.rng.randint(1, 400)}, {self.rng.choice(STREETS)}, {self.rng.choice(CITIES)}'
+
+    # -- carts and orders -------------------------------------------------
+
+    def create_carts(self, count):
+        carts, items = [], []
+        for _ in range(count):
+            updated = self.now - timedelta(minutes=self.rng.randint(0, 30 * 24 * 60))
+            owned = self.customers and self.rng.random() < 0.3
+            cart = Cart(
+                id=self.uuid(),
+                user_id=self.rng.choice(self.customers) if owned else None,
+                session_key=None if owned else '%032x' % self.rng.getrandbits(128),
+                created_at=updated - timedelta(minutes=self.rng.randint(0, 120)),
+                updated_at=updated,
+            )
+            carts.append(cart)
+            for product in self.pick_products(self.rng.randint(1, 3)):
+                items.append(CartItem(id=self.uuid(), cart=cart, product=product, quantity=self.rng.randint(1, 3)))
+        self.bulk(Cart, carts)
+        return self.bulk(CartItem, items) + len(carts)
+
+    def pick_products(self, k):
+        picked = {p.id: p for p in self.rng.choices(self.products, self.popularity, k=k)}
+        return list(picked.values())
+
+    def order_time(self, days):
+        """A timestamp in the last ``days`` days, busier on weekends and evenings."""
+        while True:
+            day = self.now - timedelta(days=self.rng.randint(0, days - 1))
+            # Accept/reject on weekday, with gentle growth towards today
+            weight = WEEKDAY_WEIGHTS[day.weekday()] / max(WEEKDAY_WEIGHTS)
+            weight *= 0.6 + 0.4 * (1 - (self.now - day).days / days)
+            if self.rng.random() < weight:
+                break
+        hour = self.rng.choices(range(24), HOUR_WEIGHTS)[0]
+        moment = day.replace(hour=hour, minute=self.rng.randint(0, 59), second=self.rng.randint(0, 59))
+        return min(moment, self.now)
+
+    def create_orders(self, count, days):
+        created = 0
+        while created < count:
+            chunk = min(self.batch_size, count - created)
+            orders, items, payments, events = [], [], [], []
+            for _ in range(chunk):
+                self.build_order(days, orders, items, payments, events)
+            with transaction.atomic():
+                self.bulk(Order, orders)
+                self.bulk(OrderItem, items)
+                self.bulk(Payment, payments)
+                self.bulk(OrderStatusEvent, events)
+            created += chunk
+            self.stdout.write(f'  {created}/{count} orders', ending='\r')
+        self.stdout.write('')
+        return created
+
+    def build_order(self, days, orders, items, payments, events):
+        created_at = self.order_time(days)
+        recent = self.now - created_at < timedelta(hours=3)
+        statuses, weights = RECENT_STATUS if recent else SETTLED_STATUS
+        status = self.rng.choices(statuses, weights)[0]
+        order_type = 'pickup' if self.rng.random() < 0.6 else 'delivery'
+        user_id = self.rng.choice(self.customers) if self.customers and self.rng.random() < 0.55 else None
+
+        order = Order(
+            id=self.uuid(),
+            user_id=user_id,
+            phone_number=self.phone(),
+            order_type=order_type,
+            delivery_address=self.address() if order_type == 'delivery' else None,
+            token_number=str(self.rng.randint(1000, 9999)) if order_type == 'pickup' else None,
+            status=status,
+            created_at=created_at,
+            updated_at=created_at + timedelta(minutes=self.rng.randint(0, 90) if status != 'pending' else 0),
+        )
+
+        total = Decimal('0')
+        for product in self.pick_products(self.rng.randint(1, 4)):
+            quantity = self.rng.choices([1, 2, 3, 6], [70, 20, 7, 3])[0]
+            items.append(OrderItem(id=self.uuid(), order=order, product=product, quantity=quantity, price=product.price))
+            total += product.price * quantity
+        if self.combos and self.rng.random() < 0.1:
+            combo = self.rng.choice(self.combos)
+            price = self.combo_prices[combo.id]
+            items.append(OrderItem(id=self.uuid(), order=order, combo=combo, quantity=1, price=price))
+            total += price
+        order.total_amount = total
+        orders.append(order)
+
+        # Status history spread evenly up to the last update (no extra
+        # random draws, so the rest of the data stays the same per seed)
+        path = STATUS_PATHS[status]
+        step = (order.updated_at - created_at) / max(len(path) - 1, 1)
+        for i, event_status in enumerate(path):
+            events.append(OrderStatusEvent(
+                order=order, old_status=path[i - 1] if i else None, status=event_status,
+                created_at=created_at + step * i,
+            ))
+
+        method = self.rng.choices(*PAYMENT_METHOD)[0]
+        if status == 'cancelled':
+            payment_status = 'failed'
+        elif status == 'completed' or method != 'cash':
+            payment_status = 'completed'
+        else:
+            payment_status = 'pending'
+        payments.append(Payment(
+            id=self.uuid(),
+            order=order,
+            amount=total,
+            status=payment_status,
+            payment_method=method,
+            transaction_id=f'SEED-{order.id.hex[:10].upper()}',
+            created_at=created_at,
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.12 on 2026-10-19 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine', '0013_remove_order_expected_delivery_alter_order_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(condition=models.Q(('user__isnull', True)), fields=['session_key'], name='cart_anonymous_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', ['completed', 'cancelled']), _negated=True), fields=['status', 'created_at'], name='order_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['token_number'], name='order_token_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('stock__gt', 0)), fields=['category', 'name'], name='product_sellable_idx'),
+        ),
+    ]
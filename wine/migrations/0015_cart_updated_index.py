@@ -0,0 +1,17 @@
+# Generated by Django 5.1.12 on 2026-10-19 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine', '0014_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['updated_at'], name='cart_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.12 on 2026-10-19 18:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine', '0016_customer_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wine.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wine.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-count'], name='copurchase_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'other'), name='copurchase_pair_unique')],
+            },
+        ),
+    ]
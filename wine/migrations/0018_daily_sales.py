@@ -0,0 +1,30 @@
+# Generated by Django 5.1.12 on 2026-10-19 18:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine', '0017_copurchase_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(blank=True, max_length=20)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('combo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wine.combooffer')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wine.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='daily_sales_day_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('product__isnull', False)), fields=('day', 'product'), name='daily_sales_product_unique'), models.UniqueConstraint(condition=models.Q(('combo__isnull', False)), fields=('day', 'combo'), name='daily_sales_combo_unique')],
+            },
+        ),
+    ]
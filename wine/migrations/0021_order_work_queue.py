@@ -0,0 +1,49 @@
+# Generated by Django 5.1.12 on 2026-10-19 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine', '0020_order_status_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminalThroughput',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('terminal', models.CharField(max_length=40)),
+                ('hour', models.DateTimeField()),
+                ('claimed', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('released', models.PositiveIntegerField(default=0)),
+                ('expired', models.PositiveIntegerField(default=0)),
+                ('busy_seconds', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=40, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('order_type', 'pickup'), ('status__in', ['pending', 'confirmed', 'preparing'])), fields=['created_at', 'id'], name='order_work_queue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='terminalthroughput',
+            constraint=models.UniqueConstraint(fields=('terminal', 'hour'), name='terminal_hour_unique'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.12 on 2026-10-19 19:31
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def fill_full_name_last(apps, schema_editor):
+    CustomUser = apps.get_model('wine', 'CustomUser')
+    users = CustomUser.objects.exclude(full_name__isnull=True).exclude(full_name='').only('id', 'full_name')
+    changed = []
+    for user in users.iterator():
+        words = user.full_name.split()
+        if words:
+            user.full_name_last = words[-1][:150]
+            changed.append(user)
+    CustomUser.objects.bulk_update(changed, ['full_name_last'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('wine', '0021_order_work_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='full_name_last',
+            field=models.CharField(blank=True, default='', editable=False, max_length=150),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Lower('full_name_last'), name='user_full_name_last_lower_idx'),
+        ),
+        migrations.RunPython(fill_full_name_last, migrations.RunPython.noop),
+    ]
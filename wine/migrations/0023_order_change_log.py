@@ -0,0 +1,20 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine', '0022_customuser_full_name_last'),
+    ]
+
+    operations = [
+        # Existing tombstones stay valid: changes to orders that no longer exist
+        migrations.RenameModel('OrderTombstone', 'OrderChange'),
+        migrations.RenameField('orderchange', 'deleted_at', 'changed_at'),
+        migrations.AlterField(
+            model_name='orderchange',
+            name='changed_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.12 on 2026-10-19 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine', '0023_order_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderchange',
+            name='old_status',
+            field=models.CharField(blank=True, max_length=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderchange',
+            name='status',
+            field=models.CharField(blank=True, max_length=15, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.12 on 2026-10-19 19:49
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine', '0024_order_change_status'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_changes_idx',
+        ),
+    ]
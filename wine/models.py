@@ -2,6 +2,7 @@ from decimal import Decimal
 import uuid
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
@@ -18,10 +19,29 @@ class CustomUser(AbstractUser):
     full_name = models.CharField(max_length=200, blank=True, null=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     raw_password = models.CharField(max_length=128, blank=True, null=True)
+    # Last word of full_name, searchable on its own: "smith" finds "John Smith"
+    full_name_last = models.CharField(max_length=150, blank=True, default='', editable=False)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Staff customer directory: newest first, keyset paginated
+            models.Index(fields=['user_type', '-date_joined', '-id'], name='user_directory_idx'),
+            # Prefix search (see wine.customers.search_customers)
+            models.Index(Lower('username'), name='user_username_lower_idx'),
+            models.Index(Lower('full_name'), name='user_full_name_lower_idx'),
+            models.Index(Lower('full_name_last'), name='user_full_name_last_lower_idx'),
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+            models.Index(fields=['phone_number'], name='user_phone_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.is_superuser:
             self.user_type = 'admin'
+        words = (self.full_name or '').split()
+        self.full_name_last = words[-1][:150] if words else ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'full_name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'full_name_last'}
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -52,6 +72,16 @@ class Product(models.Model):
     stock = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Kiosk / shop catalog: only sellable products are ever listed
+            models.Index(
+                fields=['category', 'name'],
+                condition=models.Q(is_active=True, stock__gt=0),
+                name='product_sellable_idx',
+            ),
+        ]
+
     def is_in_stock(self):
         return self.stock > 0
     
@@ -101,6 +131,18 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Anonymous carts are looked up by session key on every cart view
+            models.Index(
+                fields=['session_key'],
+                condition=models.Q(user__isnull=True),
+                name='cart_anonymous_session_idx',
+            ),
+            # Abandoned cart purge scans by last activity
+            models.Index(fields=['updated_at'], name='cart_updated_idx'),
+        ]
+
 
 # -------------------- OFFER --------------------
 class Offer(models.Model):
@@ -167,6 +209,15 @@ class CartItem(models.Model):
     offer = models.ForeignKey(Offer, on_delete=models.CASCADE, null=True, blank=True)
     quantity = models.PositiveIntegerField(default=1)
     
+    def get_price(self):
+        if self.product:
+            return self.product.price
+        elif self.combo:
+            return self.combo.get_discounted_price()
+        elif self.offer:
+            return self.offer.total_discounted_price
+        return Decimal('0')
+
     def get_total_price(self):
         if self.product:
             return self.product.price * Decimal(str(self.quantity))
@@ -232,82 +283,90 @@ class Order(models.Model):
     status = models.CharField(max_length=15, choices=ORDER_STATUS, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Preparation work queue (wine/workqueue.py): the staff terminal
+    # preparing this order, and until when its claim holds
+    claimed_by = models.CharField(max_length=40, null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    claim_expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # TV board, staff dashboards: completed/cancelled orders are the
+            # bulk of the table and never shown there
+            models.Index(
+                fields=['status', 'created_at'],
+                condition=~models.Q(status__in=['completed', 'cancelled']),
+                name='order_active_idx',
+            ),
+            models.Index(fields=['token_number'], name='order_token_idx'),
+            # Customer directory: per-customer stats and latest order
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # Work queue: pickup orders still to prepare, oldest first
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(order_type='pickup', status__in=['pending', 'confirmed', 'preparing']),
+                name='order_work_queue_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Order {self.id}"
     
     # In your models.py Order class
+    # (status, name, description) of the steps a customer sees
+    TIMELINE_STEPS = (
+        ('pending', 'Order Placed', 'Your order has been received'),
+        ('confirmed', 'Order Confirmed', "We've confirmed your order"),
+        ('preparing', 'Processing', 'Preparing your items'),
+    )
+    TIMELINE_PICKUP_STEPS = (
+        ('ready', 'Ready for Pickup', 'Your order is ready'),
+        ('completed', 'Picked Up', 'Order collected successfully'),
+    )
+    TIMELINE_DELIVERY_STEPS = (
+        ('ready', 'Out for Delivery', 'Your order is on the way'),
+        ('completed', 'Delivered', 'Order delivered successfully'),
+    )
+    TIMELINE_CANCELLED_STEP = ('cancelled', 'Cancelled', 'This order was cancelled')
+
     def get_status_timeline(self):
-        timeline = []
-        
-        # Define all possible steps
-        steps = [
-            {
-                'name': 'Order Placed',
-                'description': 'Your order has been received',
-                'status': 'pending',
-                'time': self.created_at if self.status != 'cancelled' else None
-            },
+        """
+        Steps with ``name``, ``description``, ``status``, ``time`` (when the
+        order last entered it, None if it never did), ``completed`` and
+        ``current``. Times come from ``status_events``: one query, none if
+        prefetched. Built once per instance and status.
+        """
+        cached = getattr(self, '_status_timeline', None)
+        if cached is not None and cached[0] == self.status:
+            return cached[1]
+
+        reached = {}
+        for event in self.status_events.all():
+            reached[event.status] = event.created_at
+        reached['pending'] = reached.get('pending', self.created_at)
+
+        steps = self.TIMELINE_STEPS + (
+            self.TIMELINE_DELIVERY_STEPS if self.order_type == 'delivery' else self.TIMELINE_PICKUP_STEPS
+        )
+        statuses = [status for status, _, _ in steps]
+        if self.status == 'cancelled':
+            # Keep the steps it got through, then the cancellation
+            steps = tuple(step for step in steps if step[0] in reached) + (self.TIMELINE_CANCELLED_STEP,)
+            statuses = [status for status, _, _ in steps]
+        current_index = statuses.index(self.status) if self.status in statuses else 0
+
+        timeline = [
             {
-                'name': 'Order Confirmed',
-                'description': 'We\'ve confirmed your order',
-                'status': 'confirmed',
-                'time': None
-            },
-            {
-                'name': 'Processing',
-                'description': 'Preparing your items',
-                'status': 'processing',
-                'time': None
+                'name': name,
+                'description': description,
+                'status': status,
+                'time': reached.get(status) if i <= current_index else None,
+                'completed': i < current_index or (i == current_index and status == 'completed'),
+                'current': i == current_index,
             }
+            for i, (status, name, description) in enumerate(steps)
         ]
-        
-        # Add delivery/pickup specific steps
-        if self.order_type == 'delivery':
-            steps.extend([
-                {
-                    'name': 'Out for Delivery',
-                    'description': 'Your order is on the way',
-                    'status': 'out_for_delivery',
-                    'time': None
-                },
-                {
-                    'name': 'Delivered',
-                    'description': 'Order delivered successfully',
-                    'status': 'delivered',
-                    'time': None
-                }
-            ])
-        else:  # pickup
-            steps.extend([
-                {
-                    'name': 'Ready for Pickup',
-                    'description': 'Your order is ready',
-                    'status': 'ready',
-                    'time': None
-                },
-                {
-                    'name': 'Picked Up',
-                    'description': 'Order collected successfully',
-                    'status': 'completed',
-                    'time': None
-                }
-            ])
-        
-        # Determine completed and current steps
-        status_order = ['pending', 'confirmed', 'processing', 'out_for_delivery', 'ready', 'delivered', 'completed']
-        
-        try:
-            current_index = status_order.index(self.status)
-        except ValueError:
-            current_index = 0
-        
-        for i, step in enumerate(steps):
-            step_copy = step.copy()
-            step_copy['completed'] = i < current_index
-            step_copy['current'] = i == current_index
-            timeline.append(step_copy)
-        
+        self._status_timeline = (self.status, timeline)
         return timeline
 
 
@@ -361,3 +420,117 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"Payment {self.transaction_id} - {self.status}"
+
+
+# -------------------- RECOMMENDATIONS --------------------
+class CoPurchase(models.Model):
+    """Number of completed orders containing both ``product`` and ``other``."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='copurchase_pair_unique'),
+        ]
+        indexes = [
+            # Top neighbours of a product
+            models.Index(fields=['product', '-count'], name='copurchase_top_idx'),
+        ]
+
+
+# -------------------- CHANGE FEED --------------------
+class OrderChange(models.Model):
+    """
+    One write to an order (created, edited, claimed, moved or deleted), in
+    commit order: ``id`` is the change feed's cursor (see ``changefeed``).
+    ``old_status``/``status`` is the status move: only ``status`` for a new
+    order, only ``old_status`` for a deleted one, neither when the status
+    did not change.
+    """
+    order_id = models.UUIDField()
+    old_status = models.CharField(max_length=15, null=True, blank=True)
+    status = models.CharField(max_length=15, null=True, blank=True)
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+# -------------------- STATUS HISTORY --------------------
+class OrderStatusEvent(models.Model):
+    """
+    One status an order entered, and when. Append-only: written when an
+    order is created and on every status change (see ``signals``), never
+    edited.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_events')
+    old_status = models.CharField(max_length=15, choices=Order.ORDER_STATUS, null=True, blank=True)
+    status = models.CharField(max_length=15, choices=Order.ORDER_STATUS)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            # An order's timeline
+            models.Index(fields=['order', 'created_at'], name='status_event_order_idx'),
+        ]
+
+
+class PrepTimeSketch(models.Model):
+    """Quantile sketch (``sketches.QuantileSketch``) of one prep-time metric over one hour."""
+    METRICS = (
+        ('placed_ready', 'Placed to ready'),
+        ('ready_completed', 'Ready to completed'),
+    )
+
+    metric = models.CharField(max_length=20, choices=METRICS)
+    hour = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    sketch = models.JSONField(default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'hour'], name='prep_sketch_unique'),
+        ]
+
+
+# -------------------- WORK QUEUE --------------------
+class TerminalThroughput(models.Model):
+    """What one staff terminal did with the work queue in one hour."""
+    terminal = models.CharField(max_length=40)
+    hour = models.DateTimeField()
+    claimed = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    released = models.PositiveIntegerField(default=0)
+    # Claims that ran out and went to another terminal
+    expired = models.PositiveIntegerField(default=0)
+    # Claim to ready, summed over completed orders
+    busy_seconds = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['terminal', 'hour'], name='terminal_hour_unique'),
+        ]
+
+
+# -------------------- SALES ROLLUP --------------------
+class DailySales(models.Model):
+    """Units and revenue of one product or combo on one day, completed orders only."""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    combo = models.ForeignKey(ComboOffer, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    # Copied from the product so category totals need no join
+    category = models.CharField(max_length=20, blank=True)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], condition=models.Q(product__isnull=False),
+                                    name='daily_sales_product_unique'),
+            models.UniqueConstraint(fields=['day', 'combo'], condition=models.Q(combo__isnull=False),
+                                    name='daily_sales_combo_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='daily_sales_day_idx'),
+        ]
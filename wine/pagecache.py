@@ -0,0 +1,90 @@
+"""
+Full-page cache for anonymous visitors.
+
+The public pages (home, shop, combo detail, order tracking) look the same to
+every anonymous visitor apart from the cart badge, the "bought together"
+strip and the CSRF token, and those are filled in after load from
+``cart_summary``. ``cache_anonymous_page`` stores the rendered page keyed by
+URL (query parameters sorted) under the catalog version, so any catalog change
+drops every cached page at once, and serves repeat visits without running the
+view at all.
+
+Logged-in users, anything but GET/HEAD, and visitors with flash messages
+waiting always get a freshly rendered page. Request headers named in the
+view's own ``Vary`` are part of the key. ``Cookie`` is not, since the cached
+pages carry nothing from cookies by construction, but responses still say
+``Vary: Cookie`` so shared caches keep logged-in pages apart.
+"""
+
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import cc_delim_re, patch_vary_headers
+
+from .catalog import catalog_version
+
+PAGE_TIMEOUT = 60 * 5
+
+
+def _cacheable(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(messages.get_messages(request))
+    )
+
+
+def _url_digest(request):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    return hashlib.md5(f'{request.build_absolute_uri(request.path)}?{query}'.encode()).hexdigest()
+
+
+def _headers_key(url):
+    return f'wine:page:headers:{url}'
+
+
+def _page_key(request, url, headers):
+    digest = hashlib.md5(url.encode())
+    for header in headers:
+        digest.update(b'\0' + request.META.get('HTTP_' + header.upper().replace('-', '_'), '').encode())
+    return f'wine:page:{catalog_version()}:{digest.hexdigest()}'
+
+
+def cache_anonymous_page(timeout=PAGE_TIMEOUT):
+    """Serve anonymous GETs of the decorated view from the page cache."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+
+            url = _url_digest(request)
+            headers = cache.get(_headers_key(url))
+            if headers is not None:
+                page = cache.get(_page_key(request, url, headers))
+                if page is not None:
+                    content, status, content_type = page
+                    response = HttpResponse(content, status=status, content_type=content_type)
+                    patch_vary_headers(response, headers + ['Cookie'])
+                    return response
+
+            response = view(request, *args, **kwargs)
+            headers = [h for h in cc_delim_re.split(response.get('Vary', '')) if h and h.lower() != 'cookie']
+            if (
+                request.method == 'GET' and response.status_code == 200
+                and not response.streaming and not response.cookies and '*' not in headers
+            ):
+                cache.set(_headers_key(url), headers, timeout)
+                cache.set(
+                    _page_key(request, url, headers),
+                    (response.content, response.status_code, response['Content-Type']),
+                    timeout,
+                )
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
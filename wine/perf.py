@@ -0,0 +1,233 @@
+"""
+Per-request performance instrumentation.
+
+    MIDDLEWARE = [..., 'wine.perf.PerformanceMiddleware', ...]
+
+For every request the middleware records the view name, wall time, number
+and total time of database queries, repeated identical queries (the usual
+N+1 pattern: the same SELECT issued once per row), template render time and
+cache hits/misses. The numbers go out three ways:
+
+* a ``Server-Timing`` response header, shown by the browser dev tools;
+* one JSON line per request on the ``wine.perf`` logger (N+1 suspects are
+  also logged as warnings);
+* an in-process ring buffer behind the staff "slowest endpoints" page.
+
+``PERF_INSTRUMENTATION`` turns the whole thing on or off (on in the dev
+profile, off in prod unless ``PERF_INSTRUMENTATION=1``). The ring buffer is
+per process, so under gunicorn the staff page shows the worker that served
+it; aggregate the log lines for the full picture.
+"""
+
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+from .sketches import percentile
+
+logger = logging.getLogger('wine.perf')
+
+_current = contextvars.ContextVar('wine_perf_stats', default=None)
+_MISS = object()
+
+_recent = deque(maxlen=5000)
+_recent_lock = threading.Lock()
+_installed = False
+
+
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.sql = Counter()
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def duplicates(self, threshold):
+        return {sql: n for sql, n in self.sql.items() if n >= threshold}
+
+
+def enabled():
+    return getattr(settings, 'PERF_INSTRUMENTATION', False)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - start
+        stats.queries += 1
+        stats.sql[sql] += 1
+
+
+def _instrument_templates():
+    original = Template.render
+
+    def render(self, context):
+        stats = _current.get()
+        if stats is None:
+            return original(self, context)
+        # {% include %} and {% extends %} render nested templates; only time the outermost
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.perf_counter() - start
+
+    Template.render = render
+
+
+def _instrument_cache(cls):
+    """Count hits and misses of ``cls.get`` (and ``get_many`` if overridden)."""
+    if getattr(cls.get, 'perf_instrumented', False):
+        return
+    original_get = cls.get
+
+    def get(self, key, default=None, version=None):
+        value = original_get(self, key, _MISS, version)
+        stats = _current.get()
+        if stats is not None:
+            if value is _MISS:
+                stats.cache_misses += 1
+            else:
+                stats.cache_hits += 1
+        return default if value is _MISS else value
+
+    get.perf_instrumented = True
+    cls.get = get
+
+    # BaseCache.get_many goes through get(), which is already counted
+    if cls.get_many is not BaseCache.get_many:
+        original_get_many = cls.get_many
+
+        def get_many(self, keys, version=None):
+            keys = list(keys)
+            found = original_get_many(self, keys, version)
+            stats = _current.get()
+            if stats is not None:
+                stats.cache_hits += len(found)
+                stats.cache_misses += len(keys) - len(found)
+            return found
+
+        cls.get_many = get_many
+
+
+def install():
+    """Patch template rendering and the configured cache backends once per process."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    _instrument_templates()
+    for alias in settings.CACHES:
+        _instrument_cache(type(caches[alias]))
+
+
+def server_timing(stats, total):
+    return ', '.join([
+        f'app;dur={total * 1000:.1f}',
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+        f'tpl;dur={stats.template_time * 1000:.1f}',
+        f'cache;desc="{stats.cache_hits} hits, {stats.cache_misses} misses"',
+    ])
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'PERF_DUPLICATE_QUERY_THRESHOLD', 5)
+        install()
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - stats.start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        duplicates = stats.duplicates(self.threshold)
+        record = {
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': round(total * 1000, 1),
+            'queries': stats.queries,
+            'db_ms': round(stats.db_time * 1000, 1),
+            'template_ms': round(stats.template_time * 1000, 1),
+            'cache_hits': stats.cache_hits,
+            'cache_misses': stats.cache_misses,
+            'duplicate_queries': sum(duplicates.values()),
+        }
+        response['Server-Timing'] = server_timing(stats, total)
+        logger.info(json.dumps(record))
+        for sql, count in duplicates.items():
+            logger.warning('Possible N+1 in %s: %d x %s', view, count, sql[:200])
+
+        record['at'] = time.time()
+        with _recent_lock:
+            _recent.append(record)
+        return response
+
+
+def slowest_endpoints(minutes=15, limit=20):
+    """Per-view latency summary of this process's requests in the last ``minutes``."""
+    since = time.time() - minutes * 60
+    with _recent_lock:
+        records = [r for r in _recent if r['at'] >= since]
+
+    by_view = defaultdict(list)
+    for record in records:
+        by_view[record['view']].append(record)
+
+    rows = []
+    for view, hits in by_view.items():
+        times = sorted(r['ms'] for r in hits)
+        rows.append({
+            'view': view,
+            'requests': len(hits),
+            'p50_ms': percentile(times, 50),
+            'p95_ms': percentile(times, 95),
+            'max_ms': times[-1],
+            'avg_queries': sum(r['queries'] for r in hits) / len(hits),
+            'avg_db_ms': sum(r['db_ms'] for r in hits) / len(hits),
+            'avg_template_ms': sum(r['template_ms'] for r in hits) / len(hits),
+            'n_plus_one': sum(1 for r in hits if r['duplicate_queries']),
+        })
+    rows.sort(key=lambda row: row['p95_ms'], reverse=True)
+    return rows[:limit]
+
+
+def clear():
+    with _recent_lock:
+        _recent.clear()
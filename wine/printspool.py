@@ -0,0 +1,158 @@
+"""
+Server-side print spool for the counter's thermal printers.
+
+    RECEIPT_PRINTERS = {'counter': 'tcp://192.168.1.50:9100'}
+
+``submit(printer, payload)`` queues an ESC/POS byte stream and returns at
+once. A per-process spooler thread waits ``PRINT_SPOOL_INTERVAL`` seconds
+for more jobs, then sends everything queued for a printer over a single
+connection, one write per job, so a burst of receipts costs one connect per
+printer instead of one per receipt. Jobs a printer did not take (it cannot
+be reached, or dropped the connection part way) stay queued for the next
+round, up to ``MAX_ATTEMPTS`` rounds.
+
+The spool is per worker process. Under gunicorn each worker batches and
+orders only its own jobs: receipts printed from different workers reach a
+printer in whatever order their spoolers connect, each worker connects
+separately, and jobs still queued in a worker are lost if it is killed
+(they are flushed when it exits normally).
+
+Printer URLs are ``tcp://host:port`` (raw ESC/POS, usually port 9100) or
+``file:///path``, which appends to a file and stands in for a printer when
+developing or testing. No printer is configured by default outside the dev
+profile.
+"""
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+CONNECT_TIMEOUT = 5
+
+# printer name -> [[payload, attempts], ...]
+_queues = {}
+_lock = threading.Lock()
+# Held while sending, so flush() returns only once queued jobs went out
+_send_lock = threading.Lock()
+_wakeup = threading.Event()
+_spooler_pid = None
+
+
+def printers():
+    return getattr(settings, 'RECEIPT_PRINTERS', {})
+
+
+def default_printer():
+    return next(iter(printers()), None)
+
+
+def submit(printer, payload):
+    """Queue ``payload`` (bytes) for ``printer``; returns the jobs this process has waiting for it."""
+    if printer is None:
+        raise ValueError('No receipt printer is configured')
+    if printer not in printers():
+        raise ValueError(f'Unknown printer {printer}')
+    with _lock:
+        queue = _queues.setdefault(printer, [])
+        queue.append([payload, 0])
+        waiting = len(queue)
+    _ensure_spooler()
+    _wakeup.set()
+    return waiting
+
+
+def pending(printer):
+    with _lock:
+        return len(_queues.get(printer, ()))
+
+
+@contextmanager
+def connect(url):
+    """Open the printer at ``url``; yields a function that writes one job."""
+    parsed = urlparse(url)
+    if parsed.scheme == 'tcp':
+        with socket.create_connection((parsed.hostname, parsed.port or 9100), timeout=CONNECT_TIMEOUT) as sock:
+            yield sock.sendall
+    elif parsed.scheme == 'file':
+        os.makedirs(os.path.dirname(parsed.path), exist_ok=True)
+        with open(parsed.path, 'ab') as f:
+            def write(payload):
+                f.write(payload)
+                f.flush()
+            yield write
+    else:
+        raise ValueError(f'Unsupported printer URL {url}')
+
+
+def flush():
+    """
+    Send every queued job, one connection per printer and one write per job.
+    Returns the jobs printed. If the printer fails part way, only the jobs
+    not yet sent are queued again.
+    """
+    with _send_lock:
+        with _lock:
+            batches = dict(_queues)
+            _queues.clear()
+        printed = 0
+        for printer, jobs in batches.items():
+            sent = 0
+            try:
+                with connect(printers()[printer]) as write:
+                    for payload, _ in jobs:
+                        write(payload)
+                        sent += 1
+            except (OSError, KeyError, ValueError) as exc:
+                unsent = jobs[sent:]
+                retry = [[payload, attempts + 1] for payload, attempts in unsent if attempts + 1 < MAX_ATTEMPTS]
+                logger.warning(
+                    'Printer %s failed (%r) after %d job(s); %d queued again, %d dropped',
+                    printer, exc, sent, len(retry), len(unsent) - len(retry),
+                )
+                with _lock:
+                    _queues[printer] = retry + _queues.get(printer, [])
+            printed += sent
+        return printed
+
+
+def _spool_loop():
+    while True:
+        _wakeup.wait()
+        _wakeup.clear()
+        # Let a burst of jobs (end-of-day reprints, a rush) pile up first
+        time.sleep(getattr(settings, 'PRINT_SPOOL_INTERVAL', 0.5))
+        try:
+            flush()
+        except Exception:
+            logger.exception('Print spool failed')
+        with _lock:
+            retry = any(_queues.values())
+        if retry:
+            # Unreachable printer: try again after a pause
+            time.sleep(CONNECT_TIMEOUT)
+            _wakeup.set()
+
+
+def _ensure_spooler():
+    """Start the spooler thread once per process (gunicorn forks after import)."""
+    global _spooler_pid
+    if _spooler_pid == os.getpid():
+        return
+    with _lock:
+        if _spooler_pid == os.getpid():
+            return
+        _spooler_pid = os.getpid()
+    threading.Thread(target=_spool_loop, name='print-spool', daemon=True).start()
+
+
+atexit.register(flush)
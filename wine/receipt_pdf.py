@@ -0,0 +1,137 @@
+"""
+PDF layouts for receipts and GST invoices.
+
+Everything here works on the plain dict built by ``receipts.receipt_data``
+and imports nothing from Django, so the functions can run in worker
+processes that never set Django up.
+"""
+
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+# Thermal roll paper
+RECEIPT_WIDTH = 80 * mm
+RECEIPT_MARGIN = 4 * mm
+LINE = 4 * mm
+
+
+def _money(value):
+    return f'Rs. {value}'
+
+
+def render_receipt(data):
+    """A till receipt on an 80 mm roll, as PDF bytes."""
+    rows = (
+        [('center', data['shop']['name'], 'Helvetica-Bold', 12)]
+        + [('center', text, 'Helvetica', 8) for text in (data['shop']['tagline'], data['shop']['address'], data['shop']['phone'])]
+        + [('rule',)]
+        + [('left', f'{label}: {value}', 'Helvetica', 8) for label, value in data['details'] if value]
+        + [('rule',)]
+    )
+    for line in data['lines']:
+        rows.append(('left', line['name'], 'Helvetica', 8))
+        rows.append(('split', f"  {line['quantity']} x {line['price']}", line['total']))
+    rows += [
+        ('rule',),
+        ('split', 'Subtotal', _money(data['subtotal'])),
+        ('split', f"Incl. GST {data['gst_rate']}%", _money(data['gst'])),
+        ('total', 'TOTAL', _money(data['total'])),
+        ('rule',),
+        ('center', 'Thank you for your order!', 'Helvetica', 8),
+        ('center', f"Receipt ID: {data['receipt_id']}", 'Helvetica', 7),
+    ]
+
+    buffer = BytesIO()
+    height = (len(rows) + 3) * LINE
+    pdf = canvas.Canvas(buffer, pagesize=(RECEIPT_WIDTH, height))
+    pdf.setTitle(f"Receipt {data['order_number']}")
+    y = height - 2 * LINE
+    right = RECEIPT_WIDTH - RECEIPT_MARGIN
+    for row in rows:
+        kind = row[0]
+        if kind == 'center':
+            pdf.setFont(row[2], row[3])
+            pdf.drawCentredString(RECEIPT_WIDTH / 2, y, row[1])
+        elif kind == 'left':
+            pdf.setFont(row[2], row[3])
+            pdf.drawString(RECEIPT_MARGIN, y, row[1][:48])
+        elif kind in ('split', 'total'):
+            pdf.setFont('Helvetica-Bold' if kind == 'total' else 'Helvetica', 10 if kind == 'total' else 8)
+            pdf.drawString(RECEIPT_MARGIN, y, row[1])
+            pdf.drawRightString(right, y, row[2])
+        else:
+            pdf.setDash(1, 2)
+            pdf.line(RECEIPT_MARGIN, y + LINE / 3, right, y + LINE / 3)
+            pdf.setDash()
+        y -= LINE
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def render_invoice(data):
+    """An A4 tax invoice with the CGST/SGST split, as PDF bytes."""
+    styles = getSampleStyleSheet()
+    shop = data['shop']
+    buffer = BytesIO()
+    document = SimpleDocTemplate(
+        buffer, pagesize=A4, title=f"Tax Invoice {data['invoice_number']}",
+        leftMargin=18 * mm, rightMargin=18 * mm, topMargin=18 * mm, bottomMargin=18 * mm,
+    )
+
+    # Paragraph text is markup: names, addresses and notes are escaped
+    seller = [shop['name'], shop['address'], shop['phone']] + ([f"GSTIN: {shop['gstin']}"] if shop['gstin'] else [])
+    header = Table([[
+        Paragraph('<br/>'.join(escape(str(text)) for text in seller), styles['Normal']),
+        Paragraph(
+            f"<b>TAX INVOICE</b><br/>Invoice No: {escape(str(data['invoice_number']))}<br/>"
+            + '<br/>'.join(escape(f'{label}: {value}') for label, value in data['details'] if value),
+            styles['Normal'],
+        ),
+    ]], colWidths=['55%', '45%'])
+    header.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP')]))
+
+    lines = [['#', 'Item', 'Qty', 'Rate', 'Amount']] + [
+        [str(number), Paragraph(escape(line['name']), styles['Normal']), str(line['quantity']), line['price'], line['total']]
+        for number, line in enumerate(data['lines'], 1)
+    ]
+    half_rate = data['gst_rate'] / 2
+    totals = [
+        ['', 'Taxable value', '', '', str(data['taxable'])],
+        ['', f'CGST @ {half_rate}%', '', '', str(data['cgst'])],
+        ['', f'SGST @ {half_rate}%', '', '', str(data['sgst'])],
+        ['', 'Total (incl. GST)', '', '', _money(data['total'])],
+    ]
+    table = Table(lines + totals, colWidths=[10 * mm, None, 15 * mm, 28 * mm, 32 * mm], repeatRows=1)
+    table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f2e6e8')),
+        ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.black),
+        ('LINEABOVE', (0, len(lines)), (-1, len(lines)), 0.5, colors.black),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+
+    document.build([
+        header,
+        Spacer(1, 8 * mm),
+        table,
+        Spacer(1, 8 * mm),
+        Paragraph('Prices are inclusive of GST. This is a computer generated invoice.', styles['Italic']),
+    ])
+    return buffer.getvalue()
+
+
+RENDERERS = {'receipt': render_receipt, 'invoice': render_invoice}
+
+
+def render(kind, data):
+    return RENDERERS[kind](data)
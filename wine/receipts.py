@@ -0,0 +1,163 @@
+"""
+PDF receipts and GST invoices.
+
+``order_pdf(order, kind)`` returns the path of an order's receipt or
+invoice PDF under ``RECEIPT_CACHE_DIR``, rendering it first if needed. Files
+are named after the order id and its ``updated_at``, so any save of the order
+gets a fresh copy on next request and the stale one is removed then.
+
+The layouts (``receipt_pdf.py``) run in a pool of ``RECEIPT_WORKERS`` worker
+processes fed with plain dicts, so reportlab's CPU time stays off the request
+threads and the GIL; ``render_batch`` pushes a whole day's orders through the
+pool for end-of-day reprints (``manage.py reprint_receipts``).
+
+GST: order totals are charged as stored, so the invoice splits the 5% GST
+out of ``total_amount`` (prices inclusive of tax) into CGST and SGST halves.
+"""
+
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import receipt_pdf
+
+logger = logging.getLogger(__name__)
+
+KINDS = tuple(receipt_pdf.RENDERERS)
+GST_RATE = Decimal('5')
+SHOP = {
+    'name': 'WINE X',
+    'tagline': 'Wine Shop & Bar',
+    'address': '123 Wine Street, City',
+    'phone': 'Phone: +91 9876543210',
+}
+# Bump when a layout changes so cached PDFs are not served any more
+LAYOUT_VERSION = 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Not fork: the web process runs threads (session write-behind)
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.RECEIPT_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _reset_executor():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def receipt_data(order):
+    """Everything the layouts print, as picklable plain values."""
+    created = timezone.localtime(order.created_at)
+    payment = getattr(order, 'payment', None)
+    customer = 'Guest Customer'
+    if order.user:
+        customer = order.user.get_full_name() or order.user.username
+
+    total = order.total_amount
+    taxable = (total * 100 / (100 + GST_RATE)).quantize(Decimal('0.01'))
+    gst = total - taxable
+    cgst = (gst / 2).quantize(Decimal('0.01'))
+    short_id = str(order.id)[:8].upper()
+    return {
+        'shop': {**SHOP, 'gstin': settings.RECEIPT_GSTIN},
+        'order_number': f'ORD-{short_id}',
+        'invoice_number': f'INV-{created:%Y%m%d}-{short_id}',
+        'receipt_id': short_id,
+        'details': [
+            ('Order #', f'ORD-{short_id}'),
+            ('Date', f'{created:%d/%m/%Y %H:%M}'),
+            ('Token #', order.token_number),
+            ('Customer', customer),
+            ('Phone', order.phone_number),
+            ('Order type', order.get_order_type_display()),
+            ('Payment', payment.get_payment_method_display() if payment else ''),
+        ],
+        'lines': [
+            {
+                'name': item.get_item_name(),
+                'quantity': item.quantity,
+                'price': str(item.price),
+                'total': str(item.get_total_price()),
+            }
+            for item in order.items.all()
+        ],
+        'subtotal': total,
+        'gst_rate': GST_RATE,
+        'taxable': taxable,
+        'gst': gst,
+        'cgst': cgst,
+        'sgst': gst - cgst,
+        'total': total,
+    }
+
+
+def receipt_path(order, kind='receipt'):
+    stamp = int(order.updated_at.timestamp() * 1_000_000)
+    return Path(settings.RECEIPT_CACHE_DIR) / kind / f'{order.id}-{stamp}-v{LAYOUT_VERSION}.pdf'
+
+
+def _store(order, path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+    # Older copies of this order's document
+    for stale in path.parent.glob(f'{order.id}-*.pdf'):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+
+def _render_all(jobs):
+    """Render ``[(kind, data), ...]`` in the pool (or inline), in order."""
+    if not settings.RECEIPT_WORKERS or len(jobs) == 0:
+        return [receipt_pdf.render(kind, data) for kind, data in jobs]
+    kinds, datas = zip(*jobs)
+    try:
+        results = _executor().map(
+            receipt_pdf.render, kinds, datas,
+            timeout=settings.RECEIPT_TIMEOUT * len(jobs),
+            chunksize=max(1, len(jobs) // (settings.RECEIPT_WORKERS * 4)),
+        )
+        return list(results)
+    except BrokenProcessPool:
+        # A worker died (OOM, killed); start a fresh pool next time
+        logger.exception('Receipt worker pool broke, rendering in process')
+        _reset_executor()
+        return [receipt_pdf.render(kind, data) for kind, data in jobs]
+
+
+def render_batch(orders, kind='receipt'):
+    """PDF paths for ``orders`` (prefetch items), rendering the missing ones together."""
+    if kind not in KINDS:
+        raise ValueError(f'Unknown document {kind}')
+    paths = [receipt_path(order, kind) for order in orders]
+    missing = [(order, path) for order, path in zip(orders, paths) if not path.exists()]
+    rendered = _render_all([(kind, receipt_data(order)) for order, _ in missing])
+    for (order, path), content in zip(missing, rendered):
+        _store(order, path, content)
+    return paths
+
+
+def order_pdf(order, kind='receipt'):
+    """Path of ``order``'s receipt or invoice PDF, rendered on first use."""
+    return render_batch([order], kind)[0]
@@ -0,0 +1,248 @@
+"""
+"Customers also bought" recommendations from co-purchase counts.
+
+``CoPurchase`` holds, for every ordered pair of products, the number of
+completed orders containing both. ``rebuild_copurchase_index()`` recomputes
+the table from ``OrderItem`` with numpy (``manage.py build_recommendations``);
+after that each order that reaches ``completed`` adds its own pairs, and
+takes them back if it leaves ``completed`` again, through the
+``order_status_changed`` signal (or ``bulk_status_changed`` when many move
+at once), so the table stays current without rebuilding.
+
+Reads go through the cache: the top neighbours of each product under
+``wine:also-bought:<id>``, and each customer's recommendation list under
+``wine:recs:user:<pk>``, so a dashboard load costs one cache lookup plus the
+product fetch.
+"""
+
+import logging
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import CoPurchase, OrderItem, Product
+
+logger = logging.getLogger(__name__)
+
+NEIGHBOURS = 20
+NEIGHBOURS_TIMEOUT = 60 * 60 * 6
+RECOMMENDATIONS_TIMEOUT = 60 * 60
+POPULAR_KEY = 'wine:recs:popular'
+
+
+def _neighbours_key(product_id):
+    return f'wine:also-bought:{product_id}'
+
+
+def _recommendations_key(user_id):
+    return f'wine:recs:user:{user_id}'
+
+
+def copurchase_counts(order_ids, product_ids):
+    """
+    Count co-occurring product pairs from parallel integer arrays with one
+    entry per order line. Returns ``(firsts, seconds, counts)``: every pair
+    of ``product_ids`` values (both directions) and the number of orders
+    containing it.
+    """
+    empty = np.array([], dtype=np.int64)
+    if len(order_ids) == 0:
+        return empty, empty, empty
+    order_ids = np.asarray(order_ids, dtype=np.int64)
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    n = int(product_ids.max()) + 1
+
+    # One row per (order, product), sorted by order
+    baskets = np.unique(order_ids * n + product_ids)
+    order_of, product_of = np.divmod(baskets, n)
+
+    # Line i and line i + d belong to the same order: that is a pair. The
+    # offset loop runs up to the largest basket size, the rest is vectorized.
+    keys = []
+    largest = np.unique(order_of, return_counts=True)[1].max()
+    for d in range(1, largest):
+        same = order_of[:-d] == order_of[d:]
+        a, b = product_of[:-d][same], product_of[d:][same]
+        keys.append(a * n + b)
+        keys.append(b * n + a)
+    if not keys:
+        return empty, empty, empty
+    pairs, counts = np.unique(np.concatenate(keys), return_counts=True)
+    firsts, seconds = np.divmod(pairs, n)
+    return firsts, seconds, counts
+
+
+def rebuild_copurchase_index(batch_size=5000):
+    """Recompute CoPurchase from every completed order. Returns the pair count."""
+    orders, products = {}, {}
+    order_ids, product_ids = [], []
+    lines = OrderItem.objects.filter(order__status='completed', product__isnull=False).values_list('order_id', 'product_id')
+    for order_id, product_id in lines.iterator(chunk_size=batch_size):
+        order_ids.append(orders.setdefault(order_id, len(orders)))
+        product_ids.append(products.setdefault(product_id, len(products)))
+    firsts, seconds, counts = copurchase_counts(order_ids, product_ids)
+    product_list = list(products)
+
+    with transaction.atomic():
+        CoPurchase.objects.all().delete()
+        CoPurchase.objects.bulk_create(
+            (
+                CoPurchase(product_id=product_list[a], other_id=product_list[b], count=int(c))
+                for a, b, c in zip(firsts, seconds, counts)
+            ),
+            batch_size=batch_size,
+        )
+    cache.delete_many([_neighbours_key(p) for p in product_list] + [POPULAR_KEY])
+    return len(counts)
+
+
+def _add_pairs(increments):
+    """
+    Add ``{(product_id, other_id): n}`` to the stored counts (``n`` below
+    zero takes an order back out). Missing pairs are inserted at 0 with ON
+    CONFLICT DO NOTHING first, so a writer racing on the same new pair waits
+    for the other's row instead of failing on the unique constraint; then
+    every count moves with one ``F()`` UPDATE per distinct increment.
+    """
+    with transaction.atomic():
+        CoPurchase.objects.bulk_create(
+            (
+                CoPurchase(product_id=product_id, other_id=other_id, count=0)
+                for (product_id, other_id), increment in increments.items() if increment > 0
+            ),
+            ignore_conflicts=True,
+        )
+        product_ids = {product_id for product_id, _ in increments}
+        rows = CoPurchase.objects.filter(product_id__in=product_ids, other_id__in=product_ids)
+        by_increment = {}
+        for pk, product_id, other_id in rows.values_list('id', 'product_id', 'other_id'):
+            increment = increments.get((product_id, other_id))
+            if increment:
+                by_increment.setdefault(increment, []).append(pk)
+        for increment, pks in by_increment.items():
+            CoPurchase.objects.filter(id__in=pks).update(count=F('count') + increment)
+
+
+def record_order(order, sign=1):
+    """Add (``sign=1``) or remove (``sign=-1``) one order's product pairs."""
+    product_ids = sorted(set(
+        OrderItem.objects.filter(order=order, product__isnull=False).values_list('product_id', flat=True)
+    ))
+    if len(product_ids) < 2:
+        return
+    _add_pairs({
+        (product_id, other_id): sign for product_id in product_ids for other_id in product_ids if product_id != other_id
+    })
+    cache.delete_many([_neighbours_key(p) for p in product_ids])
+    if order.user_id:
+        cache.delete(_recommendations_key(order.user_id))
+
+
+def record_orders(order_ids, sign=1):
+    """``record_order`` for many orders: pairs counted with numpy, then
+    added with one bulk insert and one UPDATE per distinct increment."""
+    orders, products, users = {}, {}, set()
+    index_order, index_product = [], []
+    lines = OrderItem.objects.filter(order_id__in=order_ids, product__isnull=False).values_list(
+        'order_id', 'product_id', 'order__user_id'
+    )
+    for order_id, product_id, user_id in lines:
+        index_order.append(orders.setdefault(order_id, len(orders)))
+        index_product.append(products.setdefault(product_id, len(products)))
+        if user_id:
+            users.add(user_id)
+    firsts, seconds, counts = copurchase_counts(index_order, index_product)
+    if not len(counts):
+        return
+    product_list = list(products)
+    _add_pairs({
+        (product_list[a], product_list[b]): sign * int(c) for a, b, c in zip(firsts, seconds, counts)
+    })
+    cache.delete_many(
+        [_neighbours_key(p) for p in product_list] + [_recommendations_key(u) for u in users]
+    )
+
+
+def on_order_status_changed(sender, order, old_status, new_status, **kwargs):
+    if new_status == old_status or 'completed' not in (old_status, new_status):
+        return
+    try:
+        record_order(order, sign=1 if new_status == 'completed' else -1)
+    except Exception:
+        # Recommendations must never break checkout; the next rebuild catches up
+        logger.exception('Could not record co-purchases for order %s', order.pk)
+
+
+def on_bulk_status_changed(sender, order_ids, old_status, new_status, **kwargs):
+    if 'completed' not in (old_status, new_status):
+        return
+    try:
+        record_orders(order_ids, sign=1 if new_status == 'completed' else -1)
+    except Exception:
+        logger.exception('Could not record co-purchases for %d orders', len(order_ids))
+
+
+def neighbours(product_ids):
+    """``{product_id: [(other_id, count), ...]}`` for ``product_ids``, cached."""
+    keys = {_neighbours_key(p): p for p in product_ids}
+    found = cache.get_many(list(keys))
+    result = {keys[key]: value for key, value in found.items()}
+    missing = [p for p in product_ids if p not in result]
+    if missing:
+        loaded = {p: [] for p in missing}
+        for row in CoPurchase.objects.filter(product_id__in=missing, count__gt=0).order_by('product_id', '-count').values_list('product_id', 'other_id', 'count'):
+            if len(loaded[row[0]]) < NEIGHBOURS:
+                loaded[row[0]].append((row[1], row[2]))
+        cache.set_many({_neighbours_key(p): v for p, v in loaded.items()}, NEIGHBOURS_TIMEOUT)
+        result.update(loaded)
+    return result
+
+
+def also_bought_ids(product_ids, limit=4):
+    """Products most often bought with ``product_ids``, best first."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return []
+    scores = {}
+    for pairs in neighbours(list(product_ids)).values():
+        for other_id, count in pairs:
+            if other_id not in product_ids:
+                scores[other_id] = scores.get(other_id, 0) + count
+    return sorted(scores, key=scores.get, reverse=True)[:limit * 3]
+
+
+def sellable(product_ids, limit):
+    """Active, in-stock products for ``product_ids``, keeping their order."""
+    if not product_ids:
+        return []
+    found = Product.objects.filter(id__in=product_ids, is_active=True, stock__gt=0).in_bulk()
+    return [found[p] for p in product_ids if p in found][:limit]
+
+
+def frequently_bought_together(product_ids, limit=4):
+    return sellable(also_bought_ids(product_ids, limit), limit)
+
+
+def popular_ids(limit=4):
+    """Products paired most often overall, for customers without history."""
+    ids = cache.get(POPULAR_KEY)
+    if ids is None:
+        ids = list(
+            CoPurchase.objects.values('product_id').annotate(score=Sum('count'))
+            .order_by('-score').values_list('product_id', flat=True)[:20]
+        )
+        cache.set(POPULAR_KEY, ids, RECOMMENDATIONS_TIMEOUT)
+    return ids[:limit * 3]
+
+
+def recommendations_for(user, limit=4):
+    """Personal recommendations from everything ``user`` has ordered."""
+    key = _recommendations_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        purchased = OrderItem.objects.filter(order__user=user, product__isnull=False).values_list('product_id', flat=True).distinct()
+        ids = also_bought_ids(purchased, limit)
+        cache.set(key, ids, RECOMMENDATIONS_TIMEOUT)
+    return sellable(ids or popular_ids(limit), limit)
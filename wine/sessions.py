@@ -0,0 +1,122 @@
+"""
+Cache-first session backend with write-behind to the database.
+
+    SESSION_ENGINE = 'wine.sessions'
+
+Sessions are read from and written to ``SESSION_CACHE_ALIAS``. A new session
+is inserted into the database straight away (anonymous carts are keyed by the
+session key, so the row must exist), but later modifications (flash
+messages, "Welcome back!" banners, login bookkeeping) only touch the cache and
+mark the session dirty. A per-process flusher writes dirty sessions back to
+the database every ``SESSION_WRITE_BEHIND_SECONDS`` and at interpreter exit,
+so the database copy is at most that stale if the cache loses an entry.
+
+The cache must be shared by every process that serves requests (Redis, or
+the file cache for several workers on one node). Write-behind is therefore
+off by default with a process-local cache (locmem), and system check
+``wine.E001`` refuses to start with it switched on there.
+``SESSION_WRITE_BEHIND_SECONDS = 0`` writes through like ``cached_db``.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.db import DatabaseError, close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+# session key -> database NAME it belongs to (test databases come and go)
+_dirty = {}
+_lock = threading.Lock()
+_flusher_pid = None
+
+
+def write_behind_seconds():
+    return getattr(settings, 'SESSION_WRITE_BEHIND_SECONDS', 0)
+
+
+class SessionStore(cached_db.SessionStore):
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        if must_create or not write_behind_seconds():
+            # New sessions (and write-through mode) go to the DB and cache
+            return super().save(must_create)
+        try:
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+        except Exception:
+            logger.exception('Error saving session to cache (%s); writing through', self._cache)
+            return super().save(must_create)
+        mark_dirty(self.session_key)
+
+    def delete(self, session_key=None):
+        with _lock:
+            _dirty.pop(session_key or self.session_key, None)
+        super().delete(session_key)
+
+    def write_to_db(self):
+        """Persist the cached copy of this session; False if there is none."""
+        data = self._cache.get(self.cache_key)
+        if data is None:
+            return False
+        self._session_cache = data
+        DBStore.save(self)
+        return True
+
+
+def mark_dirty(session_key):
+    with _lock:
+        _dirty[session_key] = connection.settings_dict['NAME']
+    _ensure_flusher()
+
+
+def flush_dirty_sessions():
+    """Write every dirty session of this process back to the database."""
+    with _lock:
+        dirty = dict(_dirty)
+        _dirty.clear()
+    database = connection.settings_dict['NAME']
+    written = 0
+    for session_key, name in dirty.items():
+        if name != database:
+            continue
+        try:
+            if SessionStore(session_key).write_to_db():
+                written += 1
+        except (DatabaseError, UpdateError) as exc:
+            # Row expired or was deleted meanwhile; the cache copy stays authoritative
+            logger.warning('Could not write back session %s: %r', session_key[:8], exc)
+    return written
+
+
+def _flush_loop():
+    while True:
+        time.sleep(write_behind_seconds() or 60)
+        try:
+            flush_dirty_sessions()
+        except Exception:
+            logger.exception('Session write-behind failed')
+        finally:
+            close_old_connections()
+
+
+def _ensure_flusher():
+    """Start the flusher thread once per process (gunicorn forks after import)."""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name='session-write-behind', daemon=True).start()
+
+
+atexit.register(flush_dirty_sessions)
@@ -0,0 +1,106 @@
+"""
+Order lifecycle signals.
+
+Order status is changed from a dozen views (quick updates, the staff API,
+manual billing, checkout), so instead of hooking each one, any ``save()``
+that creates an order or changes its status sends
+
+    order_status_changed(sender=Order, order, old_status, new_status, created)
+
+once the surrounding transaction commits, when the order's items and payment
+are in place. ``old_status`` is None for new orders. Bulk ``update()`` calls
+bypass it; ``transitions.bulk_change_status`` sends
+
+    bulk_status_changed(sender=Order, order_ids, old_status, new_status, changed_at)
+
+instead, once per source status.
+
+The same ``save()`` also appends an ``OrderStatusEvent``, in the order's own
+transaction (``bulk_change_status`` writes them for bulk moves). Who made
+the change and why is taken from ``order._status_changed_by`` and
+``order._status_notes`` when ``transitions.change_status`` set them. An
+order loaded with ``status`` deferred has its stored status read before
+the save if it was given a new one, and announces nothing if it was not.
+
+Every write to an order, status or not, deletes included, appends an
+``OrderChange`` row (with the status move, if any) for the change feed and
+the live board with ``record_changes``, also in the writer's transaction.
+Writers that use ``update()`` (bulk moves, work queue claims) call it
+themselves. Once those rows commit,
+
+    orders_changed(sender=Order, order_ids)
+
+is sent.
+"""
+
+from django.db import transaction
+from django.dispatch import Signal
+
+from .db import serialize_commits
+from .models import Order, OrderChange, OrderStatusEvent
+
+# Advisory lock key serializing OrderChange appends (see db.serialize_commits)
+CHANGE_LOG_LOCK = 0x77696E65
+
+order_status_changed = Signal()
+bulk_status_changed = Signal()
+orders_changed = Signal()
+
+
+def record_changes(order_ids, using='default', old_status=None, status=None):
+    """
+    Append ``order_ids`` to the change log, all moved from ``old_status`` to
+    ``status`` (both None if their status did not change); their ids commit
+    in order.
+    """
+    order_ids = list(order_ids)
+    with transaction.atomic(using=using):
+        serialize_commits(using, CHANGE_LOG_LOCK)
+        OrderChange.objects.using(using).bulk_create(
+            OrderChange(order_id=order_id, old_status=old_status, status=status) for order_id in order_ids
+        )
+        transaction.on_commit(lambda: orders_changed.send(sender=Order, order_ids=order_ids), using=using)
+
+
+def log_deletion(sender, instance, using='default', **kwargs):
+    """``post_delete`` receiver for ``Order``."""
+    record_changes([instance.pk], using, old_status=instance._saved_status)
+
+
+def remember_status(sender, instance, **kwargs):
+    # Deferred status (only()/defer()) must not trigger a query here
+    instance._saved_status = instance.__dict__.get('status')
+
+
+def load_saved_status(sender, instance, raw=False, using='default', **kwargs):
+    """``pre_save`` receiver: the stored status of an order loaded without it and then given one."""
+    if raw or instance._state.adding or instance._saved_status is not None or 'status' not in instance.__dict__:
+        return
+    instance._saved_status = (
+        sender._base_manager.using(using).filter(pk=instance.pk).values_list('status', flat=True).first()
+    )
+
+
+def announce_status_change(sender, instance, created, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    # Popped, so a later save() of the same instance is not credited to them
+    changed_by = instance.__dict__.pop('_status_changed_by', None)
+    notes = instance.__dict__.pop('_status_notes', '')
+    if not created and 'status' not in instance.__dict__:
+        # Status deferred and never set, so this save did not write it
+        record_changes([instance.pk], using)
+        return
+    old_status = None if created else instance._saved_status
+    new_status = instance.status
+    if not created and old_status == new_status:
+        record_changes([instance.pk], using)
+        return
+    instance._saved_status = new_status
+    record_changes([instance.pk], using, old_status, new_status)
+    instance._status_event = OrderStatusEvent.objects.using(using).create(
+        order=instance, old_status=old_status, status=new_status, changed_by=changed_by, notes=notes,
+    )
+    transaction.on_commit(lambda: order_status_changed.send(
+        sender=sender, order=instance, old_status=old_status, new_status=new_status, created=created,
+    ), using=using)
@@ -0,0 +1,88 @@
+"""
+Streaming quantile sketch.
+
+``QuantileSketch`` is a DDSketch-style log histogram: a positive value ``x``
+is counted in bucket ``ceil(log(x) / log(gamma))`` with
+``gamma = (1 + a) / (1 - a)``, so any quantile it returns is within a
+relative error ``a`` (1% by default) of the true one. It needs a few hundred
+buckets at most for anything from a second to a day, whatever the number of
+values, and two sketches merge by adding bucket counts. That makes it cheap
+to keep one per hour and combine hours into a day or a week.
+
+``percentile`` is the exact counterpart, for lists of values small enough
+to keep (request timings, benchmark latencies).
+"""
+
+import math
+
+RELATIVE_ACCURACY = 0.01
+
+
+def percentile(values, pct):
+    """Return the ``pct`` percentile (0-100) of ``values`` (nearest rank)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(math.ceil(pct / 100.0 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        # Values <= 0 (e.g. an order marked ready as it was placed)
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value, count=1):
+        if value > 0:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        else:
+            self.zeros += count
+        self.count += count
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError('Cannot merge sketches with different accuracy')
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """The ``q`` quantile (0 to 1), or None if the sketch is empty."""
+        if not 0 <= q <= 1:
+            raise ValueError(f'Quantile {q} is not between 0 and 1')
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self):
+        """JSON-ready form (JSON object keys are strings)."""
+        return {
+            'accuracy': self.relative_accuracy,
+            'zeros': self.zeros,
+            'buckets': {str(index): count for index, count in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data.get('accuracy', RELATIVE_ACCURACY))
+        sketch.zeros = data.get('zeros', 0)
+        sketch.buckets = {int(index): count for index, count in data.get('buckets', {}).items()}
+        sketch.count = sketch.zeros + sum(sketch.buckets.values())
+        return sketch
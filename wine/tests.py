@@ -1,3 +1,1462 @@
-from django.test import TestCase
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from io import StringIO
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .board import board_orders, status_counts
+from .cart import get_cart_count
+from .catalog import catalog_version
+from .checks import check_session_write_behind
+from .changefeed import changes, current_cursor, decode_cursor
+from .context_processors import cart_count
+from .customers import customer_directory, search_customers
+from .db import sqlite_performance_profile
+from .leaderboard import rebuild_daily_sales, top_sellers
+from . import liveboard
+from .inventory import InsufficientStock, reserve_stock, stock_requirements
+from .maintenance import purge_abandoned_carts, purge_expired_sessions, purge_order_changes
+from . import perf
+from . import preptimes
+from .preptimes import prep_time_report, rebuild_prep_times
+from .benchmarks.suite import compare
+from .models import (
+    Cart, CartItem, ComboItem, ComboOffer, CoPurchase, CustomUser, DailySales, Order, OrderItem, OrderStatusEvent,
+    OrderChange, PrepTimeSketch, Product, TerminalThroughput,
+)
+from .receipt_pdf import render_invoice
+from .receipts import order_pdf, receipt_data, render_batch
+from . import escpos, printspool
+from .recommendations import copurchase_counts, rebuild_copurchase_index, recommendations_for
+from .sessions import SessionStore, flush_dirty_sessions
+from .signals import record_changes
+from .sketches import QuantileSketch
+from .transitions import InvalidTransition, bulk_change_status, change_status
+from . import workqueue
+
+
+class SQLitePerformanceProfileTests(TestCase):
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+
+    def test_pragmas_applied_to_connection(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+
+    @override_settings(SQLITE_PERFORMANCE={'busy_timeout': 100})
+    def test_profile_overrides_merge_with_defaults(self):
+        profile = sqlite_performance_profile()
+        self.assertEqual(profile['busy_timeout'], 100)
+        self.assertEqual(profile['journal_mode'], 'WAL')
+
+    @override_settings(SQLITE_PERFORMANCE=None)
+    def test_profile_can_be_disabled(self):
+        self.assertIsNone(sqlite_performance_profile())
+
+
+class ReserveStockTests(TestCase):
+    def setUp(self):
+        self.merlot = Product.objects.create(name='Merlot', description='', price=Decimal('500'), category='wine', stock=5)
+        self.lager = Product.objects.create(name='Lager', description='', price=Decimal('150'), category='beer', stock=2)
+
+    def test_decrements_stock(self):
+        with transaction.atomic():
+            reserve_stock({self.merlot.id: 3, self.lager.id: 2})
+        self.merlot.refresh_from_db()
+        self.lager.refresh_from_db()
+        self.assertEqual((self.merlot.stock, self.lager.stock), (2, 0))
+
+    def test_insufficient_stock_rolls_back(self):
+        with self.assertRaises(InsufficientStock) as ctx:
+            with transaction.atomic():
+                reserve_stock({self.merlot.id: 1, self.lager.id: 3})
+        self.assertEqual(ctx.exception.product, self.lager)
+        self.merlot.refresh_from_db()
+        self.assertEqual(self.merlot.stock, 5)
+
+    def test_combo_requirements(self):
+        combo = ComboOffer.objects.create(name='Party', description='', discount_percentage=Decimal('10'))
+        ComboItem.objects.create(combo=combo, product=self.lager, quantity=2)
+        cart = Cart.objects.create(session_key='abc')
+        CartItem.objects.create(cart=cart, combo=combo, quantity=1)
+        CartItem.objects.create(cart=cart, product=self.lager, quantity=1)
+        self.assertEqual(stock_requirements(cart.items.all()), {self.lager.id: 3})
+
+
+class CheckoutTests(TestCase):
+    def test_process_order_reserves_stock(self):
+        product = Product.objects.create(name='Merlot', description='', price=Decimal('500'), category='wine', stock=4)
+        self.client.post(reverse('add_to_cart', args=[product.id]), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.client.post(reverse('add_to_cart', args=[product.id]), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        response = self.client.post(
+            reverse('process_order'),
+            data=json.dumps({'phone_number': '9876543210', 'payment_method': 'upi', 'order_type': 'pickup'}),
+            content_type='application/json',
+        )
+
+        self.assertTrue(response.json()['success'])
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 2)
+        order = Order.objects.get()
+        self.assertEqual(order.items.get().quantity, 2)
+
+    def test_process_order_rejects_oversold_cart(self):
+        product = Product.objects.create(name='Merlot', description='', price=Decimal('500'), category='wine', stock=1)
+        self.client.post(reverse('add_to_cart', args=[product.id]), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        Product.objects.filter(id=product.id).update(stock=0)
+
+        response = self.client.post(
+            reverse('process_order'),
+            data=json.dumps({'phone_number': '9876543210', 'payment_method': 'upi', 'order_type': 'pickup'}),
+            content_type='application/json',
+        )
+
+        self.assertFalse(response.json()['success'])
+        self.assertFalse(Order.objects.exists())
+
+
+@override_settings(SESSION_ENGINE='wine.sessions', SESSION_WRITE_BEHIND_SECONDS=60)
+class WriteBehindSessionTests(TestCase):
+    def test_new_session_is_inserted(self):
+        store = SessionStore()
+        store['a'] = 1
+        store.save()
+        self.assertTrue(Session.objects.filter(session_key=store.session_key).exists())
+
+    def test_modifications_are_deferred_until_flush(self):
+        store = SessionStore()
+        store['messages'] = ['hello']
+        store.save()
+
+        store['messages'] = ['welcome back']
+        with CaptureQueriesContext(connection) as queries:
+            store.save()
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(SessionStore(store.session_key)['messages'], ['welcome back'])
+
+        flush_dirty_sessions()
+        row = Session.objects.get(session_key=store.session_key)
+        self.assertEqual(row.get_decoded()['messages'], ['welcome back'])
+
+    @override_settings(SESSION_WRITE_BEHIND_SECONDS=0)
+    def test_write_through_when_disabled(self):
+        store = SessionStore()
+        store.save()
+        store['x'] = 2
+        store.save()
+        row = Session.objects.get(session_key=store.session_key)
+        self.assertEqual(row.get_decoded()['x'], 2)
+
+    def test_check_rejects_write_behind_with_private_cache(self):
+        self.assertEqual([error.id for error in check_session_write_behind(None)], ['wine.E001'])
+        with override_settings(SESSION_WRITE_BEHIND_SECONDS=0):
+            self.assertEqual(check_session_write_behind(None), [])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_session_write_behind(None), [])
+
+
+class LazyCartTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Merlot', description='', price=Decimal('500'), category='wine', stock=5)
+
+    def test_browsing_issues_no_inserts(self):
+        pages = [
+            reverse('shop_home'),
+            reverse('shop_home') + '?category=wine',
+            reverse('view_cart'),
+            reverse('kiosk_view'),
+            reverse('kiosk_get_cart'),
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            for page in pages:
+                self.client.get(page)
+        inserts = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(inserts, [])
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(Session.objects.exists())
+
+    def test_first_mutation_creates_cart(self):
+        self.client.post(reverse('add_to_cart', args=[self.product.id]), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        cart = Cart.objects.get()
+        self.assertEqual(cart.session_key, self.client.session.session_key)
+        self.assertEqual(cart.items.get().product, self.product)
+
+    def test_kiosk_cart_created_on_add(self):
+        self.client.post(
+            reverse('kiosk_add_to_cart'),
+            data=json.dumps({'type': 'product', 'id': str(self.product.id)}),
+            content_type='application/json',
+        )
+        cart = Cart.objects.get()
+        self.assertTrue(cart.session_key.endswith('_kiosk'))
+
+
+class PurgeCartsTests(TestCase):
+    def make_cart(self, session_key, days_idle, user=None):
+        cart = Cart.objects.create(session_key=session_key, user=user)
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now() - timedelta(days=days_idle))
+        product = Product.objects.create(name=session_key or 'owned', description='', price=Decimal('10'), category='beer', stock=5)
+        CartItem.objects.create(cart=cart, product=product)
+        return cart
+
+    def test_purges_idle_anonymous_carts_in_batches(self):
+        for i in range(3):
+            self.make_cart(f'old{i}', days_idle=30)
+        self.make_cart('old0_kiosk', days_idle=30)
+        fresh = self.make_cart('fresh', days_idle=1)
+        customer = CustomUser.objects.create_user(username='c', password='x')
+        owned = self.make_cart(None, days_idle=30, user=customer)
+
+        result = purge_abandoned_carts(idle_days=14, batch_size=2)
+
+        self.assertEqual(result, {'carts': 4, 'cart_items': 4})
+        self.assertEqual(set(Cart.objects.all()), {fresh, owned})
+
+    def test_purges_expired_sessions(self):
+        Session.objects.create(session_key='a' * 32, session_data='', expire_date=timezone.now() - timedelta(days=1))
+        Session.objects.create(session_key='b' * 32, session_data='', expire_date=timezone.now() + timedelta(days=1))
+        self.assertEqual(purge_expired_sessions(batch_size=1), 1)
+        self.assertEqual(Session.objects.get().session_key, 'b' * 32)
+
+
+class CartCountTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Merlot', description='', price=Decimal('500'), category='wine', stock=5)
+
+    def add(self):
+        self.client.post(reverse('add_to_cart', args=[self.product.id]), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def badge(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        request.session = SessionStore(self.client.session.session_key)
+        return get_cart_count(request)
+
+    def test_count_maintained_on_mutation(self):
+        self.add()
+        self.add()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.badge(), 2)
+
+        item = CartItem.objects.get()
+        self.client.post(reverse('decrease_quantity', args=[item.id]))
+        self.assertEqual(self.badge(), 1)
+        self.client.post(reverse('remove_from_cart', args=[item.id]))
+        self.assertEqual(self.badge(), 0)
+
+    def test_context_processor_is_lazy(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        request.session = SessionStore('x' * 32)
+        with self.assertNumQueries(0):
+            context = cart_count(request)
+        with self.assertNumQueries(1):
+            self.assertEqual(context['cart_count'](), 0)
+            self.assertEqual(context['cart_count'](), 0)
+
+
+@override_settings(PERF_INSTRUMENTATION=True)
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        perf.clear()
+        Product.objects.create(name='Merlot', description='', price=Decimal('500'), category='wine', stock=5)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('shop_home'))
+        timing = response['Server-Timing']
+        self.assertIn('app;dur=', timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('cache;desc=', timing)
+
+    def test_duplicate_queries_flagged(self):
+        def view(request):
+            for _ in range(6):
+                list(Product.objects.filter(stock__gt=0))
+            return JsonResponse({'success': True})
+
+        middleware = perf.PerformanceMiddleware(view)
+        with self.assertLogs('wine.perf', 'WARNING') as logs:
+            middleware(RequestFactory().get('/'))
+        self.assertIn('Possible N+1 in unresolved: 6 x', logs.output[0])
+        self.assertEqual(perf.slowest_endpoints()[0]['n_plus_one'], 1)
+
+    def test_staff_page_lists_slowest_endpoints(self):
+        staff = CustomUser.objects.create_user(username='perfstaff', password='x', user_type='staff')
+        self.client.get(reverse('shop_home'))
+        self.client.force_login(staff)
+        response = self.client.get(reverse('performance_report'), {'minutes': 5})
+        views = [row['view'] for row in response.context['endpoints']]
+        self.assertIn('shop_home', views)
+
+    def test_staff_only(self):
+        response = self.client.get(reverse('performance_report'))
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(PERF_INSTRUMENTATION=False)
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            perf.PerformanceMiddleware(lambda request: None)
+
+
+class SeedDataTests(TestCase):
+    def seed(self, **options):
+        options = dict(products=20, combos=3, offers=2, customers=10, carts=5, orders=50, days=30, **options)
+        call_command('seed_wine_data', stdout=StringIO(), **options)
+        return list(Order.objects.order_by('id').values_list('id', 'total_amount'))
+
+    def test_deterministic_from_seed(self):
+        first = self.seed(seed=7)
+        self.assertEqual(len(first), 50)
+        self.assertEqual(self.seed(seed=7, clear=True, interactive=False), first)
+
+    def test_clear_asks_outside_debug(self):
+        self.seed(seed=7)
+        with mock.patch('builtins.input', return_value='no'):
+            with self.assertRaises(CommandError):
+                self.seed(seed=7, clear=True)
+        self.assertEqual(Order.objects.count(), 50)
+
+    def test_timestamps_anchored_to_now(self):
+        call_command('seed_wine_data', '--now', '2024-03-01', stdout=StringIO(), products=20, combos=3,
+                     offers=2, customers=10, carts=5, orders=50, days=30)
+        first = list(Order.objects.order_by('id').values_list('created_at', flat=True))
+        self.assertLess(first[-1], timezone.make_aware(datetime(2024, 3, 2)))
+        call_command('seed_wine_data', '--now', '2024-03-01', '--clear', '--noinput', stdout=StringIO(),
+                     products=20, combos=3, offers=2, customers=10, carts=5, orders=50, days=30)
+        self.assertEqual(list(Order.objects.order_by('id').values_list('created_at', flat=True)), first)
+
+    def test_timestamps_are_spread(self):
+        self.seed()
+        oldest = Order.objects.order_by('created_at').first().created_at
+        self.assertGreater(timezone.now() - oldest, timedelta(days=7))
+        self.assertEqual(Order.objects.filter(items__isnull=True).count(), 0)
+        self.assertEqual(Order.objects.filter(payment__isnull=True).count(), 0)
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_kiosk_get_cart_reports_unit_price(self):
+        product = Product.objects.create(name='Merlot', description='', price=Decimal('500'), category='wine', stock=5)
+        for _ in range(2):
+            self.client.post(reverse('kiosk_add_to_cart'), {'type': 'product', 'id': str(product.id)},
+                             content_type='application/json')
+        data = self.client.get(reverse('kiosk_get_cart')).json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['cart_items'][0]['price'], 500.0)
+        self.assertEqual(data['cart_total'], 1000.0)
+
+    def test_compare_flags_slower_and_chattier_benchmarks(self):
+        baseline = {'a': {'median_ms': 10.0, 'queries': 3}, 'b': {'median_ms': 10.0, 'queries': 3}}
+        results = {'a': {'median_ms': 12.0, 'queries': 3}, 'b': {'median_ms': 13.0, 'queries': 4}}
+        regressions = compare(baseline, results, threshold=0.25)
+        self.assertEqual([name for name, _ in regressions], ['b', 'b'])
+
+
+class CustomerDirectoryTests(TestCase):
+    def setUp(self):
+        self.staff = CustomUser.objects.create_user(username='desk', password=None, user_type='staff')
+        self.customers = []
+        for n in range(5):
+            customer = CustomUser.objects.create_user(
+                username=f'cust{n}', password=None, user_type='customer', email=f'Person{n}@Example.com',
+                full_name=f'Person {n}', phone_number=f'98765{n:05d}',
+            )
+            customer.date_joined = timezone.now() - timedelta(days=n)
+            customer.save()
+            self.customers.append(customer)
+        for amount in ('100.00', '250.50'):
+            Order.objects.create(user=self.customers[0], phone_number='1', total_amount=Decimal(amount),
+                                 order_type='delivery', delivery_address='12 MG Road')
+        self.client.force_login(self.staff)
+
+    def test_page_in_one_query_with_stats(self):
+        with self.assertNumQueries(1):
+            page = list(customer_directory()[:10])
+        first = page[0]
+        self.assertEqual(first, self.customers[0])
+        self.assertEqual(first.total_orders, 2)
+        self.assertEqual(first.total_spent, Decimal('350.50'))
+        self.assertEqual(first.last_address, '12 MG Road')
+        self.assertEqual(page[1].total_orders, 0)
+        self.assertEqual(page[1].total_spent, 0)
+
+    def test_cursor_pagination(self):
+        seen, cursor = [], None
+        while True:
+            data = self.client.get(reverse('api_customers'), {'limit': 2, **({'cursor': cursor} if cursor else {})}).json()
+            seen += [row['username'] for row in data['customers']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, [f'cust{n}' for n in range(5)])
+        self.assertEqual(self.client.get(reverse('api_customers'), {'cursor': 'junk'}).status_code, 400)
+
+    def test_prefix_search(self):
+        def usernames(query):
+            return sorted(c.username for c in search_customers(customer_directory(), query))
+
+        self.assertEqual(usernames('CUST3'), ['cust3'])
+        self.assertEqual(usernames('person4@'), ['cust4'])
+        self.assertEqual(usernames('person 2'), ['cust2'])
+        self.assertEqual(usernames('98765 00001'), ['cust1'])
+        user = CustomUser.objects.create_user(username='js', password=None, full_name='John Smith', last_name='Smyth-Jones')
+        self.assertEqual(usernames('smi'), ['js'])
+        user.full_name = 'John Brown'
+        user.save(update_fields=['full_name'])
+        self.assertEqual(usernames('bro'), ['js'])
+        self.assertEqual(usernames('smi'), [])
+        user.refresh_from_db()
+        self.assertEqual(user.last_name, 'Smyth-Jones')
+        self.assertEqual(usernames('ust'), [])
+
+    def test_api_fields(self):
+        row = self.client.get(reverse('api_customers'), {'search': 'cust0'}).json()['customers'][0]
+        self.assertEqual(row['phone'], '9876500000')
+        self.assertEqual(row['address'], '12 MG Road')
+        self.assertEqual(row['total_orders'], 2)
+
+    def test_staff_pages(self):
+        response = self.client.get(reverse('manage_customers'), {'search': 'cust'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['customers']), 5)
+        response = self.client.get(reverse('customer_orders', args=[self.customers[0].id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['orders']), 2)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = CustomUser.objects.create_user(username='buyer', password=None, user_type='customer')
+        self.products = [
+            Product.objects.create(name=f'P{n}', description='', price=Decimal('100'), category='wine', stock=10)
+            for n in range(4)
+        ]
+
+    def place(self, *indexes, status='completed', user=None):
+        order = Order.objects.create(user=user, phone_number='1', total_amount=Decimal('100'), status='pending')
+        for i in indexes:
+            OrderItem.objects.create(order=order, product=self.products[i], price=Decimal('100'))
+        order.status = status
+        order.save()
+        return order
+
+    def pairs(self):
+        return {
+            (self.products.index(row.product), self.products.index(row.other)): row.count
+            for row in CoPurchase.objects.select_related('product', 'other')
+        }
+
+    def test_copurchase_counts(self):
+        firsts, seconds, counts = copurchase_counts([0, 0, 0, 1, 1, 2, 2], [5, 7, 7, 5, 7, 9, 9])
+        self.assertEqual(
+            sorted(zip(firsts.tolist(), seconds.tolist(), counts.tolist())),
+            [(5, 7, 2), (7, 5, 2)],
+        )
+
+    def test_record_order_adds_to_existing_pairs(self):
+        CoPurchase.objects.create(product=self.products[0], other=self.products[1], count=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place(0, 1, 2)
+        pairs = self.pairs()
+        self.assertEqual(pairs[(0, 1)], 6)
+        self.assertEqual(pairs[(1, 0)], 1)
+        self.assertEqual(pairs[(2, 1)], 1)
+        self.assertEqual(len(pairs), 6)
+
+    def test_completed_orders_update_index_incrementally(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place(0, 1, 2)
+            self.place(0, 1)
+            self.place(0, 3, status='cancelled')
+        incremental = self.pairs()
+        self.assertEqual(incremental[(0, 1)], 2)
+        self.assertEqual(incremental[(2, 0)], 1)
+        self.assertNotIn((0, 3), incremental)
+
+        self.assertEqual(rebuild_copurchase_index(), len(incremental))
+        self.assertEqual(self.pairs(), incremental)
+
+    def test_reopened_orders_are_counted_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.place(0, 1)
+            self.place(0, 1)
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                change_status(order, 'ready')
+            with self.captureOnCommitCallbacks(execute=True):
+                change_status(order, 'completed')
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_change_status('ready', ['completed'])
+        self.assertEqual(self.pairs(), {(0, 1): 0, (1, 0): 0})
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_change_status('completed', ['ready'])
+        self.assertEqual(self.pairs(), {(0, 1): 2, (1, 0): 2})
+
+    def test_recommendations_cached_per_customer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place(0, 1)
+            self.place(0, 2)
+            self.place(0, 1)
+            self.place(0, user=self.customer)
+        self.assertEqual(recommendations_for(self.customer), [self.products[1], self.products[2]])
+        # Cached ids; only the product fetch remains
+        with self.assertNumQueries(1):
+            recommendations_for(self.customer)
+
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('customer_dashboard'))
+        self.assertEqual(list(response.context['recommended_products']), [self.products[1], self.products[2]])
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.red = Product.objects.create(name='Red', description='', price=Decimal('500'), category='wine', stock=10)
+        self.lager = Product.objects.create(name='Lager', description='', price=Decimal('200'), category='beer', stock=10)
+        self.combo = ComboOffer.objects.create(name='Party', description='', discount_percentage=Decimal('10'))
+
+    def place(self, lines, days_ago=0, status='completed'):
+        order = Order.objects.create(phone_number='1', total_amount=Decimal('0'), status='pending')
+        if days_ago:
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+            order.refresh_from_db()
+        for item, quantity in lines:
+            field = 'combo' if isinstance(item, ComboOffer) else 'product'
+            OrderItem.objects.create(order=order, quantity=quantity, price=Decimal('100'), **{field: item})
+        order.status = status
+        order.save()
+        return order
+
+    def totals(self, window, by):
+        return [(row['name'] if by == 'category' else row.name, row['total_sold'] if by == 'category' else row.total_sold)
+                for row in top_sellers(window, by)]
+
+    def test_windows_and_dimensions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place([(self.red, 2), (self.combo, 1)])
+            self.place([(self.lager, 6)], days_ago=3)
+            self.place([(self.red, 5)], days_ago=20)
+            self.place([(self.lager, 50)], status='cancelled')
+
+        self.assertEqual(self.totals('today', 'product'), [('Red', 2)])
+        self.assertEqual(self.totals('7d', 'product'), [('Lager', 6), ('Red', 2)])
+        self.assertEqual(self.totals('all', 'product'), [('Red', 7), ('Lager', 6)])
+        self.assertEqual(self.totals('all', 'combo'), [('Party', 1)])
+        self.assertEqual(self.totals('all', 'category'), [('Wine', 7), ('Beer', 6)])
+
+    def test_incremental_matches_rebuild_and_reverts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place([(self.red, 2), (self.combo, 1)])
+            refunded = self.place([(self.lager, 4)], days_ago=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            refunded.status = 'cancelled'
+            refunded.save()
+        incremental = set(DailySales.objects.filter(quantity__gt=0).values_list('day', 'product', 'combo', 'quantity', 'revenue'))
+
+        rebuild_daily_sales()
+        rebuilt = set(DailySales.objects.values_list('day', 'product', 'combo', 'quantity', 'revenue'))
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(len(rebuilt), 2)
+
+    def test_row_created_by_another_writer_is_added_to(self):
+        bulk_create = DailySales.objects.bulk_create
+
+        def other_writer_first(*args, **kwargs):
+            # Another order for the same product and day completes in between
+            DailySales.objects.create(day=timezone.localdate(), product=self.red, category='wine',
+                                      quantity=3, revenue=Decimal('300'))
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(DailySales.objects, 'bulk_create', side_effect=other_writer_first), \
+                self.assertNoLogs('wine.leaderboard'), self.captureOnCommitCallbacks(execute=True):
+            self.place([(self.red, 2)])
+        self.assertEqual(DailySales.objects.values_list('quantity', 'revenue').get(), (5, Decimal('500')))
+
+    def test_cached_ranking_and_api(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place([(self.red, 3)])
+        top_sellers('7d', 'product')
+        # Ranking from the cache; only the live product fetch remains
+        with self.assertNumQueries(1):
+            top_sellers('7d', 'product')
+
+        self.client.force_login(CustomUser.objects.create_user(username='boss', password=None, user_type='admin'))
+        data = self.client.get(reverse('api_top_sellers'), {'window': 'today', 'by': 'category'}).json()
+        self.assertEqual(data['items'], [{'category': 'wine', 'name': 'Wine', 'total_sold': 3, 'revenue': 300.0}])
+        self.assertEqual(self.client.get(reverse('api_top_sellers'), {'window': 'year'}).status_code, 400)
+        response = self.client.get(reverse('admin_dashboard'), {'top_window': 'today'})
+        self.assertEqual([p.name for p in response.context['top_products']], ['Red'])
+
+
+class AdminSectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for n in range(30):
+            Product.objects.create(name=f'Bottle {n:02d}', description='', price=Decimal('100'), category='gin', stock=n)
+        self.client.force_login(CustomUser.objects.create_user(username='boss', password=None, user_type='admin'))
+
+    def section(self, name, **params):
+        response = self.client.get(reverse('admin_section', args=[name]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_page_renders_summary_only(self):
+        self.client.get(reverse('admin_dashboard'))
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.context['total_products'], 30)
+        self.assertEqual(response.context['out_of_stock_products'], 1)
+        self.assertEqual(response.context['low_stock_products'], 10)
+        self.assertNotContains(response, 'Bottle 00')
+
+    def test_sections_paginate_and_search(self):
+        first = self.section('products')
+        self.assertTrue(first['has_next'])
+        self.assertEqual(first['count'], 30)
+        self.assertIn('Bottle 00', first['html'])
+        self.assertNotIn('Bottle 29', first['html'])
+        second = self.section('products', page=2)
+        self.assertFalse(second['has_next'])
+        self.assertIn('Bottle 29', second['html'])
+        self.assertEqual(self.section('products', search='bottle 1')['count'], 10)
+        self.assertIn('Bottle 05', self.section('offer-products')['html'])
+        self.assertEqual(self.client.get(reverse('admin_section', args=['secrets'])).status_code, 404)
+
+    def test_admin_writes_invalidate_cached_sections(self):
+        self.section('products', page=2)
+        with self.assertNumQueries(1):  # the session's user
+            self.section('products', page=2)
+        self.client.post(reverse('manage_products'), {
+            'name': 'Zubrowka', 'description': '', 'price': '900', 'stock': '5', 'category': 'vodka',
+        })
+        self.assertIn('Zubrowka', self.section('products', page=2)['html'])
+        self.assertIn('Zubrowka', self.section('offer-products')['html'])
+
+
+class CatalogFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name='Old Monk', description='', price=Decimal('400'), category='rum', stock=50)
+
+    def test_grids_served_from_cache_until_catalog_changes(self):
+        self.assertContains(self.client.get(reverse('kiosk_view')), 'Old Monk')
+        self.assertContains(self.client.get(reverse('shop_home')), 'Old Monk')
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(reverse('shop_home')), 'Old Monk')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Hercules', description='', price=Decimal('300'), category='rum', stock=5)
+        self.assertContains(self.client.get(reverse('shop_home')), 'Hercules')
+        self.assertContains(self.client.get(reverse('kiosk_view')), 'Hercules')
+
+    def test_grid_forms_carry_no_csrf_token(self):
+        response = self.client.get(reverse('shop_home'))
+        self.assertNotContains(response, '<input type="hidden" name="csrfmiddlewaretoken"')
+        self.assertContains(response, reverse('cart_summary'))
+
+    def test_stock_badge_changes_bump_version(self):
+        version = catalog_version()
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            reserve_stock({self.product.id: 5})
+        self.assertEqual(catalog_version(), version)
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            reserve_stock({self.product.id: 40})
+        self.assertNotEqual(catalog_version(), version)
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name='Old Monk', description='', price=Decimal('400'), category='rum', stock=50)
+
+    def test_repeat_anonymous_visits_skip_the_view(self):
+        for url in (reverse('shop_home'), reverse('home'), reverse('order_tracking')):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(second.content, first.content)
+            self.assertIn('Cookie', second['Vary'])
+
+    def test_query_parameters_are_part_of_the_key(self):
+        self.client.get(reverse('shop_home') + '?category=rum&search=monk')
+        with self.assertNumQueries(0):
+            self.client.get(reverse('shop_home') + '?search=monk&category=rum')
+        response = self.client.get(reverse('shop_home') + '?category=wine')
+        self.assertEqual(response.context['selected_category'], 'wine')
+
+    def test_catalog_change_invalidates(self):
+        self.client.get(reverse('shop_home'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Hercules', description='', price=Decimal('300'), category='rum', stock=5)
+        self.assertContains(self.client.get(reverse('shop_home')), 'Hercules')
+
+    def test_logged_in_users_bypass_the_cache(self):
+        self.client.get(reverse('shop_home'))
+        self.client.force_login(CustomUser.objects.create_user(username='buyer', password=None, user_type='customer'))
+        response = self.client.get(reverse('shop_home'))
+        self.assertIsNotNone(response.context)
+
+    def test_cart_summary_fills_in_the_visitor_bits(self):
+        self.client.post(reverse('add_to_cart', args=[self.product.id]), headers={'X-Requested-With': 'XMLHttpRequest'})
+        self.client.get(reverse('shop_home'))
+        data = self.client.get(reverse('cart_summary') + '?bought_together=1').json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['cart_count'], 1)
+        self.assertTrue(data['csrf_token'])
+        self.assertIn('bought_together', data)
+
+
+class ReceiptPDFTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.product = Product.objects.create(name='Old Monk', description='', price=Decimal('400'), category='rum', stock=50)
+        self.order = Order.objects.create(phone_number='9000000000', total_amount=Decimal('1050'), status='completed')
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=2, price=Decimal('400'))
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=1, price=Decimal('250'))
+
+    def test_gst_split_out_of_total(self):
+        data = receipt_data(self.order)
+        self.assertEqual(data['taxable'], Decimal('1000.00'))
+        self.assertEqual(data['cgst'] + data['sgst'], Decimal('50.00'))
+        self.assertEqual(len(data['lines']), 2)
+
+    def test_cached_on_disk_until_order_changes(self):
+        with override_settings(RECEIPT_CACHE_DIR=self.tmp.name, RECEIPT_WORKERS=0):
+            first = order_pdf(self.order, 'invoice')
+            self.assertTrue(first.read_bytes().startswith(b'%PDF'))
+            mtime = first.stat().st_mtime_ns
+            self.assertEqual(order_pdf(self.order, 'invoice'), first)
+            self.assertEqual(first.stat().st_mtime_ns, mtime)
+
+            self.order.status = 'ready'
+            self.order.save()
+            second = order_pdf(self.order, 'invoice')
+            self.assertNotEqual(second, first)
+            self.assertFalse(first.exists())
+
+    def test_markup_characters_in_names(self):
+        Product.objects.filter(pk=self.product.pk).update(name='Wine & Cheese <b>')
+        self.order.user = CustomUser.objects.create_user(username='amp', password=None, first_name='Tom & <Jerry>')
+        self.order.save()
+        data = receipt_data(self.order)
+        self.assertEqual(data['lines'][0]['name'], 'Wine & Cheese <b>')
+        self.assertTrue(render_invoice(data).startswith(b'%PDF'))
+
+    def test_batch_renders_in_worker_pool(self):
+        other = Order.objects.create(phone_number='9000000001', total_amount=Decimal('400'), status='completed')
+        OrderItem.objects.create(order=other, product=self.product, quantity=1, price=Decimal('400'))
+        with override_settings(RECEIPT_CACHE_DIR=self.tmp.name, RECEIPT_WORKERS=1):
+            paths = render_batch([self.order, other])
+        self.assertEqual(len(paths), 2)
+        self.assertTrue(all(path.read_bytes().startswith(b'%PDF') for path in paths))
+
+    def test_staff_download_and_reprint_command(self):
+        self.client.force_login(CustomUser.objects.create_user(username='till', password=None, user_type='staff'))
+        with override_settings(RECEIPT_CACHE_DIR=self.tmp.name, RECEIPT_WORKERS=0):
+            response = self.client.get(reverse('order_receipt_pdf', args=[self.order.id]))
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+            out = StringIO()
+            call_command('reprint_receipts', kind='invoice', zip_path=f'{self.tmp.name}/day.zip', stdout=out)
+        self.assertIn('1 invoice PDFs', out.getvalue())
+
+
+class EscPosReceiptTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(printspool._queues.clear)
+        self.printer = f'{self.tmp.name}/counter.bin'
+        product = Product.objects.create(name='Old Monk', description='', price=Decimal('400'), category='rum', stock=50)
+        self.order = Order.objects.create(
+            phone_number='9000000000', total_amount=Decimal('800'), status='ready', token_number='4321'
+        )
+        OrderItem.objects.create(order=self.order, product=product, quantity=2, price=Decimal('400'))
+
+    def test_receipt_bytes(self):
+        payload = escpos.render_receipt(receipt_data(self.order), tracking_url='https://example.com/track-order/4321/')
+        self.assertTrue(payload.startswith(escpos.INIT))
+        self.assertTrue(payload.endswith(escpos.CUT))
+        self.assertIn(b'4321', payload)
+        self.assertIn(b'Old Monk', payload)
+        self.assertIn(b'https://example.com/track-order/4321/', payload)
+        self.assertLess(len(payload), 2048)
+
+    def test_spool_batches_jobs_per_printer(self):
+        with override_settings(RECEIPT_PRINTERS={'counter': f'file://{self.printer}'}):
+            printspool.submit('counter', b'one')
+            printspool.submit('counter', b'two')
+            printspool.flush()
+        with open(self.printer, 'rb') as f:
+            self.assertEqual(f.read(), b'onetwo')
+
+    def test_unreachable_printer_keeps_jobs(self):
+        with override_settings(RECEIPT_PRINTERS={'dead': 'tcp://127.0.0.1:9'}):
+            printspool.submit('dead', b'job')
+            with self.assertLogs('wine.printspool', 'WARNING'):
+                self.assertEqual(printspool.flush(), 0)
+            self.assertEqual(printspool.pending('dead'), 1)
+
+    def test_dropped_connection_requeues_only_unsent_jobs(self):
+        written = []
+
+        @contextmanager
+        def flaky(url):
+            def write(payload):
+                if len(written) == 1:
+                    raise ConnectionResetError()
+                written.append(payload)
+            yield write
+
+        with override_settings(RECEIPT_PRINTERS={'counter': 'tcp://printer:9100'}):
+            for payload in (b'one', b'two', b'three'):
+                printspool.submit('counter', payload)
+            with mock.patch.object(printspool, 'connect', flaky), self.assertLogs('wine.printspool', 'WARNING'):
+                self.assertEqual(printspool.flush(), 1)
+        self.assertEqual(written, [b'one'])
+        self.assertEqual([payload for payload, _ in printspool._queues['counter']], [b'two', b'three'])
+
+    def test_staff_print_view(self):
+        self.client.force_login(CustomUser.objects.create_user(username='till', password=None, user_type='staff'))
+        url = reverse('order_receipt_escpos', args=[self.order.id])
+        self.assertIn(b'/track-order/4321/', self.client.get(url).content)
+        with override_settings(RECEIPT_PRINTERS={'counter': f'file://{self.printer}'}):
+            data = self.client.post(url).json()
+            printspool.flush()
+        self.assertTrue(data['success'])
+        with open(self.printer, 'rb') as f:
+            self.assertIn(b'4321', f.read())
+
+
+class TVBoardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        product = Product.objects.create(name='Old Monk', description='', price=Decimal('400'), category='rum', stock=50)
+        for n in range(25):
+            Order.objects.create(phone_number='1', total_amount=Decimal('1'), status='pending', token_number=str(1000 + n))
+        self.preparing = Order.objects.create(phone_number='1', total_amount=Decimal('1'), status='preparing')
+        self.ready = Order.objects.create(phone_number='1', total_amount=Decimal('1'), status='ready', token_number='7')
+        Order.objects.create(phone_number='1', total_amount=Decimal('1'), status='completed')
+        for _ in range(4):
+            OrderItem.objects.create(order=self.ready, product=product, quantity=2, price=Decimal('400'))
+
+    def test_board_ordered_in_sql_with_true_counts(self):
+        with self.assertNumQueries(2):
+            orders = board_orders()
+        self.assertEqual(len(orders), 20)
+        self.assertEqual([o['id'] for o in orders[:2]], [self.ready.id, self.preparing.id])
+        self.assertEqual(orders[0]['item_count'], 4)
+        self.assertEqual(orders[0]['items'][0], {'name': 'Old Monk', 'quantity': 2})
+        self.assertEqual(status_counts(), {'pending': 25, 'preparing': 1, 'ready': 1})
+
+    def test_tv_display_page(self):
+        self.client.force_login(CustomUser.objects.create_user(username='tv', password=None, user_type='staff'))
+        response = self.client.get(reverse('tv_display'))
+        self.assertEqual(response.context['pending_count'], 25)
+        self.assertEqual(response.context['total_active'], 27)
+        self.assertContains(response, '+1 more items')
+
+
+class LiveBoardTests(TestCase):
+    def setUp(self):
+        cache_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir,
+        }}))
+        self.staff = CustomUser.objects.create_user(username='counter', password=None, user_type='staff')
+        self.old = Order.objects.create(phone_number='9876500001', total_amount=Decimal('10'), status='pending')
+        self.newer = Order.objects.create(phone_number='9876500002', total_amount=Decimal('20'), status='pending')
+        liveboard.reload()
+
+    def test_reads_come_from_memory(self):
+        with self.assertNumQueries(0):
+            board = liveboard.live_board()
+            self.assertEqual([row['id'] for row in board.top(10)], [self.old.id, self.newer.id])
+            self.assertEqual(board.recent(1)[0]['id'], self.newer.id)
+            self.assertEqual(board.counts(), {'pending': 2})
+
+    def test_status_change_applied_from_the_log(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.newer.status = 'ready'
+            self.newer.save()
+        # The log rows after the cursor, then the changed order's row and items
+        with self.assertNumQueries(3):
+            board = liveboard.live_board()
+        self.assertEqual([row['id'] for row in board.top(10)], [self.newer.id, self.old.id])
+        self.assertEqual(board.top(1)[0]['status_display'], 'Ready for Pickup')
+        self.assertEqual(board.counts(), {'pending': 1, 'ready': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.newer.status = 'completed'
+            self.newer.save()
+        board = liveboard.live_board()
+        self.assertEqual([row['id'] for row in board.top(10)], [self.old.id])
+        self.assertEqual(board.recent(1)[0]['status'], 'completed')
+        with self.assertNumQueries(0):
+            liveboard.live_board()
+
+    def test_new_order_is_added(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(user=self.staff, total_amount=Decimal('30'), status='preparing')
+        board = liveboard.live_board()
+        self.assertEqual(board.top(1)[0]['id'], order.id)
+        self.assertEqual(board.recent(1)[0]['customer'], 'counter')
+        self.assertEqual(board.counts(), {'pending': 2, 'preparing': 1})
+
+    def test_change_from_another_process_is_applied(self):
+        # Another worker moved the order: its log rows are there, and the shared version moved
+        Order.objects.filter(pk=self.old.pk).update(status='ready')
+        record_changes([self.old.pk], old_status='pending', status='ready')
+        self.assertEqual(liveboard.live_board().counts(), {'pending': 2})
+        cache.incr(liveboard.VERSION_KEY)
+        board = liveboard.live_board()
+        self.assertEqual(board.counts(), {'pending': 1, 'ready': 1})
+        self.assertEqual(board.top(1)[0]['id'], self.old.id)
+
+    def test_bulk_moves_keep_counts_exact(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_change_status('preparing', ['pending'], order_ids=[self.old.pk])
+        self.assertEqual(liveboard.live_board().counts(), {'pending': 1, 'preparing': 1})
+
+    def test_invalidate_after_bulk_update(self):
+        Order.objects.update(status='completed')
+        liveboard.invalidate()
+        board = liveboard.live_board()
+        self.assertEqual(board.top(10), [])
+        self.assertEqual(board.counts(), {'completed': 2})
+
+    def test_private_cache_reads_the_database(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            Order.objects.filter(pk=self.old.pk).update(status='ready')
+            board = liveboard.live_board()
+            self.assertIsInstance(board, liveboard.DatabaseBoard)
+            self.assertEqual(board.counts(), {'pending': 1, 'ready': 1})
+            self.assertEqual(board.top(1)[0]['id'], self.old.id)
+
+    def test_dashboard_views_read_the_board(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('api_recent_orders'))
+        orders = response.json()['orders']
+        self.assertEqual([o['id'] for o in orders], [str(self.newer.id), str(self.old.id)])
+        self.assertEqual(orders[0]['customer_name'], 'Customer 0002')
+        self.assertEqual(self.client.get(reverse('api_dashboard_stats')).json()['pending'], 2)
+        response = self.client.get(reverse('staff_dashboard'))
+        self.assertEqual(response.context['all_count'], 2)
+        self.assertContains(response, '9876500002')
+
+
+class StatusTransitionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = CustomUser.objects.create_user(username='counter', password=None, user_type='staff')
+        self.wine = Product.objects.create(name='Red', description='', price=Decimal('500'), category='wine', stock=10)
+        self.beer = Product.objects.create(name='Lager', description='', price=Decimal('200'), category='beer', stock=10)
+        self.preparing = [self.place('preparing') for _ in range(3)]
+        self.ready = [self.place('ready') for _ in range(2)]
+        self.pending = self.place('pending')
+
+    def place(self, status):
+        order = Order.objects.create(phone_number='1', total_amount=Decimal('700'), status=status)
+        OrderItem.objects.create(order=order, product=self.wine, quantity=1, price=Decimal('500'))
+        OrderItem.objects.create(order=order, product=self.beer, quantity=2, price=Decimal('100'))
+        return order
+
+    def statuses(self):
+        return dict(Order.objects.values_list('status').annotate(n=Count('id')).order_by())
+
+    def test_one_update_per_source_status(self):
+        with CaptureQueriesContext(connection) as queries:
+            moved = bulk_change_status('cancelled')
+        self.assertEqual(moved, {'pending': 1, 'preparing': 3, 'ready': 2})
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "wine_order"')]
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(self.statuses(), {'cancelled': 6})
+
+    def test_only_listed_orders_and_allowed_sources(self):
+        moved = bulk_change_status('ready', order_ids=[self.preparing[0].id, self.pending.id])
+        self.assertEqual(moved, {'preparing': 1})
+        self.assertEqual(self.statuses(), {'pending': 1, 'preparing': 2, 'ready': 3})
+        with self.assertRaises(InvalidTransition):
+            bulk_change_status('completed', ['pending'])
+        self.assertEqual(self.statuses(), {'pending': 1, 'preparing': 2, 'ready': 3})
+
+    def test_bulk_close_out_feeds_rollups(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_change_status('completed', ['ready'])
+        sales = dict(DailySales.objects.values_list('product__name', 'quantity'))
+        self.assertEqual(sales, {'Red': 2, 'Lager': 4})
+        pairs = dict(CoPurchase.objects.values_list('product__name', 'count'))
+        self.assertEqual(pairs, {'Red': 2, 'Lager': 2})
+        self.assertEqual(liveboard.live_board().counts()['completed'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_change_status('completed', ['ready'], order_ids=[self.place('ready').id])
+        self.assertEqual(CoPurchase.objects.get(product=self.wine).count, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_change_status('ready', ['completed'])
+        self.assertFalse(DailySales.objects.filter(quantity__gt=0).exists())
+
+    def test_bulk_endpoint(self):
+        self.client.force_login(self.staff)
+        url = reverse('api_bulk_update_order_status')
+        response = self.client.post(url, {'status': 'ready', 'from': ['preparing']}, content_type='application/json')
+        data = response.json()
+        self.assertEqual(data['updated'], {'preparing': 3})
+        self.assertEqual(data['total_updated'], 3)
+        self.assertEqual(data['counts'], {'pending': 1, 'ready': 5})
+
+        response = self.client.post(url, {'status': 'completed', 'from': 'pending'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {'status': 'ready', 'order_ids': ['nope']}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        for body in ({'from': ['preparing']}, {'status': 'shipped'}):
+            response = self.client.post(url, body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_single_order_paths_share_the_state_machine(self):
+        self.client.force_login(self.staff)
+        order = self.pending
+        response = self.client.post(
+            reverse('quick_status_update'), {'order_id': str(order.id), 'status': 'completed'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            reverse('update_order_status', args=[order.id]), {'status': 'completed'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.client.post(reverse('manage_orders'), {'order_id': str(order.id), 'status': 'completed'})
+        self.client.post(reverse('order_detail', args=[order.id]), {'status': 'completed'})
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'pending')
+
+        response = self.client.post(
+            reverse('quick_status_update'), {'order_id': str(order.id), 'status': 'preparing'},
+            content_type='application/json',
+        )
+        self.assertTrue(response.json()['success'])
+        self.client.post(reverse('order_detail', args=[order.id]), {'status': 'ready'})
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'ready')
+
+
+class OrderChangeFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pending = Order.objects.create(phone_number='9876500001', total_amount=Decimal('10'), status='pending')
+        self.ready = Order.objects.create(phone_number='9876500002', total_amount=Decimal('20'), status='ready')
+        self.done = Order.objects.create(phone_number='9876500003', total_amount=Decimal('30'), status='completed')
+
+    def test_snapshot_then_idle_polls(self):
+        feed = changes(status='active')
+        self.assertEqual({o['id'] for o in feed['orders']}, {str(self.pending.id), str(self.ready.id)})
+        self.assertEqual(feed['removed'], [])
+        # Nothing changed: one query on the change log
+        with self.assertNumQueries(1):
+            idle = changes(feed['cursor'], status='active')
+        self.assertEqual((idle['orders'], idle['removed'], idle['more']), ([], [], False))
+        self.assertEqual(idle['cursor'], feed['cursor'])
+
+    def test_changes_and_deletions_since_cursor(self):
+        cursor = current_cursor()
+        self.pending.status = 'cancelled'
+        self.pending.save()
+        new = Order.objects.create(phone_number='9876500004', total_amount=Decimal('40'), status='pending')
+        deleted_id = self.ready.id
+        self.ready.delete()
+
+        feed = changes(cursor, status='active')
+        self.assertEqual([o['id'] for o in feed['orders']], [str(new.id)])
+        self.assertEqual(feed['orders'][0]['customer_name'], 'Customer 0004')
+        # Left the filter, and deleted
+        self.assertEqual(feed['removed'], [str(self.pending.id), str(deleted_id)])
+
+        everything = changes(cursor)
+        self.assertCountEqual([o['id'] for o in everything['orders']], [str(self.pending.id), str(new.id)])
+
+    def test_late_commit_is_not_skipped(self):
+        # A change logged long after the order's updated_at still follows the cursor
+        cursor = current_cursor()
+        Order.objects.filter(pk=self.done.pk).update(status='ready', updated_at=timezone.now() - timedelta(hours=1))
+        record_changes([self.done.pk])
+        feed = changes(cursor)
+        self.assertEqual([o['status'] for o in feed['orders']], ['ready'])
+        self.assertEqual(changes(feed['cursor'])['orders'], [])
+
+    def test_bulk_moves_are_logged(self):
+        cursor = current_cursor()
+        bulk_change_status('completed', ['ready'])
+        self.assertEqual([o['id'] for o in changes(cursor)['orders']], [str(self.ready.id)])
+
+    def test_pages_follow_the_cursor(self):
+        seen, cursor = [], None
+        while True:
+            feed = changes(cursor, limit=1)
+            seen += [o['id'] for o in feed['orders']]
+            cursor = feed['cursor']
+            if not feed['more']:
+                break
+        self.assertEqual(sorted(seen), sorted(str(o.id) for o in (self.pending, self.ready, self.done)))
+        self.assertEqual(changes(cursor)['orders'], [])
+
+        cursor = current_cursor()
+        for order in (self.pending, self.ready):
+            order.total_amount += 1
+            order.save()
+        first = changes(cursor, limit=1)
+        self.assertTrue(first['more'])
+        second = changes(first['cursor'], limit=1)
+        self.assertEqual([o['id'] for o in first['orders'] + second['orders']], [str(self.pending.id), str(self.ready.id)])
+        self.assertFalse(second['more'])
+
+    def test_purged_cursor_resets(self):
+        cursor = current_cursor()
+        self.done.save()
+        OrderChange.objects.update(changed_at=timezone.now() - timedelta(days=30))
+        purge_order_changes()
+        self.assertTrue(changes(cursor)['reset'])
+        with self.assertRaises(ValueError):
+            decode_cursor('99999999999999999999')
+
+    def test_endpoint(self):
+        self.client.force_login(CustomUser.objects.create_user(username='counter', password=None, user_type='staff'))
+        url = reverse('api_order_changes')
+        response = self.client.get(url, {'status': 'active'})
+        data = response.json()
+        self.assertEqual(len(data['orders']), 2)
+        self.assertEqual(data['counts'], {'pending': 1, 'ready': 1, 'completed': 1})
+
+        idle = self.client.get(url, {'since': data['cursor'], 'status': 'active'})
+        self.assertNotIn('counts', idle.json())
+        self.assertLess(len(idle.content), 120)
+
+        self.assertEqual(self.client.get(url, {'since': 'garbage'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'since': '99999999999999999999'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'status': 'shipped'}).status_code, 400)
+        self.assertIn('feed_cursor', self.client.get(reverse('manage_orders')).context)
+
+
+class OrderStatusEventTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = CustomUser.objects.create_user(username='counter', password=None, user_type='staff')
+
+    def place(self, status='pending', order_type='pickup'):
+        return Order.objects.create(phone_number='1', total_amount=Decimal('100'), status=status, order_type=order_type)
+
+    def backdate(self, order, **delta):
+        """Move the order and its events ``delta`` into the past."""
+        Order.objects.filter(pk=order.pk).update(created_at=order.created_at - timedelta(**delta))
+        order.refresh_from_db()
+
+    def test_every_path_logs_events(self):
+        order = self.place()
+        change_status(order, 'preparing', self.staff, 'Rush')
+        bulk_change_status('ready', order_ids=[order.id], user=self.staff)
+        events = list(OrderStatusEvent.objects.filter(order=order).values_list('old_status', 'status', 'changed_by'))
+        self.assertEqual(events, [(None, 'pending', None), ('pending', 'preparing', self.staff.id),
+                                  ('preparing', 'ready', self.staff.id)])
+        self.assertEqual(OrderStatusEvent.objects.get(status='preparing').notes, 'Rush')
+
+    def test_timeline_from_events_in_one_query(self):
+        order = self.place(order_type='delivery')
+        change_status(order, 'preparing')
+        change_status(order, 'ready')
+        order = Order.objects.get(pk=order.pk)
+        with self.assertNumQueries(1):
+            timeline = order.get_status_timeline()
+            self.assertIs(order.get_status_timeline(), timeline)
+        steps = {step['status']: step for step in timeline}
+        self.assertEqual([step['name'] for step in timeline][-2:], ['Out for Delivery', 'Delivered'])
+        self.assertTrue(steps['preparing']['completed'])
+        self.assertIsNone(steps['confirmed']['time'])
+        self.assertTrue(steps['ready']['current'])
+        self.assertEqual(steps['ready']['time'], OrderStatusEvent.objects.get(status='ready').created_at)
+        self.assertIsNone(steps['completed']['time'])
+
+        orders = list(Order.objects.prefetch_related('status_events'))
+        with self.assertNumQueries(0):
+            orders[0].get_status_timeline()
+
+    def test_cancelled_timeline_keeps_reached_steps(self):
+        order = self.place()
+        change_status(order, 'preparing')
+        change_status(order, 'cancelled')
+        timeline = Order.objects.get(pk=order.pk).get_status_timeline()
+        self.assertEqual([step['status'] for step in timeline], ['pending', 'preparing', 'cancelled'])
+        self.assertTrue(timeline[-1]['current'])
+
+    def test_sketch_quantiles_within_accuracy(self):
+        sketch, other = QuantileSketch(), QuantileSketch()
+        for value in range(1, 1001):
+            (sketch if value % 2 else other).add(value)
+        sketch = QuantileSketch.from_dict(json.loads(json.dumps(sketch.merge(other).to_dict())))
+        self.assertEqual(sketch.count, 1000)
+        for q, exact in ((0.5, 500), (0.9, 900), (0.99, 990)):
+            self.assertAlmostEqual(sketch.quantile(q), exact, delta=exact * 0.02)
+
+    def test_prep_times_recorded_per_hour(self):
+        orders = [self.place('preparing') for _ in range(4)]
+        for minutes, order in enumerate(orders, start=1):
+            self.backdate(order, minutes=10 * minutes)
+        with self.captureOnCommitCallbacks(execute=True):
+            change_status(orders[0], 'ready')
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_change_status('ready', order_ids=[order.id for order in orders[1:]])
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_change_status('completed', ['ready'])
+
+        report = prep_time_report()
+        self.assertEqual(report['total']['placed_ready']['count'], 4)
+        self.assertAlmostEqual(report['total']['placed_ready']['p50'], 20 * 60, delta=20 * 60 * 0.02)
+        # Ranks are q * (n - 1), rounded down: 1.5 and 2.7 of 0..3
+        self.assertAlmostEqual(report['total']['placed_ready']['p90'], 30 * 60, delta=30 * 60 * 0.02)
+        self.assertEqual(report['total']['ready_completed']['count'], 4)
+        hour = timezone.localtime().strftime('%H:00')
+        self.assertEqual(next(row for row in report['hours'] if row['hour'] == hour)['placed_ready']['count'], 4)
+
+        # Going back to ready does not count the order again
+        with self.captureOnCommitCallbacks(execute=True):
+            change_status(Order.objects.get(pk=orders[0].pk), 'ready')
+        self.assertEqual(prep_time_report()['total']['placed_ready']['count'], 4)
+
+        stored = {row.metric: row.count for row in PrepTimeSketch.objects.all()}
+        PrepTimeSketch.objects.all().delete()
+        rebuild_prep_times()
+        self.assertEqual({row.metric: row.count for row in PrepTimeSketch.objects.all()}, stored)
+
+    def test_prep_time_row_created_concurrently_is_merged(self):
+        order = self.place('preparing')
+        self.backdate(order, minutes=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            change_status(order, 'ready')
+        # Another process inserts the hour's row after this one looked for it
+        real_lock_rows = preptimes.lock_rows
+        calls = []
+
+        def late_row(queryset):
+            calls.append(queryset)
+            return queryset.none() if len(calls) == 1 else real_lock_rows(queryset)
+
+        other = self.place('preparing')
+        self.backdate(other, minutes=20)
+        with mock.patch.object(preptimes, 'lock_rows', late_row), self.captureOnCommitCallbacks(execute=True):
+            change_status(other, 'ready')
+        self.assertEqual(PrepTimeSketch.objects.get(metric='placed_ready').count, 2)
+
+    def test_change_attribution_is_not_reused(self):
+        order = self.place()
+        change_status(order, 'preparing', self.staff, 'Rush')
+        order.status = 'ready'
+        order.save()
+        event = OrderStatusEvent.objects.get(status='ready')
+        self.assertEqual((event.changed_by, event.notes), (None, ''))
+
+    def test_deferred_status(self):
+        order = self.place()
+        untouched = Order.objects.only('id', 'phone_number').get(pk=order.pk)
+        untouched.phone_number = '2'
+        untouched.save()
+        self.assertEqual(OrderChange.objects.filter(order_id=order.pk).last().status, None)
+
+        moved = Order.objects.defer('status').get(pk=order.pk)
+        moved.status = 'confirmed'
+        moved.save()
+        change = OrderChange.objects.filter(order_id=order.pk).last()
+        self.assertEqual((change.old_status, change.status), ('pending', 'confirmed'))
+        self.assertEqual(list(order.status_events.values_list('old_status', 'status')),
+                         [(None, 'pending'), ('pending', 'confirmed')])
+
+    def test_prep_times_api(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('api_prep_times'), {'date': '2026-01-02'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['hours']), 24)
+        self.assertEqual(self.client.get(reverse('api_prep_times'), {'date': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('prep_times')).status_code, 200)
+
+
+class WorkQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = CustomUser.objects.create_user(username='counter', password=None, user_type='staff')
+        self.orders = [self.place() for _ in range(3)]
+
+    def place(self, status='pending', order_type='pickup'):
+        return Order.objects.create(phone_number='1', total_amount=Decimal('100'), status=status, order_type=order_type)
+
+    def expire(self, order):
+        Order.objects.filter(pk=order.pk).update(claim_expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_claims_oldest_unclaimed_pickup_order(self):
+        self.place(order_type='delivery')
+        first = workqueue.claim_next('till-1', self.staff)
+        second = workqueue.claim_next('till-2')
+        self.assertEqual([first.pk, second.pk], [self.orders[0].pk, self.orders[1].pk])
+        self.assertEqual((first.status, first.claimed_by), ('preparing', 'till-1'))
+        self.assertEqual(first.status_events.last().changed_by, self.staff)
+        self.assertEqual(workqueue.claim_next('till-1').pk, self.orders[2].pk)
+        self.assertIsNone(workqueue.claim_next('till-3'))
+
+    def test_expired_claim_goes_to_next_terminal(self):
+        order = workqueue.claim_next('till-1')
+        self.expire(order)
+        self.assertEqual(workqueue.claim_next('till-2').pk, order.pk)
+        with self.assertRaises(workqueue.ClaimLost):
+            workqueue.renew(order.pk, 'till-1')
+        with self.assertRaises(workqueue.ClaimLost):
+            workqueue.finish(order.pk, 'till-1')
+        self.assertEqual(TerminalThroughput.objects.get(terminal='till-1').expired, 1)
+
+    def test_release_renew_and_finish(self):
+        order = workqueue.claim_next('till-1')
+        workqueue.release(order.pk, 'till-1')
+        self.assertEqual(workqueue.claim_next('till-2').pk, order.pk)
+        self.assertGreater(workqueue.renew(order.pk, 'till-2'), timezone.now())
+        self.assertEqual(workqueue.finish(order.pk, 'till-2').status, 'ready')
+        self.assertIsNone(Order.objects.get(pk=order.pk).claimed_by)
+
+        report = {row['terminal']: row for row in workqueue.terminal_throughput()}
+        self.assertEqual((report['till-1']['claimed'], report['till-1']['released']), (1, 1))
+        self.assertEqual((report['till-2']['claimed'], report['till-2']['completed']), (1, 1))
+        self.assertIsNotNone(report['till-2']['avg_prep_seconds'])
+
+    def test_leaving_the_queue_frees_the_claim(self):
+        cancelled = workqueue.claim_next('till-1')
+        change_status(cancelled, 'cancelled')
+        ready = workqueue.claim_next('till-1')
+        bulk_change_status('ready', order_ids=[ready.pk])
+        for order in (cancelled, ready):
+            order.refresh_from_db()
+            self.assertEqual((order.claimed_by, order.claim_expires_at), (None, None))
+        with self.assertRaises(workqueue.ClaimLost):
+            workqueue.renew(ready.pk, 'till-1')
+        change_status(cancelled, 'pending')
+        self.assertEqual(workqueue.claim_next('till-2').pk, cancelled.pk)
+
+    def test_claim_api_and_change_feed(self):
+        self.client.force_login(self.staff)
+        cursor = current_cursor()
+        response = self.client.post(
+            reverse('api_claim_next_order'), json.dumps({'terminal': 'till-1'}), content_type='application/json',
+        )
+        order_id = response.json()['order']['id']
+        self.assertEqual(order_id, str(self.orders[0].pk))
+        claimed = {order['id']: order['claimed_by'] for order in changes(cursor)['orders']}
+        self.assertEqual(claimed[order_id], 'till-1')
+
+        url = reverse('api_order_claim', args=[order_id])
+        lost = self.client.post(url, json.dumps({'terminal': 'till-2', 'action': 'finish'}),
+                                content_type='application/json')
+        self.assertEqual(lost.status_code, 409)
+        done = self.client.post(url, json.dumps({'terminal': 'till-1', 'action': 'finish'}),
+                                content_type='application/json')
+        self.assertEqual(done.json()['status'], 'ready')
+        terminals = self.client.get(reverse('api_terminal_throughput')).json()['terminals']
+        self.assertEqual(terminals[0]['terminal'], 'till-1')
+
+
+@contextmanager
+def file_database():
+    """
+    Run the block on a file copy of the SQLite test database, from every
+    thread: the in-memory one fails concurrent writers at once ("table is
+    locked") instead of having them wait.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path = f'{directory}/test.sqlite3'
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        connection.connection.backup(target)
+        target.close()
+        memory, settings_dict = connections['default'], connections.settings['default']
+        # New connections, the main thread's included, open the file
+        connections.settings['default'] = {**settings_dict, 'NAME': path}
+        del connections['default']
+        try:
+            yield
+        finally:
+            connections['default'].close()
+            connections.settings['default'] = settings_dict
+            connections['default'] = memory
+
+
+class ConcurrentWorkQueueTests(TransactionTestCase):
+    ORDERS = 40
+
+    def setUp(self):
+        self.enterContext(file_database())
+        Order.objects.bulk_create(
+            Order(phone_number='1', total_amount=Decimal('100'), status='preparing', order_type='pickup')
+            for _ in range(self.ORDERS)
+        )
+
+    def run_terminals(self, terminals, prep_seconds=0.0):
+        """Terminals claim and finish orders until the queue is empty; returns their claims."""
+        claims = {f'till-{n}': [] for n in range(terminals)}
+        errors = []
+
+        def work(terminal):
+            try:
+                while (order := workqueue.claim_next(terminal)) is not None:
+                    claims[terminal].append(order.pk)
+                    time.sleep(prep_seconds)
+                    workqueue.finish(order.pk, terminal)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(terminal,)) for terminal in claims]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return claims
+
+    def test_no_order_claimed_twice(self):
+        claims = self.run_terminals(8)
+        claimed = [order_id for ids in claims.values() for order_id in ids]
+        self.assertEqual(len(claimed), self.ORDERS)
+        self.assertEqual(len(set(claimed)), self.ORDERS)
+        self.assertEqual(Order.objects.filter(status='ready').count(), self.ORDERS)
+        self.assertEqual(sum(TerminalThroughput.objects.values_list('completed', flat=True)), self.ORDERS)
+
+    def test_no_order_claimed_twice_while_terminals_work(self):
+        # Claims interleave with work in progress; how much faster more
+        # terminals are is for manage.py bench_work_queue to measure
+        claims = self.run_terminals(4, prep_seconds=0.01)
+        claimed = [order_id for ids in claims.values() for order_id in ids]
+        self.assertEqual(len(claimed), self.ORDERS)
+        self.assertEqual(len(set(claimed)), self.ORDERS)
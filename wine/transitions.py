@@ -0,0 +1,121 @@
+"""
+Order status state machine shared by every path that changes status.
+
+``TRANSITIONS`` lists where an order may go from each status. One order is
+moved with ``change_status`` (a normal ``save()``, so ``order_status_changed``
+fires); many at once with ``bulk_change_status``, e.g. "mark all preparing
+as ready" or closing out the day. That issues one
+
+    UPDATE ... SET status = <new> WHERE status = <source> [AND id IN (...)]
+
+per source status allowed into the target, in one transaction. The
+``WHERE status`` is the validation: an order another terminal moved in the
+meantime is simply not matched. The moved orders' ``OrderStatusEvent``
+and ``OrderChange`` rows go in with one bulk insert each, and
+``bulk_status_changed`` is sent on commit with the moved ids, so the sales
+rollup, co-purchase index, live board and prep-time sketches catch up in
+bulk instead of order by order.
+
+Moving an order out of ``QUEUE_STATUSES`` (to ready, completed, cancelled)
+also frees any work-queue claim on it.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .db import lock_rows
+from .models import Order, OrderStatusEvent
+from .signals import bulk_status_changed, record_changes
+
+TRANSITIONS = {
+    'pending': ('confirmed', 'preparing', 'cancelled'),
+    'confirmed': ('preparing', 'pending', 'cancelled'),
+    'preparing': ('ready', 'pending', 'cancelled'),
+    'ready': ('completed', 'preparing', 'cancelled'),
+    'completed': ('ready',),
+    'cancelled': ('pending',),
+}
+# Statuses a terminal can hold a claim in (see ``workqueue``); moving out of
+# them frees the claim
+QUEUE_STATUSES = ('pending', 'confirmed', 'preparing')
+CLAIM_FIELDS = {'claimed_by': None, 'claim_expires_at': None}
+
+
+class InvalidTransition(ValueError):
+    def __init__(self, old_status, new_status):
+        self.old_status, self.new_status = old_status, new_status
+        super().__init__(f'Invalid status transition from {old_status} to {new_status}')
+
+
+def allowed(old_status, new_status):
+    return new_status in TRANSITIONS.get(old_status, ())
+
+
+def sources(new_status):
+    """Statuses an order may move to ``new_status`` from."""
+    return [status for status, targets in TRANSITIONS.items() if new_status in targets]
+
+
+def change_status(order, new_status, user=None, notes=''):
+    """Move one order, or raise ``InvalidTransition``. ``user`` and ``notes`` go in the status log."""
+    if not allowed(order.status, new_status):
+        raise InvalidTransition(order.status, new_status)
+    order.status = new_status
+    update_fields = ['status', 'updated_at']
+    if new_status not in QUEUE_STATUSES:
+        for field, value in CLAIM_FIELDS.items():
+            setattr(order, field, value)
+        update_fields += CLAIM_FIELDS
+    order._status_changed_by, order._status_notes = user, notes
+    order.save(update_fields=update_fields)
+    return order
+
+
+def bulk_change_status(new_status, from_statuses=None, order_ids=None, user=None):
+    """
+    Move every order in ``from_statuses`` (default: all allowed sources),
+    optionally only those in ``order_ids``, to ``new_status``, logged as
+    changed by ``user``. Returns
+    ``{source status: orders moved}``; raises ``InvalidTransition`` if a
+    requested source may not move to ``new_status``.
+    """
+    allowed_sources = sources(new_status)
+    if from_statuses is None:
+        from_statuses = allowed_sources
+    for status in from_statuses:
+        if status not in allowed_sources:
+            raise InvalidTransition(status, new_status)
+
+    released = CLAIM_FIELDS if new_status not in QUEUE_STATUSES else {}
+    moved = {}
+    with transaction.atomic():
+        now = timezone.now()
+        for status in from_statuses:
+            orders = Order.objects.filter(status=status)
+            if order_ids is not None:
+                orders = orders.filter(id__in=order_ids)
+            # Ids first so receivers know which orders moved. PostgreSQL
+            # locks the rows; SQLite reads and writes one snapshot (another
+            # writer committing in between makes the UPDATE fail, not drift),
+            # so the UPDATE with the same WHERE matches exactly these.
+            ids = list(lock_rows(orders).values_list('id', flat=True))
+            if not ids:
+                continue
+            count = orders.update(status=new_status, updated_at=now, **released)
+            if count:
+                moved[status] = count
+                OrderStatusEvent.objects.bulk_create(
+                    OrderStatusEvent(
+                        order_id=order_id, old_status=status, status=new_status, changed_by=user, created_at=now,
+                    )
+                    for order_id in ids
+                )
+                record_changes(ids, old_status=status, status=new_status)
+                _announce(ids, status, new_status, now)
+    return moved
+
+
+def _announce(order_ids, old_status, new_status, changed_at):
+    transaction.on_commit(lambda: bulk_status_changed.send(
+        sender=Order, order_ids=order_ids, old_status=old_status, new_status=new_status, changed_at=changed_at,
+    ))
@@ -15,6 +15,7 @@ urlpatterns = [
     
     # Admin Dashboard URLs
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin-dashboard/sections/<slug:name>/', views.admin_section, name='admin_section'),
     path('admin-dashboard/products/', views.manage_products, name='manage_products'),
     path('admin-dashboard/staff/', views.manage_staff, name='manage_staff'),
     path('admin-dashboard/sales-report/', views.sales_report, name='sales_report'),
@@ -31,17 +32,24 @@ urlpatterns = [
     path('staff/orders/<uuid:order_id>/', views.order_detail, name='order_detail'),
     path('staff/orders/quick-update/', views.quick_status_update, name='quick_status_update'),
     path('staff/orders/<uuid:order_id>/print/', views.print_receipt, name='print_receipt'),
+    path('staff/orders/<uuid:order_id>/receipt.pdf', views.order_document_pdf, {'kind': 'receipt'}, name='order_receipt_pdf'),
+    path('staff/orders/<uuid:order_id>/invoice.pdf', views.order_document_pdf, {'kind': 'invoice'}, name='order_invoice_pdf'),
+    path('staff/orders/<uuid:order_id>/receipt.escpos', views.order_receipt_escpos, name='order_receipt_escpos'),
     path('staff/products/', views.view_products, name='view_products'),
     path('staff/customers/', views.manage_customers, name='manage_customers'),
-    path('staff/customers/<uuid:customer_id>/orders/', views.customer_orders, name='customer_orders'),
+    path('staff/customers/<int:customer_id>/orders/', views.customer_orders, name='customer_orders'),
 
     path('api/dashboard/stats/', views.api_dashboard_stats, name='api_dashboard_stats'),
     path('api/orders/', views.api_orders, name='api_orders'),
     path('api/orders/recent/', views.api_recent_orders, name='api_recent_orders'),
+    path('api/orders/changes/', views.api_order_changes, name='api_order_changes'),
     path('api/orders/<uuid:order_id>/', views.api_order_detail, name='api_order_detail'),
      path('api/orders/<uuid:order_id>/receipt/', views.api_order_receipt, name='api_order_receipt'),
     # path('api/orders/<uuid:order_id>/status/', views.api_update_order_status, name='api_update_order_status'),
     path('api/orders/<uuid:order_id>/update-status/', views.api_update_order_status, name='update_order_status'),
+    path('api/orders/bulk-status/', views.api_bulk_update_order_status, name='api_bulk_update_order_status'),
+    path('api/orders/claim-next/', views.api_claim_next_order, name='api_claim_next_order'),
+    path('api/orders/<uuid:order_id>/claim/', views.api_order_claim, name='api_order_claim'),
     path('api/orders/create-manual/', views.api_create_manual_order, name='api_create_manual_order'),
 
     path('api/products/', views.api_products, name='api_products'),
@@ -56,9 +64,14 @@ urlpatterns = [
     
     # Reports API
     path('api/reports/today/', views.api_reports_today, name='api_reports_today'),
+    path('api/reports/top-sellers/', views.api_top_sellers, name='api_top_sellers'),
+    path('api/reports/prep-times/', views.api_prep_times, name='api_prep_times'),
+    path('api/reports/terminals/', views.api_terminal_throughput, name='api_terminal_throughput'),
     
     # Add this missing URL:
     path('staff/reports/', views.staff_reports, name='staff_reports'),
+    path('staff/performance/', views.performance_report, name='performance_report'),
+    path('staff/prep-times/', views.prep_times, name='prep_times'),
     
     # Customer urls
     path('customer/customer_dashboard/', views.customer_dashboard, name='customer_dashboard'),
@@ -77,6 +90,7 @@ urlpatterns = [
     path('shop/cart/increase/<uuid:item_id>/', views.increase_quantity, name='increase_quantity'),
     path('shop/cart/decrease/<uuid:item_id>/', views.decrease_quantity, name='decrease_quantity'),
     path('shop/cart/remove/<uuid:item_id>/', views.remove_from_cart, name='remove_from_cart'),
+    path('shop/cart/summary/', views.cart_summary, name='cart_summary'),
     path('order-confirmation/<uuid:order_id>/', views.order_confirmation, name='order_confirmation'),
     path('track-order/<uuid:order_id>/', views.track_order, name='track_order'),
 
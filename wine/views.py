@@ -1,35 +1,47 @@
 from decimal import Decimal
 import json
 import uuid
+from concurrent.futures import TimeoutError as FuturesTimeout
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Prefetch, Q
 from django.utils import timezone
 from django.contrib import messages
 from django.urls import reverse
-from datetime import timedelta
+from datetime import date, timedelta
 from django.views.decorators.http import require_POST
+from django.views.decorators.cache import never_cache
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
 from django.db import transaction
-from .models import Product, ComboOffer, Cart, CartItem, Order, OrderItem, Payment, CustomUser, Offer
+from .models import Product, ComboOffer, Cart, CartItem, Order, OrderItem, OrderStatusEvent, Payment, CustomUser, Offer
+from .inventory import reserve_stock, stock_requirements
+from .cart import get_cart, get_cart_count, get_kiosk_cart, get_or_create_cart, get_or_create_kiosk_cart, refresh_cart_count
+from .catalog import FRAGMENT_TIMEOUT, catalog_version
+from .customers import cursor_page, customer_directory, customer_summary, search_customers
+from .board import BOARD_SIZE, INACTIVE, order_rows
+from .changefeed import PAGE_SIZE, changes, current_cursor, order_json
+from .admin_sections import SECTIONS as ADMIN_SECTIONS, dashboard_summary, section_page
+from .admin_sections import invalidate as invalidate_admin_sections
+from .leaderboard import WINDOWS, DIMENSIONS, leaderboard_row, top_sellers
+from .liveboard import live_board
+from .preptimes import METRICS as PREP_METRICS, prep_time_report
+from .transitions import InvalidTransition, bulk_change_status, change_status
+from . import workqueue
+from .pagecache import cache_anonymous_page
+from .receipts import order_pdf, receipt_data
+from . import escpos, printspool
+from .recommendations import frequently_bought_together, recommendations_for
 import random
 import string
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 
 # Utility functions
-def get_or_create_cart(request):
-    if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
-    else:
-        if not request.session.session_key:
-            request.session.create()
-        session_key = request.session.session_key
-        cart, created = Cart.objects.get_or_create(session_key=session_key, user=None)
-    return cart
-
 def admin_required(function=None):
     actual_decorator = user_passes_test(
         lambda u: u.is_authenticated and u.user_type == 'admin',
@@ -50,6 +62,7 @@ def staff_required(function=None):
     return actual_decorator
 
 # Home Page
+@cache_anonymous_page()
 def home(request):
     return render(request, 'base.html')
 
@@ -148,39 +161,6 @@ def staff_logout_view(request):
 
 
 
-# Quick Status Update (AJAX)
-@login_required
-@user_passes_test(is_staff_user)
-@require_POST
-def quick_status_update(request):
-    try:
-        data = json.loads(request.body)
-        order_id = data.get('order_id')
-        new_status = data.get('status')
-        
-        from .models import Order
-        
-        order = Order.objects.get(id=order_id)
-        order.status = new_status
-        order.updated_by = request.user.username  # Track which staff updated
-        order.save()
-        
-        # Get updated counts
-        counts = {
-            'all': Order.objects.count(),
-            'pending': Order.objects.filter(status='pending').count(),
-            'preparing': Order.objects.filter(status='preparing').count(),
-            'ready': Order.objects.filter(status='ready').count(),
-        }
-        
-        return JsonResponse({
-            'success': True,
-            'status_display': order.get_status_display(),
-            'new_counts': counts
-        })
-    except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)})
-
 # Get Order Counts (AJAX)
 @login_required
 @user_passes_test(is_staff_user)
@@ -337,27 +317,19 @@ def customer_dashboard(request):
     completed_orders = orders.filter(status='completed').count()
     
     # Get customer's cart info
-    cart = get_or_create_cart(request)
-    cart_items = cart.items.all()
+    cart = get_cart(request)
+    cart_items = cart.items.all() if cart else CartItem.objects.none()
     cart_item_count = cart_items.count()
     cart_total = sum(item.get_total_price() for item in cart_items)
     
-    # Get recommended products (based on order history or random)
-    ordered_products = OrderItem.objects.filter(
-        order__user=request.user
-    ).values_list('product__category', flat=True).distinct()
-    
-    if ordered_products:
-        recommended_products = Product.objects.filter(
-            category__in=ordered_products,
-            is_active=True
-        ).exclude(stock=0).order_by('?')[:4]
-    else:
-        # Show random popular products for new customers
+    # "Customers also bought" from the precomputed co-purchase index
+    recommended_products = recommendations_for(request.user)
+    if not recommended_products:
+        # Empty index (fresh install): best stocked products instead
         recommended_products = Product.objects.filter(
             is_active=True,
             stock__gt=0
-        ).order_by('?')[:4]
+        ).order_by('-stock', 'name')[:4]
     
     context = {
         'recent_orders': recent_orders,
@@ -380,7 +352,7 @@ def customer_order_detail(request, order_id):
     try:
         # Get the order and verify it belongs to the current user
         order = get_object_or_404(
-            Order.objects.prefetch_related('items__product', 'items__combo'), 
+            Order.objects.prefetch_related('items__product', 'items__combo', 'status_events'),
             id=order_id, 
             user=request.user
         )
@@ -414,6 +386,7 @@ def customer_order_detail(request, order_id):
         context = {
             'order': order,
             'order_items': order_items,
+            'timeline': order.get_status_timeline(),
         }
         
         return render(request, 'wine/customer/order_detail.html', context)
@@ -479,53 +452,34 @@ def user_logout(request):
     else:
         return redirect('home')
 
-def get_dashboard_context():
-    total_products = Product.objects.count()
-    low_stock_products = Product.objects.filter(stock__lt=10).count()
-    total_orders = Order.objects.count()
-    pending_orders = Order.objects.filter(status='pending').count()
-
-    end_date = timezone.now()
-    start_date = end_date - timedelta(days=7)
-
-    recent_orders = Order.objects.filter(
-        created_at__gte=start_date,
-        status__in=['completed', 'ready']
-    )
-
-    total_revenue = recent_orders.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-
-    top_products = Product.objects.annotate(
-        total_sold=Sum('orderitem__quantity')
-    ).order_by('-total_sold')[:5]
-
-    products = Product.objects.all()
-    staff_members = CustomUser.objects.filter(user_type='staff')
-
-    offers = Offer.objects.all().order_by('-created_at')
-    
-    # Get out of stock products
-    out_of_stock_products = Product.objects.filter(stock=0).count()
-
-    return {
-        'total_products': total_products,
-        'low_stock_products': low_stock_products,
-        'out_of_stock_products': out_of_stock_products,
-        'total_orders': total_orders,
-        'pending_orders': pending_orders,
-        'total_revenue': total_revenue,
-        'top_products': top_products,
-        'products': products,
-        'staff_members': staff_members,
-        'offers': offers, 
-    }
+def get_dashboard_context(top_window='all'):
+    """Summary counters and top sellers; the section tables load separately"""
+    context = dashboard_summary()
+    context.update({
+        'top_products': top_sellers(top_window, 'product', limit=5),
+        'top_window': top_window,
+        'top_windows': WINDOWS,
+    })
+    return context
 
 @admin_required
 def admin_dashboard(request):
-    context = get_dashboard_context()
+    top_window = request.GET.get('top_window', 'all')
+    context = get_dashboard_context(top_window if top_window in WINDOWS else 'all')
     context['active_section'] = request.GET.get('section', 'dashboard')
     return render(request, 'wine/admin_dashboard/dashboard.html', context)
 
+@admin_required
+def admin_section(request, name):
+    """One page of an admin dashboard table, as rendered rows"""
+    if name not in ADMIN_SECTIONS:
+        return JsonResponse({'success': False, 'error': 'Unknown section'}, status=404)
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    return JsonResponse({'success': True, **section_page(name, page, request.GET.get('search', ''))})
+
 @admin_required
 def manage_products(request):
     if request.method == 'POST':
@@ -546,6 +500,7 @@ def manage_products(request):
 
         try:
             product.save()
+            invalidate_admin_sections('products')
             messages.success(request, 'Product saved successfully!')
             return redirect(f"{reverse('manage_products')}?section=products")
         except Exception as e:
@@ -562,6 +517,7 @@ def delete_product(request, product_id):
         try:
             product = Product.objects.get(id=product_id)
             product.delete()
+            invalidate_admin_sections('products')
             return JsonResponse({"success": True})
         except Product.DoesNotExist:
             return JsonResponse({"error": "Product not found"}, status=404)
@@ -569,8 +525,6 @@ def delete_product(request, product_id):
 
 @admin_required
 def manage_staff(request):
-    staff_members = CustomUser.objects.filter(user_type='staff')
-
     if request.method == 'POST':
         staff_id = request.POST.get('staff_id')
         username = request.POST.get('username')
@@ -607,6 +561,7 @@ def manage_staff(request):
                     staff.raw_password = password  
 
             staff.save()
+            invalidate_admin_sections('staff')
             messages.success(request, "Staff saved successfully!")
 
         except Exception as e:
@@ -614,10 +569,8 @@ def manage_staff(request):
         
         return redirect(reverse('admin_dashboard') + '?section=staff')
 
-    context = {
-        'staff_members': staff_members,
-        'active_section': 'staff'
-    }
+    context = get_dashboard_context()
+    context['active_section'] = 'staff'
     return render(request, 'wine/admin_dashboard/dashboard.html', context)
 
 @admin_required
@@ -660,17 +613,17 @@ def sales_report(request):
 @staff_required
 def staff_dashboard(request):
     """Main staff dashboard view"""
-    # Get counts
-    all_orders = Order.objects.all()
-    pending_count = all_orders.filter(status='pending').count()
-    preparing_count = all_orders.filter(status='preparing').count()
-    ready_count = all_orders.filter(status='ready').count()
-    completed_count = all_orders.filter(status='completed').count()
-    cancelled_count = all_orders.filter(status='cancelled').count()
-    all_count = all_orders.count()
-    
-    # Get recent orders (last 20)
-    recent_orders = Order.objects.all().order_by('-created_at')[:20]
+    # Get counts and recent orders (last 20) from the live board
+    board = live_board()
+    counts = board.counts()
+    pending_count = counts.get('pending', 0)
+    preparing_count = counts.get('preparing', 0)
+    ready_count = counts.get('ready', 0)
+    completed_count = counts.get('completed', 0)
+    cancelled_count = counts.get('cancelled', 0)
+    all_count = sum(counts.values())
+    
+    recent_orders = board.recent(20)
     
     # Get products count
     products_count = Product.objects.filter(is_active=True).count()
@@ -698,6 +651,7 @@ def staff_dashboard(request):
         'customers_count': customers_count,
         'today_orders': today_orders,
         'total_revenue': total_revenue,
+        'feed_cursor': current_cursor(),
     }
     
     return render(request, 'wine/staff_dashboard/dashboard.html', context)
@@ -707,15 +661,15 @@ def staff_dashboard(request):
 def api_dashboard_stats(request):
     """API endpoint for dashboard statistics"""
     try:
-        all_orders = Order.objects.all()
+        counts = live_board().counts()
         
         data = {
-            'total_orders': all_orders.count(),
-            'pending': all_orders.filter(status='pending').count(),
-            'preparing': all_orders.filter(status='preparing').count(),
-            'ready': all_orders.filter(status='ready').count(),
-            'completed': all_orders.filter(status='completed').count(),
-            'cancelled': all_orders.filter(status='cancelled').count(),
+            'total_orders': sum(counts.values()),
+            'pending': counts.get('pending', 0),
+            'preparing': counts.get('preparing', 0),
+            'ready': counts.get('ready', 0),
+            'completed': counts.get('completed', 0),
+            'cancelled': counts.get('cancelled', 0),
         }
         
         return JsonResponse(data)
@@ -973,7 +927,9 @@ def api_order_receipt(request, order_id):
             'success': True,
             'receipt_html': receipt_html,
             'order_number': receipt_data['order_number'],
-            'total': receipt_data['total']
+            'total': receipt_data['total'],
+            'receipt_pdf_url': reverse('order_receipt_pdf', args=[order.id]),
+            'invoice_pdf_url': reverse('order_invoice_pdf', args=[order.id]),
         })
         
     except Exception as e:
@@ -995,23 +951,10 @@ def api_update_order_status(request, order_id):
         order = Order.objects.get(id=order_id)
         new_status = request.POST.get('status') or json.loads(request.body).get('status')
         
-        # Validate status transition
-        valid_transitions = {
-            'pending': ['preparing', 'cancelled'],
-            'preparing': ['ready', 'pending', 'cancelled'],
-            'ready': ['completed', 'preparing', 'cancelled'],
-            'completed': ['ready'],
-            'cancelled': ['pending']
-        }
-        
-        if new_status not in valid_transitions.get(order.status, []):
-            return JsonResponse({
-                'success': False,
-                'error': f'Invalid status transition from {order.status} to {new_status}'
-            }, status=400)
-        
-        order.status = new_status
-        order.save()
+        try:
+            change_status(order, new_status, request.user)
+        except InvalidTransition as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
         
         # Update TV display if needed
         # broadcast_order_update(order)
@@ -1214,6 +1157,7 @@ def api_create_manual_order(request):
             order.save()
         
         # Create order items
+        stock_needed = {}
         for item in items:
             product_id = item.get('product_id')
             product_name = item.get('product_name', 'Product')
@@ -1231,12 +1175,7 @@ def api_create_manual_order(request):
                     price=price
                 )
                 
-                # Update stock
-                if product.stock >= quantity:
-                    product.stock = product.stock - quantity
-                    product.save()
-                else:
-                    raise Exception(f"Insufficient stock for {product.name}")
+                stock_needed[product.id] = stock_needed.get(product.id, 0) + quantity
                 
             except Product.DoesNotExist:
                 # Create order item without product reference
@@ -1246,6 +1185,9 @@ def api_create_manual_order(request):
                     price=price
                 )
         
+        # Update stock (locked, conditional)
+        reserve_stock(stock_needed)
+        
         # Create payment record
         Payment.objects.create(
             order=order,
@@ -1264,6 +1206,8 @@ def api_create_manual_order(request):
         })
         
     except Exception as e:
+        # Undo the partially created order (the view runs in one transaction)
+        transaction.set_rollback(True)
         print(f"Create Manual Order Error: {str(e)}")
         return JsonResponse({
             'success': False,
@@ -1274,63 +1218,48 @@ def api_create_manual_order(request):
 def api_recent_orders(request):
     """API endpoint for recent orders"""
     try:
-        recent_orders = Order.objects.all().order_by('-created_at')[:10]
-        
-        orders_data = []
-        for order in recent_orders:
-            customer_name = "Guest Customer"
-            if order.user:
-                customer_name = order.user.get_full_name() or order.user.username
-            elif order.phone_number:
-                customer_name = f"Customer {order.phone_number[-4:]}"
-            
-            orders_data.append({
-                'id': str(order.id),
-                'order_number': f"ORD-{str(order.id)[:8].upper()}",
-                'customer_name': customer_name,
-                'phone_number': order.phone_number or "N/A",
-                'token_number': order.token_number or "",
-                'order_type': order.order_type,
-                'status': order.status,
-                'status_display': order.get_status_display(),
-                'total_amount': float(order.total_amount),
-                'created_at': order.created_at.isoformat(),
-                'items_count': order.items.count()
-            })
+        orders_data = [order_json(order) for order in live_board().recent(10)]
         
         return JsonResponse({'success': True, 'orders': orders_data})
     except Exception as e:
         print(f"Recent Orders Error: {str(e)}")
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+@staff_required
+def api_order_changes(request):
+    """Orders changed since the ``since`` cursor (see changefeed.py), plus status counts if any did"""
+    try:
+        limit = min(max(int(request.GET.get('limit', PAGE_SIZE)), 1), PAGE_SIZE)
+        feed = changes(
+            request.GET.get('since') or None, request.GET.get('status', 'all'), request.GET.get('type', 'all'), limit,
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    if feed['orders'] or feed['removed'] or feed['reset']:
+        feed['counts'] = live_board().counts()
+    return JsonResponse({'success': True, **feed})
+
 # API endpoint for customers
 @staff_required
 def api_customers(request):
-    """API endpoint for customers"""
+    """API endpoint for the customer directory (cursor paginated, searchable)"""
     try:
-        customers = CustomUser.objects.filter(user_type='customer').order_by('-date_joined')
-        
-        customers_data = []
-        for customer in customers:
-            # Get order stats for this customer
-            orders = Order.objects.filter(user=customer)
-            total_orders = orders.count()
-            total_spent = orders.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-            
-            customers_data.append({
-                'id': str(customer.id),
-                'name': customer.get_full_name() or customer.username,
-                'email': customer.email,
-                'phone': customer.phone or '',
-                'address': customer.address or '',
-                'total_orders': total_orders,
-                'total_spent': float(total_spent),
-                'date_joined': customer.date_joined.strftime('%Y-%m-%d')
-            })
-        
-        return JsonResponse(customers_data, safe=False)
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 200)
+    except ValueError:
+        limit = 50
+    try:
+        customers = search_customers(customer_directory(), request.GET.get('search', ''))
+        page, next_cursor = cursor_page(customers, request.GET.get('cursor'), limit)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+    return JsonResponse({
+        'success': True,
+        'customers': [customer_summary(customer) for customer in page],
+        'next_cursor': next_cursor,
+    })
 
 # API endpoint for today's reports
 @staff_required
@@ -1376,6 +1305,19 @@ from django.contrib.admin.views.decorators import staff_member_required
 
 @staff_required
 def manage_orders(request):
+    if request.method == 'POST':
+        order_id = request.POST.get('order_id')
+        status = request.POST.get('status')
+        
+        if order_id and status:
+            order = get_object_or_404(Order, id=order_id)
+            try:
+                change_status(order, status, request.user)
+                messages.success(request, f'Order #{order.id} status updated to {status}')
+            except InvalidTransition as e:
+                messages.error(request, str(e))
+            return redirect('manage_orders')
+    
     # Get filter parameters
     status_filter = request.GET.get('status', 'all')
     order_type_filter = request.GET.get('type', 'all')
@@ -1444,18 +1386,10 @@ def manage_orders(request):
     except EmptyPage:
         page_obj = paginator.get_page(paginator.num_pages)
     
-    if request.method == 'POST':
-        order_id = request.POST.get('order_id')
-        status = request.POST.get('status')
-        
-        if order_id and status:
-            order = get_object_or_404(Order, id=order_id)
-            order.status = status
-            order.save()
-            
-            messages.success(request, f'Order #{order.id} status updated to {status}')
-            return redirect('manage_orders')
-    
+    # Terminal preparing each order, for the work queue badges
+    for order in page_obj.object_list:
+        order.claim_holder = workqueue.claim_holder(order)
+
     # Get choices
     status_choices = [
         ('pending', 'Pending'),
@@ -1486,6 +1420,8 @@ def manage_orders(request):
         'search_query': search_query,
         'status_choices': status_choices,
         'order_type_choices': order_type_choices,
+        'feed_cursor': current_cursor(),
+        'claim_renew_ms': settings.ORDER_CLAIM_LEASE_SECONDS * 1000 // 3,
     }
     
     print(f"Total filtered orders: {filtered_count}")
@@ -1498,17 +1434,24 @@ def manage_orders(request):
 @staff_required
 def order_detail(request, order_id):
     """View for detailed order information"""
-    order = get_object_or_404(Order.objects.prefetch_related('items__product', 'items__combo'), id=order_id)
+    order = get_object_or_404(
+        Order.objects.prefetch_related(
+            'items__product', 'items__combo',
+            Prefetch('status_events', queryset=OrderStatusEvent.objects.select_related('changed_by')),
+        ),
+        id=order_id,
+    )
     
     if request.method == 'POST':
         status = request.POST.get('status')
         notes = request.POST.get('notes', '')
         
         if status and status != order.status:
-            order.status = status
-            order.save()
-            
-            messages.success(request, f'Order status updated to {status}')
+            try:
+                change_status(order, status, request.user, notes)
+                messages.success(request, f'Order status updated to {status}')
+            except InvalidTransition as e:
+                messages.error(request, str(e))
             return redirect('order_detail', order_id=order.id)
     
     # Get item names for each order item
@@ -1554,33 +1497,31 @@ def view_products(request):
 
 @staff_required
 def manage_customers(request):
-    # Get customers with orders
-    customers = CustomUser.objects.filter(user_type='customer').order_by('-date_joined')
-    
-    # Get search filter
     search_query = request.GET.get('search', '')
-    if search_query:
-        customers = customers.filter(
-            Q(username__icontains=search_query) |
-            Q(full_name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(phone__icontains=search_query)
-        )
-    
+    customers = search_customers(customer_directory(), search_query)
+
+    paginator = Paginator(customers, 25)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
     context = {
-        'customers': customers,
+        'customers': page_obj,
+        'page_obj': page_obj,
         'search_query': search_query,
     }
     return render(request, 'wine/staff_dashboard/manage_customers.html', context)
 
 @staff_required
 def customer_orders(request, customer_id):
-    customer = get_object_or_404(CustomUser, id=customer_id, user_type='customer')
-    orders = Order.objects.filter(user=customer).order_by('-created_at')
-    
+    customer = get_object_or_404(customer_directory(), id=customer_id)
+    orders = Order.objects.filter(user=customer).select_related('payment').order_by('-created_at')
+
+    paginator = Paginator(orders, 20)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
     context = {
         'customer': customer,
-        'orders': orders,
+        'orders': page_obj,
+        'page_obj': page_obj,
     }
     return render(request, 'wine/staff_dashboard/customer_orders.html', context)
 
@@ -1595,8 +1536,10 @@ def quick_status_update(request):
             status = data.get('status')
             
             order = get_object_or_404(Order, id=order_id)
-            order.status = status
-            order.save()
+            try:
+                change_status(order, status, request.user)
+            except InvalidTransition as e:
+                return JsonResponse({'success': False, 'error': str(e)}, status=400)
             
             return JsonResponse({
                 'success': True,
@@ -1613,6 +1556,136 @@ def quick_status_update(request):
     
     return JsonResponse({'success': False, 'error': 'Invalid request'})
 
+@staff_required
+@require_POST
+def api_bulk_update_order_status(request):
+    """
+    Move many orders at once, e.g. ``{"status": "ready", "from": ["preparing"]}``
+    or ``{"status": "completed", "order_ids": [...]}``. ``from`` defaults to
+    every status allowed into ``status``. Returns the orders moved per source
+    status and the new count per status.
+    """
+    try:
+        data = json.loads(request.body)
+        new_status = data.get('status')
+        from_statuses, order_ids = data.get('from'), data.get('order_ids')
+        if new_status not in dict(Order.ORDER_STATUS):
+            raise ValueError(f'unknown status {new_status!r}')
+        if isinstance(from_statuses, str):
+            from_statuses = [from_statuses]
+        if not isinstance(from_statuses or [], list) or not isinstance(order_ids or [], list):
+            raise ValueError('from and order_ids must be lists')
+        moved = bulk_change_status(new_status, from_statuses, order_ids, request.user)
+    except InvalidTransition as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except (ValueError, AttributeError, ValidationError) as e:
+        return JsonResponse({'success': False, 'error': f'Invalid request: {e}'}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'status': new_status,
+        'updated': moved,
+        'total_updated': sum(moved.values()),
+        'counts': live_board().counts(),
+    })
+
+def _terminal(request, data):
+    """Work queue terminal name: sent by the page, else the staff username"""
+    return str(data.get('terminal') or request.user.username)[:40]
+
+@staff_required
+@require_POST
+def api_claim_next_order(request):
+    """Claim the oldest pickup order waiting to be prepared for this terminal (see workqueue.py)"""
+    try:
+        data = json.loads(request.body or '{}')
+        terminal = _terminal(request, data)
+    except (ValueError, AttributeError) as e:
+        return JsonResponse({'success': False, 'error': f'Invalid request: {e}'}, status=400)
+
+    order = workqueue.claim_next(terminal, request.user)
+    if order is None:
+        return JsonResponse({'success': True, 'order': None, 'message': 'No orders waiting'})
+    return JsonResponse({
+        'success': True,
+        'terminal': terminal,
+        'order': order_json(order_rows(Order.objects.filter(pk=order.pk))[0]),
+        'claim_expires_at': order.claim_expires_at.isoformat(),
+    })
+
+@staff_required
+@require_POST
+def api_order_claim(request, order_id):
+    """``{"action": "renew" | "release" | "finish"}`` on this terminal's claim"""
+    try:
+        data = json.loads(request.body or '{}')
+        terminal, action = _terminal(request, data), data.get('action')
+        if action == 'renew':
+            expires = workqueue.renew(order_id, terminal)
+            return JsonResponse({'success': True, 'claim_expires_at': expires.isoformat()})
+        if action == 'release':
+            workqueue.release(order_id, terminal)
+            return JsonResponse({'success': True, 'message': 'Order returned to the queue'})
+        if action == 'finish':
+            order = workqueue.finish(order_id, terminal, request.user)
+            return JsonResponse({
+                'success': True,
+                'status': order.status,
+                'status_display': order.get_status_display(),
+                'message': f'Order #{order.token_number or str(order.id)[:8]} is ready',
+            })
+    except workqueue.ClaimLost as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=409)
+    except InvalidTransition as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except (ValueError, AttributeError) as e:
+        return JsonResponse({'success': False, 'error': f'Invalid request: {e}'}, status=400)
+    return JsonResponse({'success': False, 'error': 'action must be renew, release or finish'}, status=400)
+
+@staff_required
+def order_document_pdf(request, order_id, kind):
+    """Receipt or GST invoice PDF for an order, from the on-disk cache."""
+    order = get_object_or_404(
+        Order.objects.select_related('user', 'payment').prefetch_related('items__product', 'items__combo'), id=order_id
+    )
+    try:
+        path = order_pdf(order, kind)
+    except FuturesTimeout:
+        return JsonResponse({'success': False, 'error': 'Receipt is taking too long, try again'}, status=503)
+    return FileResponse(
+        open(path, 'rb'), content_type='application/pdf',
+        as_attachment=bool(request.GET.get('download')), filename=f'{kind}-{str(order.id)[:8].upper()}.pdf',
+    )
+
+@staff_required
+def order_receipt_escpos(request, order_id):
+    """
+    ESC/POS receipt for thermal printers: GET returns the bytes, POST queues
+    them on the print spool for ``printer`` (default: the first configured).
+    """
+    order = get_object_or_404(
+        Order.objects.select_related('user', 'payment').prefetch_related('items__product', 'items__combo'), id=order_id
+    )
+    tracking_url = None
+    if order.token_number and request.GET.get('qr', '1') != '0':
+        tracking_url = request.build_absolute_uri(reverse('order_tracking_detail', args=[order.token_number]))
+    payload = escpos.render_receipt(receipt_data(order), tracking_url=tracking_url)
+
+    if request.method != 'POST':
+        return HttpResponse(payload, content_type='application/octet-stream')
+    printer = request.POST.get('printer') or printspool.default_printer()
+    try:
+        waiting = printspool.submit(printer, payload)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({
+        'success': True,
+        'message': f'Receipt sent to {printer}',
+        'printer': printer,
+        'queued': waiting,
+        'bytes': len(payload),
+    })
+
 @staff_required
 def print_receipt(request, order_id):
     """View for printing order receipt"""
@@ -1627,6 +1700,7 @@ def print_receipt(request, order_id):
 from django.db.models import Q, Sum
 from django.utils import timezone
 
+@cache_anonymous_page()
 def shop_home(request):
     # Get all active products
     products = Product.objects.filter(is_active=True)
@@ -1669,10 +1743,13 @@ def shop_home(request):
             Q(description__icontains=search_query)
         )
 
-    # Get cart using the utility function
-    cart = get_or_create_cart(request)
-    cart_items = cart.items.all()
-    cart_count = cart_items.count()  # Use count() instead of Sum
+    # Anonymous pages are cached for everyone: their cart badge and
+    # "bought together" strip are filled in by cart_summary after load
+    cart = get_cart(request) if request.user.is_authenticated else None
+    cart_count = get_cart_count(request) if cart else 0
+    bought_together = frequently_bought_together(
+        cart.items.filter(product__isnull=False).values_list('product_id', flat=True)
+    ) if cart else []
     
     # Show dashboard link if customer is logged in
     if request.user.is_authenticated and request.user.user_type == 'customer':
@@ -1688,10 +1765,14 @@ def shop_home(request):
         'search_query': search_query,
         'offer_type': offer_type,
         'cart_count': cart_count,
+        'bought_together': bought_together,
+        'catalog_version': catalog_version(),
+        'fragment_timeout': FRAGMENT_TIMEOUT,
         'user_type': request.user.user_type if request.user.is_authenticated else None,
     }
     return render(request, 'wine/shop/home.html', context)
 
+@cache_anonymous_page()
 def combo_detail(request, combo_id):
     combo = get_object_or_404(ComboOffer, id=combo_id, is_active=True)
     
@@ -1702,8 +1783,8 @@ def combo_detail(request, combo_id):
 
 # Cart Views
 def view_cart(request):
-    cart = get_or_create_cart(request)
-    cart_items = cart.items.all()
+    cart = get_cart(request)
+    cart_items = cart.items.all() if cart else CartItem.objects.none()
     
     # Calculate totals using Decimal
     subtotal = sum(item.get_total_price() for item in cart_items)
@@ -1718,9 +1799,34 @@ def view_cart(request):
         'tax': tax,
         'service_fee': service_fee,
         'total': total,
+        'bought_together': frequently_bought_together(item.product_id for item in cart_items if item.product_id),
     }
     return render(request, 'wine/shop/cart.html', context)
 
+@never_cache
+def cart_summary(request):
+    """
+    The per-visitor bits of the cached shop pages: cart badge count, a CSRF
+    token for their forms and, with ``?bought_together=1``, the rendered
+    "bought together" strip.
+    """
+    data = {
+        'success': True,
+        'cart_count': get_cart_count(request),
+        'csrf_token': get_token(request),
+    }
+    if request.GET.get('bought_together'):
+        cart = get_cart(request)
+        products = frequently_bought_together(
+            cart.items.filter(product__isnull=False).values_list('product_id', flat=True)
+        ) if cart else []
+        data['bought_together'] = render_to_string(
+            'wine/shop/_bought_together.html',
+            {'bought_together': products, 'form_class': 'add-to-cart-form'},
+            request=request,
+        )
+    return JsonResponse(data)
+
 @require_POST
 def add_to_cart(request, product_id):
     try:
@@ -1762,6 +1868,8 @@ def add_to_cart(request, product_id):
         cart_item.quantity += 1
         cart_item.save()
     
+    refresh_cart_count(request)
+    
     # Get updated cart count
     cart_count = cart.items.count()
     
@@ -1782,19 +1890,20 @@ def add_to_cart(request, product_id):
 # ADD THE MISSING DECREASE_QUANTITY FUNCTION
 @require_POST
 def decrease_quantity(request, item_id):
-    cart_item = get_object_or_404(CartItem, id=item_id, cart=get_or_create_cart(request))
+    cart_item = get_object_or_404(CartItem, id=item_id, cart=get_cart(request))
     if cart_item.quantity > 1:
         cart_item.quantity -= 1
         cart_item.save()
     else:
         cart_item.delete()
         messages.success(request, 'Item removed from cart')
+    refresh_cart_count(request)
     return redirect('view_cart')
 
 # ADD THE MISSING INCREASE_QUANTITY FUNCTION
 @require_POST
 def increase_quantity(request, item_id):
-    cart_item = get_object_or_404(CartItem, id=item_id, cart=get_or_create_cart(request))
+    cart_item = get_object_or_404(CartItem, id=item_id, cart=get_cart(request))
     
     if cart_item.product:
         # Check stock before increasing
@@ -1804,19 +1913,21 @@ def increase_quantity(request, item_id):
     
     cart_item.quantity += 1
     cart_item.save()
+    refresh_cart_count(request)
     return redirect('view_cart')
 
 @require_POST
 def remove_from_cart(request, item_id):
-    cart_item = get_object_or_404(CartItem, id=item_id, cart=get_or_create_cart(request))
+    cart_item = get_object_or_404(CartItem, id=item_id, cart=get_cart(request))
     cart_item.delete()
+    refresh_cart_count(request)
     messages.success(request, 'Item removed from cart')
     return redirect('view_cart')
 
 # Checkout Views
 def checkout(request):
-    cart = get_or_create_cart(request)
-    cart_items = cart.items.all()
+    cart = get_cart(request)
+    cart_items = cart.items.all() if cart else CartItem.objects.none()
     
     if not cart_items.exists():
         return redirect('view_cart')
@@ -1862,9 +1973,9 @@ def process_order(request):
         order_type = data.get('order_type')
         delivery_address = data.get('delivery_address')
 
-        cart = get_or_create_cart(request)
+        cart = get_cart(request)
 
-        if not cart.items.exists():
+        if cart is None or not cart.items.exists():
             return JsonResponse({'success': False, 'message': 'Cart is empty'})
 
         total_amount = sum(item.get_total_price() for item in cart.items.all())
@@ -1896,8 +2007,13 @@ def process_order(request):
 
             order.save()
 
-            # Save order items + reduce stock
-            for item in cart.items.all():
+            cart_items = cart.items.select_related('product', 'combo').prefetch_related('combo__combo_items__product')
+
+            # Reduce stock (locked, conditional) before writing items
+            reserve_stock(stock_requirements(cart_items))
+
+            # Save order items
+            for item in cart_items:
 
                 if item.product:
                     OrderItem.objects.create(
@@ -1906,8 +2022,6 @@ def process_order(request):
                         quantity=item.quantity,
                         price=item.product.price
                     )
-                    item.product.stock -= item.quantity
-                    item.product.save()
 
                 elif item.combo:
                     OrderItem.objects.create(
@@ -1916,9 +2030,6 @@ def process_order(request):
                         quantity=item.quantity,
                         price=item.combo.get_discounted_price()
                     )
-                    for c in item.combo.combo_items.all():
-                        c.product.stock -= item.quantity * c.quantity
-                        c.product.save()
 
             # Payment record
             Payment.objects.create(
@@ -1930,6 +2041,8 @@ def process_order(request):
 
             cart.items.all().delete()
 
+        refresh_cart_count(request, 0)
+
         return JsonResponse({
             'success': True,
             'order_id': str(order.id)
@@ -1987,8 +2100,6 @@ def track_order(request, order_id):
 # Offer Management
 @admin_required
 def manage_offers(request):
-    offers = Offer.objects.all().order_by('-created_at')
-    
     if request.method == 'POST':
         offer_id = request.POST.get('offer_id')
         if offer_id:
@@ -2016,6 +2127,7 @@ def manage_offers(request):
             
             offer.products.set(Product.objects.filter(id__in=product_ids))
             offer.combo_offers.set(ComboOffer.objects.filter(id__in=combo_ids))
+            invalidate_admin_sections('offers')
             
             messages.success(request, 'Offer saved successfully!')
             return redirect(f"{reverse('manage_offers')}?section=offers")
@@ -2023,7 +2135,6 @@ def manage_offers(request):
             messages.error(request, f'Error saving offer: {str(e)}')
 
     context = get_dashboard_context()
-    context['offers'] = offers
     context['active_section'] = 'offers'
     return render(request, 'wine/admin_dashboard/dashboard.html', context)
 
@@ -2034,6 +2145,7 @@ def delete_offer(request, offer_id):
         try:
             offer = Offer.objects.get(id=offer_id)
             offer.delete()
+            invalidate_admin_sections('offers')
             return JsonResponse({"success": True})
         except Offer.DoesNotExist:
             return JsonResponse({"error": "Offer not found"}, status=404)
@@ -2060,14 +2172,7 @@ def add_offer_to_cart(request, offer_id):
             return redirect('shop_home')
         
         # Get or create cart (for both authenticated and anonymous users)
-        if request.user.is_authenticated:
-            cart, created = Cart.objects.get_or_create(user=request.user)
-        else:
-            # For anonymous users, use session-based cart
-            if not request.session.session_key:
-                request.session.create()
-            session_key = request.session.session_key
-            cart, created = Cart.objects.get_or_create(session_key=session_key, user=None)
+        cart = get_or_create_cart(request)
         
         # Check if this offer is already in cart
         existing_offer_item = CartItem.objects.filter(cart=cart, offer=offer).first()
@@ -2089,6 +2194,7 @@ def add_offer_to_cart(request, offer_id):
             )
             messages.success(request, f'"{offer.title}" added to cart!')
         
+        refresh_cart_count(request)
         return redirect('shop_home')
         
     except Exception as e:
@@ -2143,21 +2249,13 @@ def kiosk_view(request):
         end_date__gte=timezone.now()
     ).prefetch_related('products', 'combo_offers')
     
-    # Get cart for kiosk (anonymous session)
-    if not request.session.session_key:
-        request.session.create()
-    session_key = request.session.session_key
-    
-    # Create or get kiosk cart
-    cart, created = Cart.objects.get_or_create(
-        session_key=session_key + "_kiosk",
-        user=None
-    )
+    # Get kiosk cart (created on the first kiosk_add_to_cart)
+    cart = get_kiosk_cart(request)
     
     # Calculate cart totals
-    cart_items = cart.items.all()
+    cart_items = cart.items.all() if cart else CartItem.objects.none()
     cart_total = sum(item.get_total_price() for item in cart_items)
-    cart_count = cart_items.count()
+    cart_count = cart_items.count() if cart else 0
     
     context = {
         'products': products,
@@ -2165,6 +2263,8 @@ def kiosk_view(request):
         'product_categories': Product.CATEGORY_CHOICES,
         'cart_total': cart_total,
         'cart_count': cart_count,
+        'catalog_version': catalog_version(),
+        'fragment_timeout': FRAGMENT_TIMEOUT,
     }
     
     return render(request, 'wine/shop/shopscreen.html', context)
@@ -2183,11 +2283,10 @@ def kiosk_process_order(request):
             data = json.loads(request.body)
             
             # Get cart items from kiosk session
-            session_key = request.session.session_key + "_kiosk"
-            cart = get_object_or_404(Cart, session_key=session_key, user=None)
-            cart_items = cart.items.all()
+            cart = get_kiosk_cart(request)
+            cart_items = cart.items.all() if cart else CartItem.objects.none()
             
-            if not cart_items.exists():
+            if cart is None or not cart_items.exists():
                 return JsonResponse({
                     'success': False, 
                     'message': 'Cart is empty'
@@ -2224,7 +2323,10 @@ def kiosk_process_order(request):
                     status='preparing',
                 )
                 
-                # Add items to order and update stock
+                # Update stock (locked, conditional)
+                reserve_stock(stock_requirements(cart_items))
+
+                # Add items to order
                 for item in cart_items:
                     if item.product:
                         OrderItem.objects.create(
@@ -2233,9 +2335,6 @@ def kiosk_process_order(request):
                             quantity=item.quantity,
                             price=item.product.price
                         )
-                        # Update stock
-                        item.product.stock -= item.quantity
-                        item.product.save()
                     
                     elif item.combo:
                         OrderItem.objects.create(
@@ -2244,11 +2343,6 @@ def kiosk_process_order(request):
                             quantity=item.quantity,
                             price=item.combo.get_discounted_price()
                         )
-                        # Update stock for combo items
-                        for combo_item in item.combo.combo_items.all():
-                            required_stock = item.quantity * combo_item.quantity
-                            combo_item.product.stock -= required_stock
-                            combo_item.product.save()
                     
                     elif item.offer:
                         # Handle offers
@@ -2324,12 +2418,8 @@ def kiosk_add_to_cart(request):
 def kiosk_get_cart(request):
     """Get kiosk cart data"""
     try:
-        # Get kiosk cart (session + "_kiosk")
-        if not request.session.session_key:
-            request.session.create()
-        
-        session_key = request.session.session_key + "_kiosk"
-        cart = Cart.objects.filter(session_key=session_key, user=None).first()
+        # Get kiosk cart (session + "_kiosk"); nothing is created for a read
+        cart = get_kiosk_cart(request)
         
         if not cart:
             return JsonResponse({
@@ -2378,14 +2468,7 @@ def add_to_cart_kiosk(request, product_id):
             })
         
         # Get kiosk cart
-        if not request.session.session_key:
-            request.session.create()
-        
-        session_key = request.session.session_key + "_kiosk"
-        cart, created = Cart.objects.get_or_create(
-            session_key=session_key,
-            user=None
-        )
+        cart = get_or_create_kiosk_cart(request)
         
         # Add to cart
         cart_item, created = CartItem.objects.get_or_create(
@@ -2438,14 +2521,7 @@ def add_offer_to_cart_kiosk(request, offer_id):
             })
         
         # Get kiosk cart
-        if not request.session.session_key:
-            request.session.create()
-        
-        session_key = request.session.session_key + "_kiosk"
-        cart, created = Cart.objects.get_or_create(
-            session_key=session_key,
-            user=None
-        )
+        cart = get_or_create_kiosk_cart(request)
         
         # Add to cart
         cart_item, created = CartItem.objects.get_or_create(
@@ -2480,6 +2556,7 @@ from django.views.decorators.csrf import csrf_exempt
 from wine.models import Order
 
 @csrf_exempt  # For simple public access
+@cache_anonymous_page()
 def order_tracking(request):
     """Public order tracking page for customers"""
     order = None
@@ -2534,30 +2611,19 @@ from django.http import HttpResponse
 @cache_control(no_cache=True, must_revalidate=True, no_store=True)
 def tv_display(request):
     """TV display screen - show all active orders"""
-    
-    # Get ALL active orders (not completed/cancelled)
-    active_orders = Order.objects.exclude(
-        status__in=['completed', 'cancelled']
-    ).prefetch_related('items__product', 'items__combo')
-    
-    # Sort: ready -> preparing -> pending, then by creation time
-    status_priority = {'ready': 1, 'preparing': 2, 'pending': 3}
-    ordered_orders = sorted(
-        list(active_orders),
-        key=lambda x: (status_priority.get(x.status, 99), x.created_at)
-    )
-    
-    # Limit to 20 orders maximum for performance
-    ordered_orders = ordered_orders[:20]
-    
-    # Count by status
-    pending_count = sum(1 for o in ordered_orders if o.status == 'pending')
-    preparing_count = sum(1 for o in ordered_orders if o.status == 'preparing')
-    ready_count = sum(1 for o in ordered_orders if o.status == 'ready')
-    total_active = len(ordered_orders)
+    board = live_board()
+    ordered_orders = board.top(BOARD_SIZE)
+
+    # Count by status over every active order, not just the ones shown
+    counts = board.counts()
+    pending_count = counts.get('pending', 0)
+    preparing_count = counts.get('preparing', 0)
+    ready_count = counts.get('ready', 0)
+    total_active = sum(n for status, n in counts.items() if status not in INACTIVE)
     
     context = {
         'orders': ordered_orders,
+        'board_size': BOARD_SIZE,
         'single_mode': False,
         'now': timezone.now(),
         'total_active': total_active,
@@ -2632,6 +2698,95 @@ def staff_reports(request):
     return render(request, 'staff/reports.html', context)
 
 
+@staff_required
+def performance_report(request):
+    """Slowest endpoints served by this process over the last N minutes"""
+    from . import perf
+
+    try:
+        minutes = max(int(request.GET.get('minutes', 15)), 1)
+    except ValueError:
+        minutes = 15
+
+    context = {
+        'minutes': minutes,
+        'enabled': perf.enabled(),
+        'endpoints': perf.slowest_endpoints(minutes),
+    }
+    return render(request, 'wine/staff_dashboard/performance.html', context)
+
+
+def _report_day(request):
+    """``?date=YYYY-MM-DD``, default today; ValueError if malformed"""
+    value = request.GET.get('date')
+    return date.fromisoformat(value) if value else timezone.localdate()
+
+
+@staff_required
+def prep_times(request):
+    """Prep-time percentiles per hour for one day"""
+    try:
+        day = _report_day(request)
+    except ValueError:
+        day = timezone.localdate()
+    report = prep_time_report(day)
+    context = {
+        'day': report['day'],
+        'metrics': PREP_METRICS.values(),
+        # Per hour: [(orders, p50, p90, p99 in minutes), ...] in PREP_METRICS order
+        'rows': [
+            (row['hour'], [
+                (row[metric]['count'], *(
+                    row[metric][q] / 60 if row[metric][q] is not None else None for q in ('p50', 'p90', 'p99')
+                ))
+                for metric in PREP_METRICS
+            ])
+            for row in report['hours']
+        ],
+    }
+    return render(request, 'wine/staff_dashboard/prep_times.html', context)
+
+
+@staff_required
+def api_terminal_throughput(request):
+    """Work queue claims, completions and orders per hour by terminal for ?date"""
+    try:
+        day = _report_day(request)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'date must be YYYY-MM-DD'}, status=400)
+    return JsonResponse({'success': True, 'day': day.isoformat(), 'terminals': workqueue.terminal_throughput(day)})
+
+
+@staff_required
+def api_prep_times(request):
+    """p50/p90/p99 seconds of placed->ready and ready->completed, per hour of ?date="""
+    try:
+        day = _report_day(request)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'date must be YYYY-MM-DD'}, status=400)
+    return JsonResponse({'success': True, **prep_time_report(day)})
+
+
+@staff_required
+def api_top_sellers(request):
+    """Leaderboard for ?window=today|7d|30d|all and ?by=product|combo|category"""
+    window = request.GET.get('window', '7d')
+    by = request.GET.get('by', 'product')
+    if window not in WINDOWS or by not in DIMENSIONS:
+        return JsonResponse({'success': False, 'error': 'Unknown window or grouping'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+
+    return JsonResponse({
+        'success': True,
+        'window': window,
+        'by': by,
+        'items': [leaderboard_row(item) for item in top_sellers(window, by, limit)],
+    })
+
+
 # @staff_required
 # @cache_control(no_cache=True, must_revalidate=True, no_store=True)
 # def tv_display_single(request, order_id=None):
@@ -0,0 +1,170 @@
+"""
+Preparation work queue for the counter terminals.
+
+Pickup orders (kiosk orders included) still to be prepared form a queue,
+oldest first. A staff terminal takes the next one with ``claim_next``: the
+order gets the terminal's name and a lease of ``ORDER_CLAIM_LEASE_SECONDS``
+and moves to ``preparing``, so two people never start on the same order.
+The terminal renews the lease while it works and calls ``finish`` to mark
+the order ready, or ``release`` to put it back. A claim that is not renewed
+runs out, and the order goes to the next terminal that asks.
+
+The claim is a conditional UPDATE of the oldest candidate:
+
+    UPDATE order SET claimed_by = <terminal>, ... WHERE id = <candidate>
+        AND (claimed_by IS NULL OR claim_expires_at < <now>)
+
+so a terminal that lost the race matches no row and tries the next one. On
+PostgreSQL the candidate is read with ``SELECT ... FOR UPDATE SKIP LOCKED``:
+concurrent terminals pass over each other's rows instead of waiting on them,
+and the UPDATE always wins. SQLite serializes writers, so there the
+conditional UPDATE is what keeps claims exclusive.
+
+Claims, completions, releases and expired claims are counted per terminal
+and hour in ``TerminalThroughput``.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .db import lock_rows
+from .models import Order, TerminalThroughput
+from .preptimes import hour_of
+from .signals import record_changes
+from .transitions import QUEUE_STATUSES, change_status
+
+# Candidates tried per claim where rows cannot be skip-locked
+CANDIDATES = 5
+
+
+class ClaimLost(ValueError):
+    def __init__(self, order_id, terminal):
+        self.order_id, self.terminal = order_id, terminal
+        super().__init__(f'Order {order_id} is not claimed by {terminal}')
+
+
+def lease():
+    return timedelta(seconds=settings.ORDER_CLAIM_LEASE_SECONDS)
+
+
+def queue(now=None):
+    """Orders a terminal may claim at ``now``: unclaimed, or their claim ran out."""
+    now = now or timezone.now()
+    return Order.objects.filter(order_type='pickup', status__in=QUEUE_STATUSES).filter(
+        Q(claimed_by__isnull=True) | Q(claim_expires_at__lt=now)
+    )
+
+
+def claim_holder(row, now=None):
+    """Terminal holding the order (an ``Order`` or ``order_rows`` dict), None if free."""
+    get = row.get if isinstance(row, dict) else lambda field: getattr(row, field)
+    if get('claimed_by') and get('claim_expires_at') >= (now or timezone.now()):
+        return get('claimed_by')
+    return None
+
+
+def _count(terminal, at, **counts):
+    """Add ``counts`` to ``terminal``'s row for the hour of ``at``."""
+    hour = hour_of(at)
+    rows = TerminalThroughput.objects.filter(terminal=terminal, hour=hour)
+    increments = {field: F(field) + value for field, value in counts.items()}
+    if rows.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            TerminalThroughput.objects.create(terminal=terminal, hour=hour, **counts)
+    except IntegrityError:
+        # Another process created the row first
+        rows.update(**increments)
+
+
+def claim_next(terminal, user=None):
+    """Claim the oldest order in the queue for ``terminal``; None if the queue is empty."""
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = lock_rows(queue(now).order_by('created_at', 'id'), skip_locked=True)
+        skip_locked = connections[candidates.db].features.has_select_for_update_skip_locked
+        for order_id, previous in candidates.values_list('id', 'claimed_by')[:1 if skip_locked else CANDIDATES]:
+            claimed = queue(now).filter(id=order_id).update(
+                claimed_by=terminal, claimed_at=now, claim_expires_at=now + lease(), updated_at=now,
+            )
+            if claimed:
+                break
+        else:
+            return None
+
+        record_changes([order_id])
+        _count(terminal, now, claimed=1)
+        if previous and previous != terminal:
+            _count(previous, now, expired=1)
+        order = Order.objects.get(id=order_id)
+        if order.status != 'preparing':
+            change_status(order, 'preparing', user)
+    return order
+
+
+def renew(order_id, terminal):
+    """Extend ``terminal``'s claim on the order; returns the new expiry."""
+    expires = timezone.now() + lease()
+    if not Order.objects.filter(id=order_id, claimed_by=terminal, status__in=QUEUE_STATUSES).update(
+        claim_expires_at=expires,
+    ):
+        raise ClaimLost(order_id, terminal)
+    return expires
+
+
+def release(order_id, terminal):
+    """Put a claimed order back in the queue."""
+    now = timezone.now()
+    with transaction.atomic():
+        if not Order.objects.filter(id=order_id, claimed_by=terminal).update(
+            claimed_by=None, claim_expires_at=None, updated_at=now,
+        ):
+            raise ClaimLost(order_id, terminal)
+        record_changes([order_id])
+        _count(terminal, now, released=1)
+
+
+def finish(order_id, terminal, user=None):
+    """Mark ``terminal``'s claimed order ready and free the claim."""
+    now = timezone.now()
+    with transaction.atomic():
+        if not Order.objects.filter(id=order_id, claimed_by=terminal).update(claimed_by=None, claim_expires_at=None):
+            raise ClaimLost(order_id, terminal)
+        order = Order.objects.get(id=order_id)
+        change_status(order, 'ready', user)
+        _count(terminal, now, completed=1, busy_seconds=(now - order.claimed_at).total_seconds())
+    return order
+
+
+def terminal_throughput(day=None):
+    """
+    Per terminal on ``day`` (default today), busiest first: claimed,
+    completed, released and expired counts, ``busy_seconds``, and
+    ``orders_per_hour`` and ``avg_prep_seconds`` over the completed orders.
+    """
+    day = day or timezone.localdate()
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    rows = (
+        TerminalThroughput.objects.filter(hour__gte=start, hour__lt=start + timedelta(days=1))
+        .values('terminal')
+        .annotate(
+            claimed=Sum('claimed'), completed=Sum('completed'), released=Sum('released'),
+            expired=Sum('expired'), busy_seconds=Sum('busy_seconds'),
+        )
+        .order_by('-completed', 'terminal')
+    )
+    result = []
+    for row in rows:
+        busy = row['busy_seconds']
+        result.append({
+            **row,
+            'busy_seconds': round(busy, 1),
+            'orders_per_hour': round(row['completed'] * 3600 / busy, 1) if busy else None,
+            'avg_prep_seconds': round(busy / row['completed'], 1) if row['completed'] else None,
+        })
+    return result